@@ -0,0 +1,266 @@
+"""
+End-to-end endpoint benchmarks for the RipaPay backend.
+
+Drives the FastAPI app in-process (or a server at --url) against the
+simulated Qubic node and reports throughput and latency percentiles per
+route. Results are written as JSON; pass a previous result as --baseline to
+fail on regressions.
+
+	python benchmark.py --requests 500 --concurrency 32 --output bench.json
+	python benchmark.py --baseline bench.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+
+# Upper bounds in milliseconds of the latency histogram buckets
+HISTOGRAM_BOUNDS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+# A request is (method, path, json body)
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+
+def build_scenarios(addresses: List[str], business_uuids: List[str], seed: int) -> Dict[str, Callable[[], Request]]:
+	rng = random.Random(seed)
+
+	def address() -> str:
+		return rng.choice(addresses)
+
+	def business() -> str:
+		return rng.choice(business_uuids)
+
+	def payment() -> Dict[str, Any]:
+		return {
+			"business_uuid": business(),
+			"amount": rng.randint(1, 100000),
+			"merchant_name": "Benchmark Store",
+			"reference": f"bench-{rng.randint(0, 10 ** 9)}"
+		}
+
+	return {
+		"transactions": lambda: ("POST", "/transactions", {
+			"from_address": address(),
+			"to_address": address(),
+			"amount": rng.randint(100, 100000),
+			"business_uuid": business()
+		}),
+		"qr_generate": lambda: ("POST", "/qr/generate", payment()),
+		"payment_link": lambda: ("POST", "/payment/link", payment()),
+		"wallet_balance": lambda: ("POST", "/wallet/balance", {"address": address()}),
+		"dashboard_metrics": lambda: ("GET", f"/dashboard/metrics/{business()}", None),
+		"transactions_inbound": lambda: ("GET", "/transactions/inbound", {"address": address(), "limit": 10}),
+		"analytics_export": lambda: ("GET", f"/analytics/export/{business()}?format=csv", None)
+	}
+
+def percentile(sorted_values: List[float], q: float) -> float:
+	"""Nearest-rank percentile of an already sorted list"""
+	if not sorted_values:
+		return 0.0
+	rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+	return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+	ms = sorted(latency * 1000 for latency in latencies)
+	histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+	for value in ms:
+		histogram[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, value)] += 1
+	return {
+		"requests": len(ms) + errors,
+		"errors": errors,
+		"duration_s": round(duration, 4),
+		"throughput_rps": round(len(ms) / duration, 2) if duration > 0 else 0.0,
+		"latency_ms": {
+			"mean": round(sum(ms) / len(ms), 3) if ms else 0.0,
+			"p50": round(percentile(ms, 50), 3),
+			"p95": round(percentile(ms, 95), 3),
+			"p99": round(percentile(ms, 99), 3),
+			"max": round(ms[-1], 3) if ms else 0.0
+		},
+		"histogram": {
+			"bounds_ms": HISTOGRAM_BOUNDS_MS,
+			"counts": histogram
+		}
+	}
+
+async def run_scenario(
+	client: httpx.AsyncClient,
+	make_request: Callable[[], Request],
+	requests: int,
+	concurrency: int,
+	warmup: int
+) -> Dict[str, Any]:
+	async def send(request: Request) -> bool:
+		method, path, body = request
+		response = await client.request(method, path, json=body)
+		await response.aread()
+		return response.status_code < 400
+
+	for _ in range(warmup):
+		await send(make_request())
+
+	# Build the requests up front so generating them is not timed
+	pending = [make_request() for _ in range(requests)]
+	latencies: List[float] = []
+	errors = 0
+
+	async def worker():
+		nonlocal errors
+		while pending:
+			request = pending.pop()
+			started = time.perf_counter()
+			try:
+				ok = await send(request)
+			except httpx.HTTPError:
+				ok = False
+			if ok:
+				latencies.append(time.perf_counter() - started)
+			else:
+				errors += 1
+
+	started = time.perf_counter()
+	await asyncio.gather(*(worker() for _ in range(concurrency)))
+	return summarize(latencies, errors, time.perf_counter() - started)
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+	"""Regressions of p95 latency or throughput beyond max_regression, as readable lines"""
+	regressions = []
+	for name, current in results["scenarios"].items():
+		previous = baseline.get("scenarios", {}).get(name)
+		if previous is None:
+			continue
+		old_p95 = previous["latency_ms"]["p95"]
+		new_p95 = current["latency_ms"]["p95"]
+		if old_p95 > 0 and new_p95 > old_p95 * (1 + max_regression):
+			regressions.append(f"{name}: p95 {old_p95:.2f}ms -> {new_p95:.2f}ms")
+		old_rps = previous["throughput_rps"]
+		new_rps = current["throughput_rps"]
+		if old_rps > 0 and new_rps < old_rps * (1 - max_regression):
+			regressions.append(f"{name}: throughput {old_rps:.1f}/s -> {new_rps:.1f}/s")
+		if current["errors"] > previous["errors"]:
+			regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+	return regressions
+
+def configure_simulator(args: argparse.Namespace) -> None:
+	"""Point main.py at the simulated node; must run before main is imported"""
+	os.environ["QUBIC_SIMULATOR"] = "true"
+	os.environ["QUBIC_SIMULATOR_SEED"] = str(args.seed)
+	os.environ["QUBIC_SIMULATOR_TRANSACTIONS"] = str(args.transactions)
+	os.environ["QUBIC_SIMULATOR_ADDRESSES"] = str(args.addresses)
+	os.environ["QUBIC_SIMULATOR_BUSINESSES"] = str(args.businesses)
+	os.environ["QUBIC_SIMULATOR_LATENCY"] = str(args.node_latency)
+	os.environ["QUBIC_SIMULATOR_ERROR_RATE"] = str(args.node_error_rate)
+	os.environ.setdefault("TRANSACTION_STORE_PATH", ":memory:")
+	os.environ.setdefault("CHAIN_INGESTION_ENABLED", "false")
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+	from utils.qubic_simulator import SimulatedQubicRPC
+
+	# The simulated identities depend only on the seed and sizes, so they match the server's
+	identities = SimulatedQubicRPC(
+		seed=args.seed,
+		num_transactions=0,
+		num_addresses=args.addresses,
+		num_businesses=args.businesses
+	)
+	scenarios = build_scenarios(identities.addresses, identities.business_uuids, args.seed)
+	if args.scenarios:
+		selected = args.scenarios.split(",")
+		unknown = set(selected) - set(scenarios)
+		if unknown:
+			raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+		scenarios = {name: scenarios[name] for name in selected}
+
+	results = {}
+	if args.url:
+		async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+			for name, make_request in scenarios.items():
+				results[name] = await run_scenario(client, make_request, args.requests, args.concurrency, args.warmup)
+				print_result(name, results[name])
+		return results
+
+	configure_simulator(args)
+	import main
+	logging.getLogger().setLevel(args.log_level)
+	async with main.app.router.lifespan_context(main.app):
+		transport = httpx.ASGITransport(app=main.app)
+		async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+			for name, make_request in scenarios.items():
+				results[name] = await run_scenario(client, make_request, args.requests, args.concurrency, args.warmup)
+				print_result(name, results[name])
+	return results
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+	latency = result["latency_ms"]
+	print(
+		f"{name:<22} {result['throughput_rps']:>9.1f} req/s  "
+		f"p50 {latency['p50']:>8.2f}ms  p95 {latency['p95']:>8.2f}ms  p99 {latency['p99']:>8.2f}ms  "
+		f"errors {result['errors']}"
+	)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+	parser = argparse.ArgumentParser(description="Benchmark RipaPay endpoints against a simulated Qubic node")
+	parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+	parser.add_argument("--scenarios", help="Comma-separated scenarios to run (default: all)")
+	parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario")
+	parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients per scenario")
+	parser.add_argument("--warmup", type=int, default=10, help="Untimed requests before each scenario")
+	parser.add_argument("--seed", type=int, default=42)
+	parser.add_argument("--transactions", type=int, default=1000000, help="Synthetic ledger size")
+	parser.add_argument("--addresses", type=int, default=10000)
+	parser.add_argument("--businesses", type=int, default=100)
+	parser.add_argument("--node-latency", type=float, default=0.0, help="Simulated node latency in seconds")
+	parser.add_argument("--node-error-rate", type=float, default=0.0)
+	parser.add_argument("--log-level", default="WARNING")
+	parser.add_argument("--output", help="Write results as JSON to this path")
+	parser.add_argument("--baseline", help="Compare against a previous JSON result")
+	parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative regression, e.g. 0.2 for 20%%")
+	return parser.parse_args(argv)
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+	args = parse_args(argv)
+	results = {
+		"meta": {
+			"timestamp": datetime.utcnow().isoformat(),
+			"python": platform.python_version(),
+			"target": args.url or "in-process",
+			"requests": args.requests,
+			"concurrency": args.concurrency,
+			"seed": args.seed,
+			"transactions": args.transactions,
+			"addresses": args.addresses,
+			"businesses": args.businesses,
+			"node_latency": args.node_latency,
+			"node_error_rate": args.node_error_rate
+		},
+		"scenarios": asyncio.run(run(args))
+	}
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent=2)
+		print(f"Results written to {args.output}")
+
+	if args.baseline:
+		with open(args.baseline) as f:
+			baseline = json.load(f)
+		regressions = compare(results, baseline, args.max_regression)
+		if regressions:
+			print("Regressions against baseline:")
+			for line in regressions:
+				print(f"  {line}")
+			return 1
+		print("No regressions against baseline")
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main_cli())
\ No newline at end of file
@@ -1,18 +1,41 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response, Body, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, validator
 import re
-from qubipy.rpc.rpc_client import QubiPy_RPC
+from contextlib import asynccontextmanager
+from utils.qubic_rpc import AsyncQubicRPC
+from utils.qubic_simulator import SimulatedQubicRPC
 from utils.transaction_builder import TransactionBuilder
+from utils.batch_payments import BatchStore, BatchPaymentService
+from utils.idempotency import (
+	IdempotencyStore,
+	IdempotencyKeyMismatchError,
+	IdempotencyInProgressError,
+	IdempotencyOutcomeUnknownError,
+	request_fingerprint
+)
 from utils.qr_payment import QRPaymentGenerator
+from utils.qr_renderer import QRRenderPool, QRRenderBusyError
+from utils.qr_cache import QRImageCache
+from utils.qr_bulk import QRBulkExporter
+from utils.payment_intents import PaymentIntentStore
+from utils.reconciliation import ReconciliationEngine
+from utils.push_hub import HEARTBEAT, PushHub, channel_keys
 import os
 from dotenv import load_dotenv
 import logging
 import asyncio
+import json
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 from utils.dashboard_metrics import DashboardMetricsService
+from utils.analytics_service import AnalyticsService
+from utils.transaction_store import TransactionStore, TransactionLedger
+from utils.chain_ingester import ChainIngester
+from utils.confirmation_watcher import ConfirmationWatcher
 from utils.transaction_tracker import TransactionTracker
+from utils.transaction_cache import TransactionDetailCache
 from utils.account_manager import (
 	AccountManager,
 	AccountCreationRequest,
@@ -22,6 +45,8 @@ from utils.account_manager import (
 	CloudIntegrationRequest
 )
 from utils.b2b_payment import B2BPaymentService
+from utils.wallet_service import WalletService
+from utils.balance_cache import TickAwareCache
 from utils.uuid_generator import UUIDGenerator
 from typing import Optional, List
 
@@ -34,7 +59,160 @@ load_dotenv()
 logger.debug(f"QUBIC_RPC_URL: {os.getenv('QUBIC_RPC_URL')}")
 logger.debug(f"QUBIC_NETWORK: {os.getenv('QUBIC_NETWORK')}")
 
-app = FastAPI(title="RipaPay Backend", description="Qubic Blockchain Integration for RipaPay")
+# Initialize services
+try:
+	if os.getenv("QUBIC_SIMULATOR", "false").lower() == "true":
+		# Offline mode: serve the whole app from a seeded synthetic ledger
+		qubic_client = SimulatedQubicRPC(
+			seed=int(os.getenv("QUBIC_SIMULATOR_SEED", "42")),
+			num_transactions=int(os.getenv("QUBIC_SIMULATOR_TRANSACTIONS", "1000000")),
+			num_addresses=int(os.getenv("QUBIC_SIMULATOR_ADDRESSES", "10000")),
+			num_businesses=int(os.getenv("QUBIC_SIMULATOR_BUSINESSES", "100")),
+			tx_per_tick=int(os.getenv("QUBIC_SIMULATOR_TX_PER_TICK", "10")),
+			tick_interval=float(os.getenv("QUBIC_SIMULATOR_TICK_INTERVAL", "1")),
+			latency=float(os.getenv("QUBIC_SIMULATOR_LATENCY", "0")),
+			latency_jitter=float(os.getenv("QUBIC_SIMULATOR_LATENCY_JITTER", "0")),
+			error_rate=float(os.getenv("QUBIC_SIMULATOR_ERROR_RATE", "0"))
+		)
+		logger.debug("Using simulated Qubic node")
+	else:
+		qubic_client = AsyncQubicRPC(
+			rpc_url=os.getenv("QUBIC_RPC_URL", "https://api.qubic.li/v1/"),
+			rpc_urls=[url.strip() for url in os.getenv("QUBIC_RPC_URLS", "").split(",") if url.strip()] or None,
+			api_key=os.getenv("QUBIC_API_KEY"),
+			timeout=float(os.getenv("QUBIC_RPC_TIMEOUT", "5")),
+			max_concurrency=int(os.getenv("QUBIC_RPC_MAX_CONCURRENCY", "64")),
+			coalesce_reads=os.getenv("QUBIC_RPC_COALESCE_READS", "true").lower() == "true",
+			hedge_reads=os.getenv("QUBIC_RPC_HEDGE_READS", "true").lower() == "true"
+		)
+	balance_cache = TickAwareCache(
+		max_entries=int(os.getenv("BALANCE_CACHE_SIZE", "10000")),
+		max_age=float(os.getenv("BALANCE_CACHE_MAX_AGE", "5")),
+		stale_while_revalidate=os.getenv("BALANCE_CACHE_STALE_WHILE_REVALIDATE", "false").lower() == "true"
+	)
+	transaction_builder = TransactionBuilder(qubic_client, balance_cache=balance_cache)
+	batch_store = BatchStore(os.getenv("BATCH_STORE_PATH", os.getenv("TRANSACTION_STORE_PATH", "ripapay_ledger.db")))
+	batch_payments = BatchPaymentService(
+		transaction_builder,
+		batch_store,
+		max_concurrency=int(os.getenv("BATCH_PAYMENT_CONCURRENCY", "32"))
+	)
+	qr_render_pool = QRRenderPool(
+		mode=os.getenv("QR_RENDER_MODE", "process"),
+		workers=int(os.getenv("QR_RENDER_WORKERS")) if os.getenv("QR_RENDER_WORKERS") else None,
+		max_queue=int(os.getenv("QR_RENDER_QUEUE", "64"))
+	)
+	qr_image_cache = QRImageCache(
+		max_bytes=int(os.getenv("QR_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+		path=os.getenv("QR_CACHE_PATH")
+	)
+	payment_intents = PaymentIntentStore(
+		secret=os.getenv("PAYMENT_INTENT_SECRET"),
+		ttl=float(os.getenv("PAYMENT_INTENT_TTL", "900")),
+		path=os.getenv("PAYMENT_INTENT_STORE_PATH"),
+		max_open=int(os.getenv("PAYMENT_INTENT_MAX_OPEN", "1000000"))
+	)
+	qr_generator = QRPaymentGenerator(
+		render_pool=qr_render_pool,
+		image_cache=qr_image_cache,
+		intents=payment_intents
+	)
+	reconciler = ReconciliationEngine(
+		payment_intents,
+		max_unmatched=int(os.getenv("RECONCILIATION_MAX_UNMATCHED", "1000"))
+	)
+	qr_bulk_exporter = QRBulkExporter(qr_generator)
+	transaction_store = TransactionStore(os.getenv("TRANSACTION_STORE_PATH", "ripapay_ledger.db"))
+	ledger = TransactionLedger(transaction_store, qubic_client)
+	dashboard_metrics = DashboardMetricsService(
+		qubic_client,
+		backend=os.getenv("DASHBOARD_METRICS_BACKEND", "fetch"),
+		ledger=ledger,
+		max_staleness=float(os.getenv("DASHBOARD_METRICS_MAX_STALENESS", "300"))
+	)
+	confirmation_watcher = ConfirmationWatcher(
+		transaction_builder,
+		transaction_store,
+		required_confirmations=int(os.getenv("TRANSACTION_CONFIRMATIONS", "3")),
+		expiry_ticks=int(os.getenv("TRANSACTION_EXPIRY_TICKS", "30"))
+	)
+	transaction_cache = TransactionDetailCache(
+		max_entries=int(os.getenv("TRANSACTION_CACHE_SIZE", "50000")),
+		finality_confirmations=int(os.getenv("TRANSACTION_CONFIRMATIONS", "3")),
+		pending_ttl=float(os.getenv("TRANSACTION_CACHE_PENDING_TTL", "5")),
+		path=os.getenv("TRANSACTION_CACHE_PATH")
+	)
+	transaction_tracker = TransactionTracker(
+		qubic_client,
+		ledger=ledger,
+		confirmation_watcher=confirmation_watcher,
+		detail_cache=transaction_cache
+	)
+	analytics_service = AnalyticsService(qubic_client, ledger=ledger)
+	chain_ingester = ChainIngester(
+		qubic_client,
+		transaction_store,
+		max_concurrency=int(os.getenv("CHAIN_INGESTION_CONCURRENCY", "8")),
+		start_tick=int(os.getenv("CHAIN_INGESTION_START_TICK")) if os.getenv("CHAIN_INGESTION_START_TICK") else None
+	)
+	chain_ingester.add_transaction_listener(
+		lambda tx: dashboard_metrics.observe_transaction(tx["business_uuid"], tx)
+	)
+	chain_ingester.add_transaction_listener(transaction_tracker.observe_transfer)
+	transaction_tracker.add_transfer_listener(reconciler.on_transfer)
+	push_hub = PushHub(
+		heartbeat_interval=float(os.getenv("PUSH_HEARTBEAT_INTERVAL", "15")),
+		history=int(os.getenv("PUSH_HISTORY", "64")),
+		max_queue=int(os.getenv("PUSH_MAX_QUEUE", "256"))
+	)
+	reconciler.add_listener(lambda match: push_hub.publish_payment(match["intent"], match["transfer"]))
+	# Payments arrive through the reconciler; the store only adds expiry
+	payment_intents.add_listener(lambda intent: push_hub.publish_payment(intent) if intent["status"] == "expired" else None)
+	# Expire intents on the heartbeat too, so terminals hear about them without new traffic
+	push_hub.add_heartbeat_listener(payment_intents.purge_expired)
+	chain_ingester.add_tick_listener(lambda tick, transactions: balance_cache.advance_tick(tick))
+	chain_ingester.add_tick_listener(lambda tick, transactions: dashboard_metrics.observe_tick())
+	chain_ingester.add_tick_listener(confirmation_watcher.on_tick)
+	idempotency_store = IdempotencyStore(
+		os.getenv("IDEMPOTENCY_STORE_PATH", os.getenv("TRANSACTION_STORE_PATH", "ripapay_ledger.db")),
+		ttl=float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+	)
+	account_manager = AccountManager(qubic_client, balance_cache=balance_cache)
+	b2b_service = B2BPaymentService(qubic_client, balance_cache=balance_cache)
+	wallet_service = WalletService(qubic_client, balance_cache=balance_cache)
+	uuid_generator = UUIDGenerator()
+	logger.debug("Successfully initialized services")
+except Exception as e:
+	logger.error(f"Failed to initialize: {str(e)}")
+	raise
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	await qubic_client.start()
+	await qr_render_pool.warm_up()
+	push_hub.start()
+	if os.getenv("CHAIN_INGESTION_ENABLED", "true").lower() == "true":
+		confirmation_watcher.start()
+		chain_ingester.start()
+		logger.debug("Started chain ingestion")
+	else:
+		# Without ingested ticks, submissions are confirmed by polling the node
+		confirmation_watcher.start(poll_interval=float(os.getenv("TRANSACTION_POLL_INTERVAL", "2")))
+	try:
+		yield
+	finally:
+		await push_hub.close()
+		await chain_ingester.stop()
+		await confirmation_watcher.close()
+		await qubic_client.close()
+		transaction_store.close()
+		batch_store.close()
+		idempotency_store.close()
+		transaction_cache.close()
+		qr_render_pool.close()
+		payment_intents.close()
+
+app = FastAPI(title="RipaPay Backend", description="Qubic Blockchain Integration for RipaPay", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -45,23 +223,6 @@ app.add_middleware(
 	allow_headers=["*"],
 )
 
-# Initialize services
-try:
-	qubic_client = QubiPy_RPC(
-		rpc_url=os.getenv("QUBIC_RPC_URL", "https://api.qubic.li/v1/")
-	)
-	transaction_builder = TransactionBuilder()
-	qr_generator = QRPaymentGenerator()
-	dashboard_metrics = DashboardMetricsService(qubic_client)
-	transaction_tracker = TransactionTracker(qubic_client)
-	account_manager = AccountManager(qubic_client)
-	b2b_service = B2BPaymentService(qubic_client)
-	uuid_generator = UUIDGenerator()
-	logger.debug("Successfully initialized services")
-except Exception as e:
-	logger.error(f"Failed to initialize: {str(e)}")
-	raise
-
 class TransactionRequest(BaseModel):
 	from_address: str
 	to_address: str
@@ -74,6 +235,10 @@ class TransactionRequest(BaseModel):
 			raise ValueError('Business UUID must be an 8-digit number')
 		return v
 
+class BatchTransactionRequest(BaseModel):
+	batch_id: Optional[str] = None
+	items: List[TransactionRequest]
+
 class QRPaymentRequest(BaseModel):
 	business_uuid: str
 	amount: float
@@ -86,6 +251,33 @@ class QRPaymentRequest(BaseModel):
 			raise ValueError('Business UUID must be an 8-digit number')
 		return v
 
+class QRGenerateRequest(QRPaymentRequest):
+	format: str = "png"
+	size: str = "md"
+	# Static, cacheable code by default; true opens a signed, expiring intent per code
+	intent: bool = False
+	# Receiving address, so payments to other addresses of the business are not matched to the intent
+	destination: Optional[str] = None
+
+class PaymentLinkRequest(QRPaymentRequest):
+	intent: bool = True
+	destination: Optional[str] = None
+
+class BulkQRItem(QRPaymentRequest):
+	terminal_id: Optional[str] = None
+	pos_id: Optional[str] = None
+
+	@validator('amount')
+	def validate_amount(cls, v):
+		if v <= 0:
+			raise ValueError('Amount must be positive')
+		return v
+
+class BulkQRRequest(BaseModel):
+	format: str = "png"
+	size: str = "md"
+	items: List[BulkQRItem]
+
 class B2BTransferRequest(BaseModel):
 	from_business_id: str
 	to_business_id: str
@@ -103,6 +295,10 @@ class ChainRegistrationRequest(BaseModel):
 	chain_name: str
 	chain_config: Dict[str, Any]
 
+class BackfillRequest(BaseModel):
+	start_tick: int
+	end_tick: int
+
 class BusinessRegistrationRequest(BaseModel):
 	business_name: str
 	country: str
@@ -117,32 +313,115 @@ async def root():
 @app.get("/health")
 async def health_check():
 	try:
-		loop = asyncio.get_event_loop()
-		status = await loop.run_in_executor(None, qubic_client.get_status)
+		status = await qubic_client.get_status()
 		logger.debug(f"Health check status: {status}")
-		return {"status": "healthy", "qubic_status": status}
+		return {"status": "healthy", "qubic_status": status, "nodes": qubic_client.node_status()}
 	except Exception as e:
 		logger.error(f"Health check failed: {str(e)}")
 		raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/transactions")
-async def create_transaction(transaction: TransactionRequest):
+@app.get("/rpc/stats")
+async def get_rpc_stats():
+	return {
+		**qubic_client.stats(),
+		"balance_cache": balance_cache.stats(),
+		"transaction_cache": transaction_cache.stats(),
+		"qr_render": qr_render_pool.stats(),
+		"qr_cache": qr_image_cache.stats(),
+		"payment_intents": payment_intents.stats(),
+		"reconciliation": reconciler.stats(),
+		"push": push_hub.stats()
+	}
+
+@app.get("/ingestion/status")
+async def get_ingestion_status():
+	return chain_ingester.status()
+
+@app.post("/ingestion/backfill")
+async def backfill_ticks(request: BackfillRequest):
+	try:
+		logger.debug(f"Starting backfill of ticks {request.start_tick}-{request.end_tick}")
+		chain_ingester.backfill(request.start_tick, request.end_tick)
+		return {"status": "started", "start_tick": request.start_tick, "end_tick": request.end_tick}
+	except Exception as e:
+		logger.error(f"Failed to start backfill: {str(e)}")
+		raise HTTPException(status_code=400, detail=str(e))
+
+async def run_idempotent(scope: str, idempotency_key: Optional[str], payload: Dict[str, Any], fn, response: Response):
+	"""Run fn at most once per Idempotency-Key, replaying the stored response for retries"""
+	if not idempotency_key:
+		return await fn()
 	try:
-		logger.debug(f"Creating transaction: {transaction}")
-		result = await transaction_builder.create_payment_transaction(
+		result, replayed = await idempotency_store.run(scope, idempotency_key, request_fingerprint(payload), fn)
+	except IdempotencyKeyMismatchError as e:
+		raise HTTPException(status_code=422, detail=str(e))
+	except IdempotencyInProgressError as e:
+		raise HTTPException(status_code=409, detail=str(e))
+	except IdempotencyOutcomeUnknownError as e:
+		# Not retryable under this key: check the payment's status before sending it again with a new one
+		raise HTTPException(status_code=502, detail=str(e))
+	if replayed:
+		response.headers["Idempotent-Replayed"] = "true"
+	return result
+
+@app.post("/transactions", status_code=202)
+async def create_transaction(
+	transaction: TransactionRequest,
+	response: Response,
+	idempotency_key: Optional[str] = Header(None)
+):
+	async def submit():
+		# Returns a pending handle at once; track it via /transactions/{id} or its event stream
+		return confirmation_watcher.submit(
 			from_address=transaction.from_address,
 			to_address=transaction.to_address,
 			amount=transaction.amount,
 			business_uuid=transaction.business_uuid
 		)
-		logger.debug(f"Transaction result: {result}")
+
+	try:
+		logger.debug(f"Submitting transaction: {transaction}")
+		result = await run_idempotent("transactions", idempotency_key, transaction.dict(), submit, response)
+		logger.debug(f"Transaction submitted: {result}")
 		return result
+	except HTTPException:
+		raise
 	except Exception as e:
 		logger.error(f"Transaction failed: {str(e)}")
 		raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/transactions/batch")
+async def create_transaction_batch(batch: BatchTransactionRequest):
+	try:
+		logger.debug(f"Submitting batch {batch.batch_id} of {len(batch.items)} payments")
+		return await batch_payments.submit_batch(
+			[item.dict() for item in batch.items],
+			batch_id=batch.batch_id
+		)
+	except Exception as e:
+		logger.error(f"Batch submission failed: {str(e)}")
+		raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/transactions/batch/{batch_id}")
+async def get_transaction_batch(batch_id: str):
+	try:
+		return batch_payments.get_batch(batch_id)
+	except Exception as e:
+		logger.error(f"Failed to get batch: {str(e)}")
+		raise HTTPException(status_code=404, detail=str(e))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+	if not if_none_match:
+		return False
+	candidates = [tag.strip() for tag in if_none_match.split(",")]
+	return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
 @app.post("/qr/generate")
-async def generate_qr_payment(payment: QRPaymentRequest):
+async def generate_qr_payment(
+	payment: QRGenerateRequest,
+	response: Response,
+	if_none_match: Optional[str] = Header(None)
+):
 	try:
 		logger.debug(f"Generating QR code for payment: {payment}")
 		payment_data = {
@@ -150,21 +429,63 @@ async def generate_qr_payment(payment: QRPaymentRequest):
 			"amount": payment.amount,
 			"merchant_name": payment.merchant_name,
 			"reference": payment.reference,
+			"destination": payment.destination,
 			"timestamp": datetime.utcnow().isoformat()
 		}
-		qr_result = qr_generator.generate_payment_qr(payment_data)
+		intent = None
+		if payment.intent:
+			# Every intent is a new code, so If-None-Match cannot apply; checking it would only leak open intents
+			intent = qr_generator.create_intent(payment_data)
+			payment_data["intent_id"] = intent["intent_id"]
+		etag = f'"{qr_generator.qr_id(payment_data, payment.format, payment.size)}"'
+		# A static code's ETag is its content address, so a match needs no rendering at all
+		if intent is None and etag_matches(if_none_match, etag):
+			return Response(status_code=304, headers={"ETag": etag})
+		qr_result = await qr_generator.generate_payment_qr(payment_data, payment.format, payment.size)
+		qr_result["intent"] = intent
+		response.headers["ETag"] = etag
 		logger.debug("QR code generated successfully")
 		return qr_result
+	except QRRenderBusyError as e:
+		logger.warning(f"QR code generation rejected: {str(e)}")
+		raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
 	except Exception as e:
 		logger.error(f"QR code generation failed: {str(e)}")
 		raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/qr/bulk")
+async def generate_bulk_qr(request: BulkQRRequest):
+	try:
+		logger.debug(f"Generating {len(request.items)} QR codes as a {request.format} archive")
+		stream = qr_bulk_exporter.stream_archive([item.dict() for item in request.items], request.format, request.size)
+		return StreamingResponse(
+			stream,
+			media_type="application/zip",
+			headers={"Content-Disposition": 'attachment; filename="ripapay_qr_codes.zip"'}
+		)
+	except Exception as e:
+		logger.error(f"Bulk QR generation failed: {str(e)}")
+		raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/qr/image/{qr_id}")
+async def get_qr_image(qr_id: str, if_none_match: Optional[str] = Header(None)):
+	etag = f'"{qr_id}"'
+	# Images are content-addressed, so they never change and can be cached forever
+	headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+	if etag_matches(if_none_match, etag):
+		return Response(status_code=304, headers=headers)
+	image = qr_generator.get_qr_image(qr_id)
+	if image is None:
+		raise HTTPException(status_code=404, detail=f"QR image {qr_id} not found")
+	return Response(content=image[0], media_type=image[1], headers=headers)
+
 @app.post("/qr/verify")
-async def verify_qr_payment(qr_data: dict, payment_data: dict):
+async def verify_qr_payment(qr_data: Union[str, dict] = Body(...), payment_data: Optional[dict] = Body(None)):
 	try:
 		logger.debug(f"Verifying QR payment: {qr_data} against {payment_data}")
-		is_valid = qr_generator.verify_qr_payment(qr_data, payment_data)
-		return {"valid": is_valid}
+		# qr_data is the scanned QR text or payment link, or the decoded JSON form.
+		# Signed intents verify on their own; payment_data is only needed for unsigned codes.
+		return qr_generator.verify_payment(qr_data, payment_data)
 	except Exception as e:
 		logger.error(f"QR payment verification failed: {str(e)}")
 		raise HTTPException(status_code=400, detail=str(e))
@@ -177,6 +498,9 @@ async def connect_wallet():
 class WalletBalanceRequest(BaseModel):
 	address: str
 
+class WalletBalancesRequest(BaseModel):
+	addresses: List[str]
+
 class WalletTransactionRequest(BaseModel):
 	address: str
 	limit: Optional[int] = 10
@@ -189,31 +513,49 @@ class TransactionListRequest(BaseModel):
 class TransactionDetailRequest(BaseModel):
 	transaction_id: str
 
+class TransactionDetailsRequest(BaseModel):
+	transaction_ids: List[str]
+
 @app.post("/wallet/balance")
 async def get_wallet_balance(request: WalletBalanceRequest):
 	try:
 		logger.debug(f"Getting balance for address: {request.address}")
-		# TODO: Implement actual balance fetching using QubiPy
-		balance = await qubic_client.get_balance(request.address)
+		balance = await wallet_service.get_balance_info(request.address)
 		return {"address": request.address, "balance": balance}
 	except Exception as e:
 		logger.error(f"Failed to get wallet balance: {str(e)}")
 		raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/wallet/balances")
+async def get_wallet_balances(request: WalletBalancesRequest):
+	try:
+		logger.debug(f"Getting balances for {len(request.addresses)} addresses")
+		result = await wallet_service.get_balances(request.addresses)
+		return {
+			"balances": result["balances"],
+			"errors": result["errors"],
+			"count": len(result["balances"])
+		}
+	except Exception as e:
+		logger.error(f"Failed to get wallet balances: {str(e)}")
+		raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/wallet/transactions")
 async def get_wallet_transactions(request: WalletTransactionRequest):
 	try:
 		logger.debug(f"Getting transactions for address: {request.address}")
-		# TODO: Implement actual transaction history fetching using QubiPy
-		transactions = await qubic_client.get_transactions(
-			address=request.address,
+		transactions = await ledger.address_transactions(
+			request.address,
+			"both",
 			limit=request.limit,
 			offset=request.offset
 		)
+		total, total_is_exact = ledger.count_address(request.address, "both")
 		return {
 			"address": request.address,
 			"transactions": transactions,
-			"total": len(transactions)
+			"total": total,
+			"total_is_exact": total_is_exact
 		}
 	except Exception as e:
 		logger.error(f"Failed to get wallet transactions: {str(e)}")
@@ -239,6 +581,35 @@ async def get_dashboard_transactions(business_uuid: str, limit: int = 10):
 		logger.error(f"Failed to get transaction monitoring: {str(e)}")
 		raise HTTPException(status_code=400, detail=str(e))
 
+EXPORT_MEDIA_TYPES = {
+	"csv": "text/csv",
+	"ndjson": "application/x-ndjson"
+}
+
+@app.get("/analytics/export/{business_uuid}")
+async def export_transactions(business_uuid: str, format: str = "csv", compress: bool = False):
+	try:
+		logger.debug(f"Streaming {format} export for business: {business_uuid}")
+		stream = analytics_service.stream_export(business_uuid, format=format, compress=compress)
+		filename = f"ripapay_{business_uuid}.{format}" + (".gz" if compress else "")
+		return StreamingResponse(
+			stream,
+			media_type="application/gzip" if compress else EXPORT_MEDIA_TYPES[format],
+			headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+		)
+	except Exception as e:
+		logger.error(f"Failed to export transactions: {str(e)}")
+		raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/transactions/timeline")
+async def get_transaction_timeline(address: str, limit: int = 20, cursor: Optional[str] = None, direction: str = "both"):
+	try:
+		logger.debug(f"Getting transaction timeline for: {address}")
+		return await transaction_tracker.get_timeline(address, limit=min(max(limit, 1), 200), cursor=cursor, direction=direction)
+	except Exception as e:
+		logger.error(f"Failed to get transaction timeline: {str(e)}")
+		raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/transactions/inbound")
 async def get_inbound_transactions(request: TransactionListRequest):
 	try:
@@ -265,6 +636,15 @@ async def get_outbound_transactions(request: TransactionListRequest):
 		logger.error(f"Failed to get outbound transactions: {str(e)}")
 		raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/transactions/details")
+async def get_transactions_details(request: TransactionDetailsRequest):
+	try:
+		logger.debug(f"Getting details for {len(request.transaction_ids)} transactions")
+		return await transaction_tracker.get_transactions_details(request.transaction_ids)
+	except Exception as e:
+		logger.error(f"Failed to get transaction details: {str(e)}")
+		raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/transactions/{transaction_id}")
 async def get_transaction_details(transaction_id: str):
 	try:
@@ -275,6 +655,35 @@ async def get_transaction_details(transaction_id: str):
 		logger.error(f"Failed to get transaction details: {str(e)}")
 		raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/transactions/{transaction_id}/events")
+async def stream_transaction_events(transaction_id: str):
+	record = confirmation_watcher.get(transaction_id)
+	if record is None:
+		raise HTTPException(status_code=404, detail=f"No submission found for {transaction_id}")
+
+	async def events():
+		submission_id = record["submission_id"]
+		queue = confirmation_watcher.subscribe(submission_id)
+		try:
+			# Read the state again after subscribing so no change is missed
+			current = confirmation_watcher.get(submission_id)
+			yield f"data: {json.dumps(current)}\n\n"
+			while not confirmation_watcher.is_final(current):
+				try:
+					update = await asyncio.wait_for(queue.get(), timeout=5)
+				except asyncio.TimeoutError:
+					# Another worker may be tracking the submission; its changes reach this one through the store
+					update = confirmation_watcher.get(submission_id)
+					if update == current:
+						yield ": keep-alive\n\n"
+						continue
+				current = update
+				yield f"data: {json.dumps(current)}\n\n"
+		finally:
+			confirmation_watcher.unsubscribe(submission_id, queue)
+
+	return StreamingResponse(events(), media_type="text/event-stream")
+
 @app.post("/accounts/create")
 async def create_account(request: AccountCreationRequest):
 	try:
@@ -373,17 +782,25 @@ async def integrate_with_cloud(request: CloudIntegrationRequest):
 		)
 
 @app.post("/b2b/transfer")
-async def business_transfer(request: B2BTransferRequest):
-	try:
-		logger.debug(f"Processing B2B transfer: {request}")
-		result = await b2b_service.business_transfer(
+async def business_transfer(
+	request: B2BTransferRequest,
+	response: Response,
+	idempotency_key: Optional[str] = Header(None)
+):
+	async def transfer():
+		return await b2b_service.business_transfer(
 			from_business_id=request.from_business_id,
 			to_business_id=request.to_business_id,
 			amount=request.amount,
 			currency=request.currency,
 			memo=request.memo
 		)
-		return result
+
+	try:
+		logger.debug(f"Processing B2B transfer: {request}")
+		return await run_idempotent("b2b_transfer", idempotency_key, request.dict(), transfer, response)
+	except HTTPException:
+		raise
 	except Exception as e:
 		logger.error(f"B2B transfer failed: {str(e)}")
 		raise HTTPException(status_code=400, detail=str(e))
@@ -449,8 +866,87 @@ async def register_business(request: BusinessRegistrationRequest):
 			detail=f"Business registration failed: {str(e)}"
 		)
 
+@app.get("/payment/intents/{intent_id}")
+async def get_payment_intent(intent_id: str):
+	intent = payment_intents.get(intent_id)
+	if intent is None:
+		raise HTTPException(status_code=404, detail=f"Payment intent {intent_id} not found")
+	return intent
+
+@app.get("/reconciliation/unmatched")
+async def get_unmatched_transfers(limit: int = 100):
+	"""Recent inbound transfers that could not be matched to a payment intent"""
+	return {"stats": reconciler.stats(), "transfers": reconciler.unmatched(min(max(limit, 1), 1000))}
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+	if value is None or value == "":
+		return None
+	try:
+		return int(value)
+	except ValueError:
+		raise HTTPException(status_code=400, detail="Last-Event-ID must be an integer")
+
+@app.get("/pos/events")
+async def stream_pos_events(
+	terminal_id: Optional[str] = None,
+	pos_id: Optional[str] = None,
+	last_event_id: Optional[str] = Header(None)
+):
+	"""Server-sent payment events for a POS terminal; resumes after Last-Event-ID"""
+	channels = channel_keys(terminal_id, pos_id)
+	if not channels:
+		raise HTTPException(status_code=400, detail="terminal_id or pos_id is required")
+	subscription = push_hub.subscribe(channels, parse_event_id(last_event_id))
+
+	async def events():
+		try:
+			yield "retry: 3000\n\n"
+			async for message in subscription:
+				if message is HEARTBEAT:
+					yield ": keep-alive\n\n"
+					continue
+				event_id, event, data = message
+				yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+		finally:
+			subscription.close()
+
+	return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.websocket("/pos/ws")
+async def pos_websocket(
+	websocket: WebSocket,
+	terminal_id: Optional[str] = None,
+	pos_id: Optional[str] = None,
+	last_event_id: Optional[str] = None
+):
+	"""The same events as /pos/events, as JSON messages over a WebSocket"""
+	channels = channel_keys(terminal_id, pos_id)
+	try:
+		resume_from = int(last_event_id) if last_event_id else None
+	except ValueError:
+		resume_from = None
+		channels = []
+	if not channels:
+		await websocket.close(code=1008)
+		return
+	await websocket.accept()
+	subscription = push_hub.subscribe(channels, resume_from)
+	try:
+		async for message in subscription:
+			if message is HEARTBEAT:
+				await websocket.send_json({"event": "heartbeat"})
+				continue
+			event_id, event, data = message
+			await websocket.send_json({"id": event_id, "event": event, "data": data})
+		# Dropped by the hub: the client reconnects with the last id it saw
+		await websocket.close(code=1013)
+	except WebSocketDisconnect:
+		pass
+	finally:
+		subscription.close()
+
 @app.post("/payment/link")
-async def generate_payment_link(payment: QRPaymentRequest):
+async def generate_payment_link(payment: PaymentLinkRequest):
 	try:
 		logger.debug(f"Generating payment link for: {payment}")
 		payment_data = {
@@ -458,11 +954,15 @@ async def generate_payment_link(payment: QRPaymentRequest):
 			"amount": payment.amount,
 			"merchant_name": payment.merchant_name,
 			"reference": payment.reference,
+			"destination": payment.destination,
 			"timestamp": datetime.utcnow().isoformat()
 		}
+		intent = qr_generator.create_intent(payment_data) if payment.intent else None
+		if intent is not None:
+			payment_data["intent_id"] = intent["intent_id"]
 		payment_link = qr_generator.generate_payment_link(payment_data)
 		logger.debug("Payment link generated successfully")
-		return {"payment_link": payment_link, "payment_data": payment_data}
+		return {"payment_link": payment_link, "payment_data": payment_data, "intent": intent}
 	except Exception as e:
 		logger.error(f"Payment link generation failed: {str(e)}")
 		raise HTTPException(status_code=400, detail=str(e))
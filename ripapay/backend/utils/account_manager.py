@@ -1,4 +1,3 @@
-from qubipy.rpc.rpc_client import QubiPy_RPC
 from typing import Dict, List, Any, Optional
 import logging
 from pydantic import BaseModel, Field
@@ -6,12 +5,15 @@ import json
 import os
 from datetime import datetime
 from .cloud_storage import GoogleDriveStorage
+from .qubic_rpc import AsyncQubicRPC
+from .balance_cache import TickAwareCache
 
 logger = logging.getLogger(__name__)
 
 class AccountManager:
-	def __init__(self, qubic_client: QubiPy_RPC):
+	def __init__(self, qubic_client: AsyncQubicRPC, balance_cache: Optional[TickAwareCache] = None):
 		self.qubic_client = qubic_client
+		self.balance_cache = balance_cache
 		self.cloud_storage = None
 
 	async def create_account(self, mnemonic: str) -> Dict[str, Any]:
@@ -24,6 +26,12 @@ class AccountManager:
 
 	async def get_account_details(self, address: str) -> Dict[str, Any]:
 		try:
+			if self.balance_cache is not None:
+				return await self.balance_cache.get_or_load(
+					"account",
+					address,
+					lambda: self.qubic_client.get_account_details(address)
+				)
 			details = await self.qubic_client.get_account_details(address)
 			return details
 		except Exception as e:
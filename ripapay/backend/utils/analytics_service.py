@@ -1,40 +1,57 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, AsyncIterator, Optional
 import logging
 import csv
 import json
+import time
+import zlib
 from io import StringIO
 from datetime import datetime, timedelta
-from qubipy.rpc.rpc_client import QubiPy_RPC
-from collections import defaultdict
+from .qubic_rpc import AsyncQubicRPC
+from .timestamps import to_epoch, to_iso
+from .transaction_store import TransactionLedger, transaction_id
+from .transaction_columns import TransactionColumns, epoch_day, group_count, group_sum
 
 logger = logging.getLogger(__name__)
 
+EXPORT_PAGE_SIZE = 500
+EXPORT_FIELDS = ['timestamp', 'amount', 'from_address', 'to_address', 'status', 'transaction_id']
+EXPORT_STREAM_FORMATS = ("csv", "ndjson")
+
 class AnalyticsService:
-	def __init__(self, qubic_client: QubiPy_RPC):
+	def __init__(self, qubic_client: AsyncQubicRPC, ledger: Optional[TransactionLedger] = None):
 		self.qubic_client = qubic_client
+		self.ledger = ledger
 
 	async def get_transaction_analytics(self, business_uuid: str, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
 		try:
-			transactions = await self.qubic_client.get_business_transactions(
-				business_uuid=business_uuid,
-				start_time=start_date.isoformat(),
-				end_time=end_date.isoformat()
-			)
+			if self.ledger is not None:
+				transactions = await self.ledger.business_window(business_uuid, start_date, end_date)
+			else:
+				transactions = await self.qubic_client.get_business_transactions(
+					business_uuid=business_uuid,
+					start_time=start_date.isoformat(),
+					end_time=end_date.isoformat()
+				)
 			
+			# Convert once into columns and compute every section from them
+			columns = TransactionColumns(transactions)
+			count = len(columns)
+			total_volume = sum(columns.amounts)
+
 			# Enhanced analytics
 			analytics = {
 				"summary": {
-					"total_volume": sum(float(tx.get('amount', 0)) for tx in transactions),
-					"transaction_count": len(transactions),
-					"average_transaction": sum(float(tx.get('amount', 0)) for tx in transactions) / len(transactions) if transactions else 0,
-					"unique_customers": len(set(tx.get('from_address') for tx in transactions)),
-					"success_rate": len([tx for tx in transactions if tx.get('status') == 'success']) / len(transactions) if transactions else 0
+					"total_volume": total_volume,
+					"transaction_count": count,
+					"average_transaction": total_volume / count if count else 0,
+					"unique_customers": columns.unique_senders,
+					"success_rate": columns.success_count / count if count else 0
 				},
-				"time_series": self._generate_time_series(transactions, start_date, end_date),
-				"distribution": self._analyze_transaction_distribution(transactions),
-				"customer_insights": self._analyze_customer_behavior(transactions),
-				"hourly_patterns": self._analyze_hourly_patterns(transactions),
-				"growth_metrics": self._calculate_growth_metrics(transactions, start_date, end_date)
+				"time_series": self._generate_time_series(columns, start_date, end_date),
+				"distribution": self._analyze_transaction_distribution(columns),
+				"customer_insights": self._analyze_customer_behavior(columns),
+				"hourly_patterns": self._analyze_hourly_patterns(columns),
+				"growth_metrics": self._calculate_growth_metrics(columns, start_date, end_date)
 			}
 			
 			return analytics
@@ -44,7 +61,9 @@ class AnalyticsService:
 
 	async def export_data(self, business_uuid: str, format: str = "csv") -> bytes:
 		try:
-			data = await self.qubic_client.get_business_transactions(business_uuid=business_uuid)
+			data = []
+			async for page in self.iter_transaction_pages(business_uuid):
+				data.extend(page)
 			if format == "csv":
 				return self._export_to_csv(data)
 			elif format == "json":
@@ -55,54 +74,139 @@ class AnalyticsService:
 			logger.error(f"Failed to export data: {str(e)}")
 			raise
 
-	def _generate_time_series(self, transactions: List[Dict], start_date: datetime, end_date: datetime) -> List[Dict]:
+	async def iter_transaction_pages(self, business_uuid: str, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[List[Dict]]:
+		"""
+		Page through a business's full transaction history, newest first.
+		Pages are keyed on (timestamp, id) rather than offsets, so transactions
+		arriving mid-export cannot shift rows between pages.
+		"""
+		if self.ledger is not None:
+			async for page in self.ledger.iter_business_pages(business_uuid, page_size):
+				yield page
+			return
+
+		# The node pages newest first: each request ends at the oldest key already
+		# exported, and only falls back to an offset within a run of equal timestamps
+		before = None
+		end_ts = time.time()
+		offset = 0
+		while True:
+			page = await self.qubic_client.get_business_transactions(
+				business_uuid=business_uuid,
+				end_time=to_iso(end_ts),
+				limit=page_size,
+				offset=offset
+			)
+			fresh = [tx for tx in page if before is None or self._export_key(tx) < before]
+			if fresh:
+				yield fresh
+				before = min(self._export_key(tx) for tx in fresh)
+			if len(page) < page_size:
+				return
+			# The end bound is exclusive, so it sits just past the boundary timestamp
+			next_end = before[0] + 1e-6 if before is not None else end_ts
+			if next_end < end_ts:
+				end_ts, offset = next_end, 0
+			else:
+				offset += len(page)
+
+	@staticmethod
+	def _export_key(tx: Dict) -> tuple:
+		return (to_epoch(tx.get('timestamp'), default=0.0), transaction_id(tx))
+
+	def stream_export(self, business_uuid: str, format: str = "csv", compress: bool = False) -> AsyncIterator[bytes]:
+		"""
+		Stream a full-history export as CSV or NDJSON, one page at a time.
+		The format is validated here so errors surface before streaming starts.
+		"""
+		if format not in EXPORT_STREAM_FORMATS:
+			raise ValueError(f"Unsupported export format: {format}")
+		return self._stream_export(business_uuid, format, compress)
+
+	async def _stream_export(self, business_uuid: str, format: str, compress: bool) -> AsyncIterator[bytes]:
+		try:
+			# gzip framing (wbits=31); each chunk is sync-flushed so clients receive rows as they are produced
+			compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+			if format == "csv":
+				buffer = StringIO()
+				writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+				writer.writeheader()
+				yield self._export_chunk(buffer.getvalue().encode('utf-8'), compressor)
+
+			async for page in self.iter_transaction_pages(business_uuid):
+				if format == "csv":
+					buffer.seek(0)
+					buffer.truncate()
+					writer.writerows(self._csv_row(transaction) for transaction in page)
+					chunk = buffer.getvalue().encode('utf-8')
+				else:
+					chunk = "".join(json.dumps(transaction, separators=(',', ':')) + "\n" for transaction in page).encode('utf-8')
+				yield self._export_chunk(chunk, compressor)
+
+			if compressor:
+				yield compressor.flush()
+		except Exception as e:
+			logger.error(f"Failed to stream export: {str(e)}")
+			raise
+
+	def _export_chunk(self, chunk: bytes, compressor) -> bytes:
+		if compressor is None:
+			return chunk
+		return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+	def _generate_time_series(self, columns: TransactionColumns, start_date: datetime, end_date: datetime) -> List[Dict]:
 		# Generate time series data for visualization
+		days = columns.days()
+		daily_volumes = group_sum(days, columns.amounts)
+		daily_counts = group_count(days)
+
 		time_series = []
 		current_date = start_date
 		while current_date <= end_date:
-			daily_transactions = [tx for tx in transactions if tx.get('timestamp', '').startswith(current_date.date().isoformat())]
+			day = epoch_day(current_date.date())
 			time_series.append({
 				"date": current_date.date().isoformat(),
-				"volume": sum(float(tx.get('amount', 0)) for tx in daily_transactions),
-				"count": len(daily_transactions)
+				"volume": daily_volumes.get(day, 0),
+				"count": daily_counts.get(day, 0)
 			})
 			current_date += timedelta(days=1)
 		return time_series
 
-	def _analyze_transaction_distribution(self, transactions: List[Dict]) -> Dict[str, Any]:
+	def _analyze_transaction_distribution(self, columns: TransactionColumns) -> Dict[str, Any]:
 		# Analyze transaction size distribution
-		if not transactions:
+		if not len(columns):
 			return {"small": 0, "medium": 0, "large": 0}
 
-		amounts = [float(tx.get('amount', 0)) for tx in transactions]
-		max_amount = max(amounts)
-		
-		return {
-			"small": len([a for a in amounts if a <= max_amount * 0.33]),
-			"medium": len([a for a in amounts if max_amount * 0.33 < a <= max_amount * 0.66]),
-			"large": len([a for a in amounts if a > max_amount * 0.66])
-		}
+		max_amount = max(columns.amounts)
+		small_limit = max_amount * 0.33
+		medium_limit = max_amount * 0.66
 
-	def _analyze_customer_behavior(self, transactions: List[Dict]) -> Dict[str, Any]:
-		customer_data = defaultdict(list)
-		for tx in transactions:
-			customer_data[tx.get('from_address', '')].append(float(tx.get('amount', 0)))
+		small = medium = large = 0
+		for amount in columns.amounts:
+			if amount <= small_limit:
+				small += 1
+			elif amount <= medium_limit:
+				medium += 1
+			if amount > medium_limit:
+				large += 1
+		return {"small": small, "medium": medium, "large": large}
+
+	def _analyze_customer_behavior(self, columns: TransactionColumns) -> Dict[str, Any]:
+		totals, counts = columns.customer_totals()
 		
 		return {
-			"repeat_customers": len([c for c in customer_data.values() if len(c) > 1]),
+			"repeat_customers": sum(1 for c in counts if c > 1),
 			"customer_segments": {
-				"high_value": len([c for c in customer_data.values() if sum(c) > 1000]),
-				"medium_value": len([c for c in customer_data.values() if 100 <= sum(c) <= 1000]),
-				"low_value": len([c for c in customer_data.values() if sum(c) < 100])
+				"high_value": sum(1 for total in totals if total > 1000),
+				"medium_value": sum(1 for total in totals if 100 <= total <= 1000),
+				"low_value": sum(1 for total in totals if total < 100)
 			},
-			"average_customer_value": sum(sum(amounts) for amounts in customer_data.values()) / len(customer_data) if customer_data else 0
+			"average_customer_value": sum(totals) / len(totals) if totals else 0
 		}
 
-	def _analyze_hourly_patterns(self, transactions: List[Dict]) -> Dict[str, Any]:
-		hourly_data = defaultdict(int)
-		for tx in transactions:
-			hour = datetime.fromisoformat(tx.get('timestamp', '')).hour
-			hourly_data[hour] += 1
+	def _analyze_hourly_patterns(self, columns: TransactionColumns) -> Dict[str, Any]:
+		hourly_data = group_count(columns.hours())
 		
 		return {
 			"peak_hours": sorted(hourly_data.items(), key=lambda x: x[1], reverse=True)[:3],
@@ -110,29 +214,25 @@ class AnalyticsService:
 			"hourly_distribution": dict(sorted(hourly_data.items()))
 		}
 
-	def _calculate_growth_metrics(self, transactions: List[Dict], start_date: datetime, end_date: datetime) -> Dict[str, Any]:
-		if not transactions:
+	def _calculate_growth_metrics(self, columns: TransactionColumns, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+		if not len(columns):
 			return {"growth_rate": 0, "projected_growth": 0}
 		
-		# Sort transactions by date
-		sorted_txs = sorted(transactions, key=lambda x: x.get('timestamp', ''))
 		days_span = (end_date - start_date).days or 1
 		
-		# Calculate daily averages
-		daily_volumes = defaultdict(float)
-		for tx in transactions:
-			date = datetime.fromisoformat(tx.get('timestamp', '')).date()
-			daily_volumes[date] += float(tx.get('amount', 0))
+		# Calculate daily volumes, keyed in order of first appearance
+		daily_volumes = list(group_sum(columns.days(), columns.amounts).values())
 		
 		if len(daily_volumes) > 1:
-			growth_rate = (list(daily_volumes.values())[-1] - list(daily_volumes.values())[0]) / list(daily_volumes.values())[0]
+			growth_rate = (daily_volumes[-1] - daily_volumes[0]) / daily_volumes[0]
 		else:
 			growth_rate = 0
 		
+		total_volume = sum(daily_volumes)
 		return {
 			"growth_rate": growth_rate,
-			"daily_average_volume": sum(daily_volumes.values()) / len(daily_volumes) if daily_volumes else 0,
-			"projected_monthly_volume": (sum(daily_volumes.values()) / days_span) * 30
+			"daily_average_volume": total_volume / len(daily_volumes),
+			"projected_monthly_volume": (total_volume / days_span) * 30
 		}
 
 	def _export_to_csv(self, data: List[Dict]) -> bytes:
@@ -140,23 +240,24 @@ class AnalyticsService:
 		if not data:
 			return b""
 		
-		fieldnames = ['timestamp', 'amount', 'from_address', 'to_address', 'status', 'transaction_id']
-		writer = csv.DictWriter(output, fieldnames=fieldnames)
+		writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS)
 		writer.writeheader()
 		
 		for transaction in data:
-			row = {
-				'timestamp': transaction.get('timestamp', ''),
-				'amount': transaction.get('amount', '0'),
-				'from_address': transaction.get('from_address', ''),
-				'to_address': transaction.get('to_address', ''),
-				'status': transaction.get('status', ''),
-				'transaction_id': transaction.get('transaction_id', '')
-			}
-			writer.writerow(row)
+			writer.writerow(self._csv_row(transaction))
 		
 		return output.getvalue().encode('utf-8')
 
+	def _csv_row(self, transaction: Dict) -> Dict[str, Any]:
+		return {
+			'timestamp': transaction.get('timestamp', ''),
+			'amount': transaction.get('amount', '0'),
+			'from_address': transaction.get('from_address', ''),
+			'to_address': transaction.get('to_address', ''),
+			'status': transaction.get('status', ''),
+			'transaction_id': transaction_id(transaction)
+		}
+
 	def _export_to_json(self, data: List[Dict]) -> bytes:
 		formatted_data = {
 			'transactions': data,
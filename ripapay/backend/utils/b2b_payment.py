@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional
 import logging
-from qubipy.rpc.rpc_client import QubiPy_RPC
+from .qubic_rpc import AsyncQubicRPC
+from .balance_cache import TickAwareCache
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -9,8 +10,9 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 class B2BPaymentService:
-	def __init__(self, qubic_client: QubiPy_RPC):
+	def __init__(self, qubic_client: AsyncQubicRPC, balance_cache: Optional[TickAwareCache] = None):
 		self.qubic_client = qubic_client
+		self.balance_cache = balance_cache
 		self.supported_chains = {
 			"qubic": {
 				"name": "Qubic",
@@ -83,6 +85,10 @@ class B2BPaymentService:
 			}
 
 			result = await self.qubic_client.create_transaction(tx_data)
+
+			if self.balance_cache is not None:
+				self.balance_cache.invalidate_address(tx_data["source"])
+				self.balance_cache.invalidate_address(tx_data["destination"])
 			return result
 
 		except Exception as e:
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class _Entry:
+	__slots__ = ("value", "tick", "stored_at")
+
+	def __init__(self, value: Any, tick: Optional[int], stored_at: float):
+		self.value = value
+		self.tick = tick
+		self.stored_at = stored_at
+
+class TickAwareCache:
+	"""
+	Bounded LRU cache of per-address lookups (balances, account details).
+	Balances can only change when a tick is processed, so an entry stays
+	fresh until the chain tick advances or the address is invalidated after
+	one of our own submissions. max_age bounds staleness when no tick feed
+	is running. With stale_while_revalidate, a stale entry is returned
+	immediately while a single background refresh replaces it.
+	"""
+	def __init__(
+		self,
+		max_entries: int = 10000,
+		max_age: Optional[float] = 5.0,
+		stale_while_revalidate: bool = False
+	):
+		self.max_entries = max_entries
+		self.max_age = max_age
+		self.stale_while_revalidate = stale_while_revalidate
+		self.current_tick: Optional[int] = None
+		self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+		self._refreshing: Dict[Tuple[str, str], asyncio.Task] = {}
+		self._kinds: Set[str] = set()
+		self._invalidations = 0
+		self._stats = {"hits": 0, "misses": 0, "stale_served": 0, "invalidations": 0}
+
+	def advance_tick(self, tick: int) -> None:
+		# Entries are stamped with the tick they were loaded at, so this is O(1)
+		if self.current_tick is None or tick > self.current_tick:
+			self.current_tick = tick
+
+	def invalidate_address(self, address: Optional[str]) -> None:
+		if not address:
+			return
+		self._invalidations += 1
+		for kind in self._kinds:
+			if self._entries.pop((kind, address), None) is not None:
+				self._stats["invalidations"] += 1
+
+	async def get_or_load(self, kind: str, address: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+		key = (kind, address)
+		entry = self._entries.get(key)
+		if entry is not None:
+			if self._is_fresh(entry):
+				self._entries.move_to_end(key)
+				self._stats["hits"] += 1
+				return entry.value
+			if self.stale_while_revalidate:
+				self._stats["stale_served"] += 1
+				self._refresh_in_background(key, loader)
+				return entry.value
+
+		self._stats["misses"] += 1
+		return await self._load(key, loader)
+
+	def stats(self) -> Dict[str, Any]:
+		return {**self._stats, "entries": len(self._entries), "current_tick": self.current_tick}
+
+	def _is_fresh(self, entry: _Entry) -> bool:
+		if entry.tick != self.current_tick:
+			return False
+		return self.max_age is None or time.time() - entry.stored_at < self.max_age
+
+	async def _load(self, key: Tuple[str, str], loader: Callable[[], Awaitable[Any]]) -> Any:
+		# Stamp with the tick seen before loading so a tick that lands mid-call marks the entry stale
+		tick = self.current_tick
+		invalidations = self._invalidations
+		value = await loader()
+		if invalidations != self._invalidations:
+			# An invalidation raced with this load, so keep the value but never serve it as fresh
+			tick = -1
+		self._kinds.add(key[0])
+		self._entries[key] = _Entry(value, tick, time.time())
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+		return value
+
+	def _refresh_in_background(self, key: Tuple[str, str], loader: Callable[[], Awaitable[Any]]) -> None:
+		if key in self._refreshing:
+			return
+
+		async def refresh():
+			try:
+				await self._load(key, loader)
+			except Exception as e:
+				logger.error(f"Failed to refresh cached {key[0]} for {key[1]}: {str(e)}")
+			finally:
+				self._refreshing.pop(key, None)
+
+		self._refreshing[key] = asyncio.create_task(refresh())
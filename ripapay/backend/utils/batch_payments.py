@@ -0,0 +1,286 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from .qubic_rpc import QubicRPCError
+from .transaction_builder import TransactionBuilder
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 10000
+
+# Item states. An item is marked submitting right before it is broadcast, so
+# one still submitting when a batch is resumed may or may not have been paid.
+# Failed items provably were not paid and are retried; unknown ones are not.
+PENDING = "pending"
+SUBMITTING = "submitting"
+SUBMITTED = "submitted"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payment_batches (
+	id TEXT PRIMARY KEY,
+	fingerprint TEXT NOT NULL,
+	total INTEGER NOT NULL,
+	created_at REAL NOT NULL,
+	updated_at REAL NOT NULL,
+	lease_owner TEXT,
+	lease_expires REAL
+);
+CREATE TABLE IF NOT EXISTS batch_items (
+	batch_id TEXT NOT NULL,
+	idx INTEGER NOT NULL,
+	status TEXT NOT NULL,
+	transaction_id TEXT,
+	result TEXT,
+	error TEXT,
+	updated_at REAL NOT NULL,
+	PRIMARY KEY (batch_id, idx)
+);
+"""
+
+class BatchStore:
+	"""
+	SQLite record of payout batches and the state of every item, so a batch
+	that fails part way can be resumed without paying any item twice. A
+	batch is only processed under a lease row, so two workers sharing the
+	database never broadcast the same batch at once.
+	"""
+	def __init__(self, path: str = ":memory:"):
+		self.path = path
+		self._lock = threading.Lock()
+		self._conn = sqlite3.connect(path, check_same_thread=False)
+		self._conn.row_factory = sqlite3.Row
+		if path != ":memory:":
+			self._conn.execute("PRAGMA journal_mode=WAL")
+			self._conn.execute("PRAGMA synchronous=NORMAL")
+		self._conn.executescript(_SCHEMA)
+		columns = {row[1] for row in self._conn.execute("PRAGMA table_info(payment_batches)")}
+		if "lease_owner" not in columns:
+			self._conn.execute("ALTER TABLE payment_batches ADD COLUMN lease_owner TEXT")
+			self._conn.execute("ALTER TABLE payment_batches ADD COLUMN lease_expires REAL")
+		self._conn.commit()
+
+	def close(self) -> None:
+		with self._lock:
+			self._conn.close()
+
+	def open_batch(self, batch_id: str, fingerprint: str, total: int) -> bool:
+		"""Create the batch, or check that a resumed batch has the same items; True if it already existed"""
+		now = time.time()
+		with self._lock:
+			row = self._conn.execute("SELECT fingerprint FROM payment_batches WHERE id = ?", (batch_id,)).fetchone()
+			if row is not None:
+				if row["fingerprint"] != fingerprint:
+					raise ValueError(f"Batch {batch_id} already exists with different items")
+				return True
+			self._conn.execute(
+				"INSERT INTO payment_batches (id, fingerprint, total, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+				(batch_id, fingerprint, total, now, now)
+			)
+			self._conn.executemany(
+				"INSERT INTO batch_items (batch_id, idx, status, updated_at) VALUES (?, ?, ?, ?)",
+				((batch_id, idx, PENDING, now) for idx in range(total))
+			)
+			self._conn.commit()
+		return False
+
+	def claim(self, batch_id: str, owner: str, ttl: float) -> bool:
+		"""Take or renew the batch lease; False while another owner holds an unexpired one"""
+		now = time.time()
+		with self._lock:
+			cursor = self._conn.execute(
+				"""
+				UPDATE payment_batches SET lease_owner = ?, lease_expires = ?
+				WHERE id = ? AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires < ?)
+				""",
+				(owner, now + ttl, batch_id, owner, now)
+			)
+			self._conn.commit()
+			return cursor.rowcount == 1
+
+	def release(self, batch_id: str, owner: str) -> None:
+		with self._lock:
+			self._conn.execute(
+				"UPDATE payment_batches SET lease_owner = NULL, lease_expires = NULL WHERE id = ? AND lease_owner = ?",
+				(batch_id, owner)
+			)
+			self._conn.commit()
+
+	def items(self, batch_id: str) -> List[Dict[str, Any]]:
+		with self._lock:
+			rows = self._conn.execute(
+				"SELECT idx, status, transaction_id, result, error FROM batch_items WHERE batch_id = ? ORDER BY idx",
+				(batch_id,)
+			).fetchall()
+		return [
+			{
+				"index": row["idx"],
+				"status": row["status"],
+				"transaction_id": row["transaction_id"],
+				"result": json.loads(row["result"]) if row["result"] else None,
+				"error": row["error"]
+			}
+			for row in rows
+		]
+
+	def update_item(
+		self,
+		batch_id: str,
+		idx: int,
+		status: str,
+		transaction_id: Optional[str] = None,
+		result: Optional[Dict[str, Any]] = None,
+		error: Optional[str] = None
+	) -> None:
+		now = time.time()
+		with self._lock:
+			self._conn.execute(
+				"""
+				UPDATE batch_items SET status = ?, transaction_id = ?, result = ?, error = ?, updated_at = ?
+				WHERE batch_id = ? AND idx = ?
+				""",
+				(status, transaction_id, json.dumps(result) if result is not None else None, error, now, batch_id, idx)
+			)
+			self._conn.execute("UPDATE payment_batches SET updated_at = ? WHERE id = ?", (now, batch_id))
+			self._conn.commit()
+
+	def mark_unknown(self, batch_id: str) -> int:
+		"""Items left submitting by an interrupted run; their outcome cannot be known from here"""
+		with self._lock:
+			cursor = self._conn.execute(
+				"UPDATE batch_items SET status = ?, error = ?, updated_at = ? WHERE batch_id = ? AND status = ?",
+				(UNKNOWN, "Interrupted while broadcasting; check the ledger before paying again", time.time(), batch_id, SUBMITTING)
+			)
+			self._conn.commit()
+			return cursor.rowcount
+
+class BatchPaymentService:
+	"""
+	Submits payout batches. The whole batch is validated and priced up
+	front, then broadcast by a fixed pool of workers. Item state is persisted
+	as it changes, so resubmitting the same batch_id only retries never-sent
+	items and items the node provably did not accept. Items whose broadcast
+	was interrupted or ended ambiguously (a timeout, a 5xx) are reported as
+	unknown instead of being sent again.
+	A batch without a batch_id gets a new one, so submitting identical items
+	twice is two payout runs; pass the returned batch_id to resume a batch.
+	"""
+	def __init__(
+		self,
+		transaction_builder: TransactionBuilder,
+		store: BatchStore,
+		max_concurrency: int = 32,
+		max_batch_size: int = MAX_BATCH_SIZE,
+		lease_ttl: float = 60.0
+	):
+		self.transaction_builder = transaction_builder
+		self.store = store
+		self.max_concurrency = max_concurrency
+		self.max_batch_size = max_batch_size
+		self.lease_ttl = lease_ttl
+		self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+	async def submit_batch(self, payments: List[Dict[str, Any]], batch_id: Optional[str] = None) -> Dict[str, Any]:
+		try:
+			await self._validate(payments)
+			fingerprint = hashlib.sha256(json.dumps(payments, sort_keys=True).encode()).hexdigest()
+			batch_id = batch_id or uuid.uuid4().hex
+
+			duplicate = self.store.open_batch(batch_id, fingerprint, len(payments))
+			if not self.store.claim(batch_id, self.owner, self.lease_ttl):
+				raise ValueError(f"Batch {batch_id} is already being processed")
+			renewal = asyncio.create_task(self._renew_lease(batch_id))
+			try:
+				self.store.mark_unknown(batch_id)
+				retry = [item["index"] for item in self.store.items(batch_id) if item["status"] in (PENDING, FAILED)]
+				prepared = self.transaction_builder.build_payments(payments[idx] for idx in retry)
+				await self._broadcast(batch_id, list(zip(retry, prepared)), renewal)
+			finally:
+				renewal.cancel()
+				self.store.release(batch_id, self.owner)
+
+			# duplicate: this batch_id already existed, so only its unsent items were retried
+			return {**self.get_batch(batch_id), "duplicate": duplicate}
+		except Exception as e:
+			logger.error(f"Batch submission failed: {str(e)}")
+			raise
+
+	def get_batch(self, batch_id: str) -> Dict[str, Any]:
+		items = self.store.items(batch_id)
+		if not items:
+			raise ValueError(f"Batch {batch_id} not found")
+		counts = {status: 0 for status in (PENDING, SUBMITTING, SUBMITTED, FAILED, UNKNOWN)}
+		results = []
+		for item in items:
+			counts[item["status"]] += 1
+			results.append({
+				"index": item["index"],
+				"status": item["status"],
+				"transaction_id": item["transaction_id"],
+				**({k: item["result"][k] for k in ("amount", "fee", "net_amount")} if item["result"] else {}),
+				"error": item["error"]
+			})
+		return {
+			"batch_id": batch_id,
+			"total": len(items),
+			**counts,
+			"complete": counts[SUBMITTED] == len(items),
+			"items": results
+		}
+
+	async def _validate(self, payments: List[Dict[str, Any]]) -> None:
+		if not payments:
+			raise ValueError("Batch contains no payments")
+		if len(payments) > self.max_batch_size:
+			raise ValueError(f"At most {self.max_batch_size} payments can be submitted in one batch")
+		errors = []
+		for idx, payment in enumerate(payments):
+			if not payment.get("amount") or payment["amount"] <= 0:
+				errors.append(f"item {idx}: amount must be positive")
+			if not re.match(r'^\d{8}$', str(payment.get("business_uuid", ""))):
+				errors.append(f"item {idx}: business UUID must be an 8-digit number")
+			for field in ("from_address", "to_address"):
+				if not await self.transaction_builder.rpc_client.validate_address(payment.get(field)):
+					errors.append(f"item {idx}: invalid {field}")
+		if errors:
+			raise ValueError("Invalid batch: " + "; ".join(errors[:20]) + (f" (+{len(errors) - 20} more)" if len(errors) > 20 else ""))
+
+	async def _broadcast(self, batch_id: str, work: List, lease: Optional[asyncio.Task] = None) -> None:
+		queue = iter(work)
+
+		async def worker():
+			for idx, payment in queue:
+				if lease is not None and lease.done():
+					# The lease was lost; whoever holds it now carries on with the rest
+					return
+				self.store.update_item(batch_id, idx, SUBMITTING)
+				try:
+					result = await self.transaction_builder.submit_payment(payment)
+				except QubicRPCError as e:
+					# Only a call that provably had no effect may be sent again
+					status = FAILED if e.safe_to_retry else UNKNOWN
+					self.store.update_item(batch_id, idx, status, error=str(e))
+					continue
+				except Exception as e:
+					self.store.update_item(batch_id, idx, UNKNOWN, error=str(e))
+					continue
+				self.store.update_item(batch_id, idx, SUBMITTED, transaction_id=result.get("transaction_id"), result=result)
+
+		await asyncio.gather(*(worker() for _ in range(min(self.max_concurrency, len(work)))))
+
+	async def _renew_lease(self, batch_id: str) -> None:
+		while True:
+			await asyncio.sleep(self.lease_ttl / 3)
+			if not self.store.claim(batch_id, self.owner, self.lease_ttl):
+				logger.error(f"Lost the lease on batch {batch_id}")
+				return
\ No newline at end of file
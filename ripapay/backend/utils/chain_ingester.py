@@ -0,0 +1,308 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import inspect
+import logging
+import re
+import time
+from .transaction_store import TransactionStore, CHAIN_SCOPE, business_reference
+from .timestamps import to_iso
+
+logger = logging.getLogger(__name__)
+
+LIVE_CHECKPOINT = "chain:live"
+
+def decode_transfer(tx: Dict[str, Any], tick: int) -> Optional[Dict[str, Any]]:
+	"""
+	Normalize an approved tick transaction into a RipaPay ledger record.
+	Returns None unless the transfer carries a business reference, either as
+	the reference field TransactionBuilder writes or as ASCII digits in the
+	transaction input payload.
+	"""
+	business_uuid = business_reference(tx)
+	if business_uuid is None:
+		input_hex = tx.get('inputHex') or ""
+		try:
+			decoded = bytes.fromhex(input_hex).decode('ascii', errors='ignore').strip('\x00 ')
+		except ValueError:
+			decoded = ""
+		if re.match(r'^\d{8}$', decoded):
+			business_uuid = decoded
+	if business_uuid is None:
+		return None
+
+	source = tx.get('sourceId') or tx.get('source')
+	destination = tx.get('destId') or tx.get('destination')
+	return {
+		"id": tx.get('txId') or tx.get('id'),
+		"tick": tick,
+		"source": source,
+		"destination": destination,
+		"from_address": source,
+		"to_address": destination,
+		"amount": float(tx.get('amount', 0) or 0),
+		"fee": tx.get('fee'),
+		"business_uuid": business_uuid,
+		"reference": business_uuid,
+		"status": "success"
+	}
+
+class ChainIngester:
+	"""
+	Follows the chain tick by tick and persists RipaPay transfers to the
+	transaction store. The last fully processed tick is checkpointed in the
+	store so restarts resume where they left off; ticks missed while down are
+	caught up with bounded concurrency but committed strictly in order.
+	A tick that keeps failing, including when its timestamp cannot be read,
+	is skipped so ingestion moves on, but it is recorded in the store and
+	retried every skipped_retry_interval seconds. Chain coverage is not
+	extended while any live tick is outstanding.
+	"""
+	def __init__(
+		self,
+		qubic_client,
+		store: TransactionStore,
+		max_concurrency: int = 8,
+		batch_size: int = 64,
+		poll_interval: float = 1.0,
+		max_tick_retries: int = 5,
+		start_tick: Optional[int] = None,
+		skipped_retry_interval: float = 60.0
+	):
+		self.qubic_client = qubic_client
+		self.store = store
+		self.max_concurrency = max_concurrency
+		self.batch_size = batch_size
+		self.poll_interval = poll_interval
+		self.max_tick_retries = max_tick_retries
+		self.start_tick = start_tick
+		self.skipped_retry_interval = skipped_retry_interval
+		self._skipped_retry_at: Dict[str, float] = {}
+		self.latest_tick: Optional[int] = None
+		self._transaction_listeners: List[Callable] = []
+		self._tick_listeners: List[Callable] = []
+		self._tick_failures: Dict[int, int] = {}
+		self._started_at: Optional[float] = None
+		self._task: Optional[asyncio.Task] = None
+		self._backfills: Dict[Tuple[int, int], asyncio.Task] = {}
+
+	def add_transaction_listener(self, callback: Callable[[Dict[str, Any]], Any]) -> None:
+		"""Called with every newly ingested RipaPay transfer"""
+		self._transaction_listeners.append(callback)
+
+	def add_tick_listener(self, callback: Callable[[int, List[Dict[str, Any]]], Any]) -> None:
+		"""Called once per processed tick with all of its approved transactions"""
+		self._tick_listeners.append(callback)
+
+	@property
+	def checkpoint(self) -> Optional[int]:
+		return self.store.get_checkpoint(LIVE_CHECKPOINT)
+
+	def start(self) -> None:
+		if self._task is None or self._task.done():
+			self._started_at = time.time()
+			self._task = asyncio.create_task(self._run())
+
+	async def stop(self) -> None:
+		tasks = [t for t in [self._task, *self._backfills.values()] if t is not None]
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+		self._task = None
+		self._backfills.clear()
+
+	def status(self) -> Dict[str, Any]:
+		return {
+			"running": self._task is not None and not self._task.done(),
+			"checkpoint": self.checkpoint,
+			"latest_tick": self.latest_tick,
+			"skipped_ticks": list(self.store.checkpoints(self._skipped_prefix(LIVE_CHECKPOINT)).values()),
+			"backfills": [
+				{
+					"start_tick": start,
+					"end_tick": end,
+					"checkpoint": self.store.get_checkpoint(self._backfill_checkpoint(start, end)),
+					"running": not task.done()
+				}
+				for (start, end), task in self._backfills.items()
+			]
+		}
+
+	def backfill(self, start_tick: int, end_tick: int) -> None:
+		"""Ingest a historical tick range in the background, resumable via its own checkpoint"""
+		if start_tick > end_tick:
+			raise ValueError("start_tick must not be greater than end_tick")
+		task = self._backfills.get((start_tick, end_tick))
+		if task is None or task.done():
+			self._backfills[(start_tick, end_tick)] = asyncio.create_task(self._run_backfill(start_tick, end_tick))
+
+	async def _run(self) -> None:
+		while True:
+			try:
+				self.latest_tick = await self._latest_tick()
+				cursor = self.checkpoint
+				if cursor is None:
+					cursor = (self.start_tick - 1) if self.start_tick is not None else self.latest_tick
+					self.store.set_checkpoint(LIVE_CHECKPOINT, cursor)
+
+				if cursor < self.latest_tick:
+					if not await self._process_range(LIVE_CHECKPOINT, cursor + 1, self.latest_tick, notify=True):
+						await asyncio.sleep(self.poll_interval)
+				else:
+					await self._retry_skipped(LIVE_CHECKPOINT, notify=True)
+					self._mark_caught_up()
+					await asyncio.sleep(self.poll_interval)
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				logger.error(f"Chain ingestion failed: {str(e)}")
+				await asyncio.sleep(self.poll_interval)
+
+	async def _run_backfill(self, start_tick: int, end_tick: int) -> None:
+		name = self._backfill_checkpoint(start_tick, end_tick)
+		try:
+			while True:
+				cursor = self.store.get_checkpoint(name)
+				cursor = start_tick - 1 if cursor is None else cursor
+				if cursor >= end_tick:
+					if not self.store.checkpoints(self._skipped_prefix(name)):
+						logger.debug(f"Backfill of ticks {start_tick}-{end_tick} complete")
+						return
+					await asyncio.sleep(max(self._skipped_retry_at.get(name, 0.0) - time.time(), self.poll_interval))
+					await self._retry_skipped(name, notify=False)
+					continue
+				if not await self._process_range(name, cursor + 1, end_tick, notify=False):
+					await asyncio.sleep(self.poll_interval)
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			logger.error(f"Backfill of ticks {start_tick}-{end_tick} failed: {str(e)}")
+
+	async def _process_range(self, checkpoint_name: str, first_tick: int, last_tick: int, notify: bool) -> bool:
+		"""Process ticks in order; returns False if it stopped early on a failed tick"""
+		semaphore = asyncio.Semaphore(self.max_concurrency)
+
+		async def fetch(tick: int):
+			async with semaphore:
+				return await self._fetch_tick(tick)
+
+		for batch_start in range(first_tick, last_tick + 1, self.batch_size):
+			ticks = list(range(batch_start, min(batch_start + self.batch_size, last_tick + 1)))
+			results = await asyncio.gather(*(fetch(tick) for tick in ticks), return_exceptions=True)
+
+			# Commit in tick order and stop at the first tick that could not be fetched
+			for tick, result in zip(ticks, results):
+				if isinstance(result, Exception):
+					if not self._should_skip(tick, result):
+						return False
+					# Left for _retry_skipped rather than committed with made-up data
+					self.store.set_checkpoint(f"{self._skipped_prefix(checkpoint_name)}{tick}", tick)
+					result = ([], [])
+				await self._commit_tick(checkpoint_name, tick, *result, notify)
+		return True
+
+	async def _fetch_tick(self, tick: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+		"""The tick's approved transactions and its RipaPay records, stamped with the tick time"""
+		transactions = await self._tick_transactions(tick)
+		records = [r for r in (decode_transfer(tx, tick) for tx in transactions) if r is not None]
+		if records:
+			timestamp = await self._tick_timestamp(tick)
+			for record in records:
+				record["timestamp"] = timestamp
+		return transactions, records
+
+	async def _retry_skipped(self, checkpoint_name: str, notify: bool) -> None:
+		if time.time() < self._skipped_retry_at.get(checkpoint_name, 0.0):
+			return
+		self._skipped_retry_at[checkpoint_name] = time.time() + self.skipped_retry_interval
+		for name, tick in self.store.checkpoints(self._skipped_prefix(checkpoint_name)).items():
+			try:
+				_, records = await self._fetch_tick(tick)
+			except Exception as e:
+				logger.debug(f"Retry of skipped tick {tick} failed: {str(e)}")
+				continue
+			if records:
+				self.store.upsert(records)
+			self.store.delete_checkpoint(name)
+			logger.info(f"Recovered skipped tick {tick} with {len(records)} transfers")
+			# Tick listeners follow the chain head, so only the transfers are announced
+			if notify:
+				for record in records:
+					for listener in self._transaction_listeners:
+						await self._notify(listener, record)
+
+	async def _commit_tick(
+		self,
+		checkpoint_name: str,
+		tick: int,
+		transactions: List[Dict[str, Any]],
+		records: List[Dict[str, Any]],
+		notify: bool
+	) -> None:
+		if records:
+			self.store.upsert(records)
+		self.store.set_checkpoint(checkpoint_name, tick)
+		self._tick_failures.pop(tick, None)
+
+		if notify:
+			for listener in self._tick_listeners:
+				await self._notify(listener, tick, transactions)
+			for record in records:
+				for listener in self._transaction_listeners:
+					await self._notify(listener, record)
+
+	def _should_skip(self, tick: int, error: Exception) -> bool:
+		failures = self._tick_failures.get(tick, 0) + 1
+		self._tick_failures[tick] = failures
+		if failures >= self.max_tick_retries:
+			logger.error(f"Skipping tick {tick} after {failures} failed attempts: {str(error)}")
+			return True
+		logger.debug(f"Failed to fetch tick {tick} (attempt {failures}): {str(error)}")
+		return False
+
+	def _mark_caught_up(self) -> None:
+		# Until skipped ticks are recovered the store may be missing their transfers
+		if self.store.checkpoints(self._skipped_prefix(LIVE_CHECKPOINT)):
+			return
+		# Every tick up to now has been processed, so the store is complete for all businesses
+		current = self.store.coverage(*CHAIN_SCOPE)
+		start = current[0] if current else self._started_at
+		self.store.mark_covered(*CHAIN_SCOPE, start, time.time())
+
+	def _backfill_checkpoint(self, start_tick: int, end_tick: int) -> str:
+		return f"chain:backfill:{start_tick}-{end_tick}"
+
+	@staticmethod
+	def _skipped_prefix(checkpoint_name: str) -> str:
+		return f"{checkpoint_name}:skipped:"
+
+	async def _notify(self, listener: Callable, *args) -> None:
+		try:
+			result = listener(*args)
+			if inspect.isawaitable(result):
+				await result
+		except Exception as e:
+			logger.error(f"Ingestion listener failed: {str(e)}")
+
+	async def _latest_tick(self) -> int:
+		return int(await self._call(self.qubic_client.get_latest_tick))
+
+	async def _tick_transactions(self, tick: int) -> List[Dict[str, Any]]:
+		return await self._call(self.qubic_client.get_approved_transaction_for_tick, tick) or []
+
+	async def _tick_timestamp(self, tick: int) -> str:
+		"""Raises when the node has no timestamp, so the tick is retried instead of stamped with the ingestion time"""
+		tick_data = await self._call(self.qubic_client.get_tick_data, tick) or {}
+		timestamp = tick_data.get('timestamp')
+		if timestamp is not None and str(timestamp).isdigit():
+			# The node reports tick timestamps in milliseconds
+			return to_iso(int(timestamp) / 1000)
+		if timestamp:
+			return str(timestamp)
+		raise ValueError(f"No timestamp for tick {tick}")
+
+	async def _call(self, method: Callable[..., Any], *args) -> Any:
+		# Synchronous clients such as QubiPy_RPC are run off the event loop
+		if inspect.iscoroutinefunction(method):
+			return await method(*args)
+		loop = asyncio.get_event_loop()
+		return await loop.run_in_executor(None, method, *args)
@@ -0,0 +1,346 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+import asyncio
+import inspect
+import logging
+import uuid
+from .timestamps import to_epoch
+from .transaction_builder import TransactionBuilder
+from .transaction_store import TransactionStore, transaction_id
+
+logger = logging.getLogger(__name__)
+
+SUBMITTING = "submitting"
+PENDING = "pending"
+SUCCESS = "success"
+FAILED = "failed"
+# A broadcast that failed or was interrupted after the payment may have been sent
+UNKNOWN = "unknown"
+
+class ConfirmationWatcher:
+	"""
+	Submit-then-track lifecycle for payments.
+	submit() records the payment and returns a handle right away while the
+	broadcast runs in the background. on_tick() is registered as a chain
+	ingester tick listener: each processed tick is scanned once against every
+	tracked transaction, moving it from pending to success (counting
+	confirmations) or to failed when it is not included within expiry_ticks.
+	Every change is written to the store and pushed to subscribers, so
+	clients no longer poll the node per transaction.
+	Unfinished submissions are reloaded from the store by start(). Without
+	the chain ingester, start(poll_interval) advances them by polling the
+	node for the latest tick and each pending transaction instead.
+	Only a broadcast that provably had no effect is marked failed. Any other
+	broadcast error leaves the submission unknown; the node gave no
+	transaction id, so for expiry_ticks the store is searched for a transfer
+	with the same source, destination and amount, and one that is found
+	turns the submission into a success.
+	"""
+	def __init__(
+		self,
+		transaction_builder: TransactionBuilder,
+		store: TransactionStore,
+		required_confirmations: int = 3,
+		expiry_ticks: int = 30,
+		max_concurrency: int = 32,
+		interrupted_after: float = 300.0
+	):
+		self.transaction_builder = transaction_builder
+		self.store = store
+		self.required_confirmations = required_confirmations
+		self.expiry_ticks = expiry_ticks
+		self.interrupted_after = interrupted_after
+		self.latest_tick: Optional[int] = None
+		self._semaphore = asyncio.Semaphore(max_concurrency)
+		self._records: Dict[str, Dict[str, Any]] = {}
+		self._by_transaction: Dict[str, str] = {}
+		# Unknown submissions still being looked for on chain
+		self._unknown: Set[str] = set()
+		self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+		self._listeners: List[Callable[[Dict[str, Any]], Any]] = []
+		self._tasks: Set[asyncio.Task] = set()
+		self._poller: Optional[asyncio.Task] = None
+
+	def start(self, poll_interval: Optional[float] = None) -> None:
+		"""Resume tracking submissions left unfinished by a previous run; poll the node if given an interval"""
+		for record in self.store.submissions_with_status((SUBMITTING, PENDING, SUCCESS, UNKNOWN)):
+			if record["submission_id"] in self._records or self.is_final(record):
+				continue
+			if record["status"] == SUBMITTING:
+				# Another worker may still be broadcasting it; past interrupted_after it died with its process
+				age = (datetime.utcnow() - datetime.fromisoformat(record["submitted_at"])).total_seconds()
+				if age < self.interrupted_after:
+					continue
+				self._watch_unknown(record, "Interrupted while broadcasting")
+				self.store.save_submission(record)
+			self._records[record["submission_id"]] = record
+			if record["status"] == UNKNOWN:
+				self._unknown.add(record["submission_id"])
+			elif record["transaction_id"]:
+				self._by_transaction[record["transaction_id"]] = record["submission_id"]
+		if self._records:
+			logger.info(f"Resumed tracking {len(self._records)} submissions")
+		if poll_interval and self._poller is None:
+			self._poller = asyncio.create_task(self._poll(poll_interval))
+
+	def add_listener(self, callback: Callable[[Dict[str, Any]], Any]) -> None:
+		"""Called with a copy of a submission every time its state changes"""
+		self._listeners.append(callback)
+
+	def submit(self, from_address: str, to_address: str, amount: float, business_uuid: str) -> Dict[str, Any]:
+		payment = self.transaction_builder.build_payments([{
+			"from_address": from_address,
+			"to_address": to_address,
+			"amount": amount,
+			"business_uuid": business_uuid
+		}])[0]
+		submission_id = uuid.uuid4().hex
+		record = {
+			"submission_id": submission_id,
+			"transaction_id": None,
+			"status": SUBMITTING,
+			"confirmations": 0,
+			"block_height": None,
+			"source": from_address,
+			"destination": to_address,
+			"business_uuid": business_uuid,
+			"amount": payment["amount"],
+			"fee": payment["fee"],
+			"net_amount": payment["net_amount"],
+			"submitted_at": datetime.utcnow().isoformat(),
+			"expires_at_tick": None,
+			"error": None
+		}
+		self._records[submission_id] = record
+		self.store.save_submission(record)
+
+		task = asyncio.create_task(self._broadcast(submission_id, payment))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+		return dict(record)
+
+	def get(self, handle: str) -> Optional[Dict[str, Any]]:
+		"""
+		Look up a submission by its submission id or transaction id. Every
+		change is saved before it is published, so the store is current even
+		for submissions another worker is tracking.
+		"""
+		record = self._records.get(handle) or self._records.get(self._by_transaction.get(handle, ""))
+		if record is not None:
+			return dict(record)
+		return self.store.get_submission(handle)
+
+	def is_final(self, record: Dict[str, Any]) -> bool:
+		if record["status"] == FAILED:
+			return True
+		if record["status"] == UNKNOWN:
+			return not record.get("watching")
+		return record["status"] == SUCCESS and record["confirmations"] >= self.required_confirmations
+
+	def subscribe(self, submission_id: str) -> asyncio.Queue:
+		queue = asyncio.Queue(maxsize=100)
+		self._subscribers.setdefault(submission_id, []).append(queue)
+		return queue
+
+	def unsubscribe(self, submission_id: str, queue: asyncio.Queue) -> None:
+		queues = self._subscribers.get(submission_id, [])
+		if queue in queues:
+			queues.remove(queue)
+		if not queues:
+			self._subscribers.pop(submission_id, None)
+
+	async def on_tick(self, tick: int, transactions: List[Dict[str, Any]]) -> None:
+		self.latest_tick = tick
+		if not self._by_transaction and not self._unknown:
+			return
+		await self._advance(tick, {tx.get('txId') or tx.get('id'): tick for tx in transactions})
+
+	async def _advance(self, tick: int, included: Dict[str, int]) -> None:
+		"""Move tracked submissions forward to tick; included maps transaction ids to the tick they landed in"""
+		changed = []
+		for submission_id in list(self._unknown):
+			record = self._records[submission_id]
+			landed = self._find_landed(record)
+			if landed is not None:
+				# Confirmations are counted below like any other landed transaction
+				self._unknown.discard(submission_id)
+				record["transaction_id"] = transaction_id(landed)
+				record["status"] = SUCCESS
+				record["block_height"] = landed.get("tick") or tick
+				record["watching"] = False
+				record["error"] = None
+				self._by_transaction[record["transaction_id"]] = submission_id
+			elif record["expires_at_tick"] is None:
+				record["expires_at_tick"] = tick + self.expiry_ticks
+			elif tick > record["expires_at_tick"]:
+				self._unknown.discard(submission_id)
+				record["watching"] = False
+				record["error"] = f"Not seen on chain within {self.expiry_ticks} ticks; check the ledger before paying again"
+				changed.append(record)
+
+		for tx_id, submission_id in list(self._by_transaction.items()):
+			record = self._records[submission_id]
+			if record["status"] == PENDING:
+				if tx_id in included:
+					record["status"] = SUCCESS
+					record["block_height"] = included[tx_id]
+				elif record["expires_at_tick"] is None:
+					record["expires_at_tick"] = tick + self.expiry_ticks
+					continue
+				elif tick <= record["expires_at_tick"]:
+					continue
+				elif self._landed(record):
+					record["status"] = SUCCESS
+				else:
+					record["status"] = FAILED
+					record["error"] = f"Not included within {self.expiry_ticks} ticks"
+			if record["status"] == SUCCESS:
+				confirmations = min(tick - record["block_height"] + 1, self.required_confirmations)
+				if confirmations == record["confirmations"]:
+					continue
+				record["confirmations"] = confirmations
+			changed.append(record)
+
+		for record in changed:
+			await self._publish(record)
+
+	async def close(self, timeout: float = 10.0) -> None:
+		"""Give in-flight broadcasts a chance to record their outcome"""
+		if self._poller is not None:
+			self._poller.cancel()
+			await asyncio.gather(self._poller, return_exceptions=True)
+			self._poller = None
+		if self._tasks:
+			await asyncio.wait(set(self._tasks), timeout=timeout)
+
+	async def _broadcast(self, submission_id: str, payment: Dict[str, Any]) -> None:
+		record = self._records[submission_id]
+		async with self._semaphore:
+			try:
+				result = await self.transaction_builder.submit_payment(payment)
+			except Exception as e:
+				logger.error(f"Failed to broadcast submission {submission_id}: {str(e)}")
+				if getattr(e, "safe_to_retry", False) or isinstance(e, ValueError):
+					record["status"] = FAILED
+					record["error"] = str(e)
+				else:
+					# A timeout or dropped connection may still have delivered it to the node
+					self._watch_unknown(record, f"Broadcast failed: {str(e)}")
+					self._unknown.add(submission_id)
+				await self._publish(record)
+				return
+
+		record["transaction_id"] = result.get("transaction_id")
+		record["status"] = PENDING
+		if self.latest_tick is not None:
+			record["expires_at_tick"] = self.latest_tick + self.expiry_ticks
+		if record["transaction_id"]:
+			self._by_transaction[record["transaction_id"]] = submission_id
+			if self._landed(record):
+				# The ingester already saw it in a tick processed while we were waiting on the node
+				record["status"] = SUCCESS
+				record["confirmations"] = min(1, self.required_confirmations)
+		await self._publish(record)
+
+	async def _poll(self, interval: float) -> None:
+		rpc_client = self.transaction_builder.rpc_client
+		while True:
+			await asyncio.sleep(interval)
+			if not self._by_transaction and not self._unknown:
+				continue
+			try:
+				pending = [
+					tx_id for tx_id, submission_id in self._by_transaction.items()
+					if self._records[submission_id]["status"] == PENDING
+				]
+
+				async def lookup(tx_id: str):
+					async with self._semaphore:
+						try:
+							return tx_id, await rpc_client.get_transaction(tx_id)
+						except Exception as e:
+							logger.debug(f"Failed to poll transaction {tx_id}: {str(e)}")
+							return tx_id, None
+
+				included = {}
+				for tx_id, tx in await asyncio.gather(*(lookup(tx_id) for tx_id in pending)):
+					if tx and tx.get("status") == SUCCESS and tx.get("tick") is not None:
+						included[tx_id] = int(tx["tick"])
+				tick = max(int(await rpc_client.get_latest_tick()), *included.values(), self.latest_tick or 0)
+				self.latest_tick = tick
+				await self._advance(tick, included)
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				logger.error(f"Confirmation polling failed: {str(e)}")
+
+	def _watch_unknown(self, record: Dict[str, Any], reason: str) -> None:
+		record["status"] = UNKNOWN
+		record["error"] = f"{reason}; check the ledger before paying again"
+		record["watching"] = True
+		record["expires_at_tick"] = self.latest_tick + self.expiry_ticks if self.latest_tick is not None else None
+
+	def _find_landed(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		"""A stored transfer matching an unknown submission that no other submission has claimed"""
+		candidates = self.store.find_transfers(
+			record["source"],
+			record["destination"],
+			# What the node was sent: the net amount in whole units
+			float(int(record["net_amount"])),
+			to_epoch(record["submitted_at"], default=0.0)
+		)
+		for tx in candidates:
+			claimed = self.store.get_submission(transaction_id(tx))
+			if claimed is None or claimed["submission_id"] == record["submission_id"]:
+				return tx
+		return None
+
+	def _landed(self, record: Dict[str, Any]) -> bool:
+		stored = self.store.get(record["transaction_id"])
+		if stored is None or stored.get("status") != SUCCESS:
+			return False
+		record["block_height"] = stored.get("tick") or self.latest_tick
+		return True
+
+	async def _publish(self, record: Dict[str, Any]) -> None:
+		self.store.save_submission(record)
+		if record["transaction_id"]:
+			self.store.upsert([self._transaction_record(record)])
+
+		snapshot = dict(record)
+		for queue in self._subscribers.get(record["submission_id"], []):
+			if queue.full():
+				queue.get_nowait()
+			queue.put_nowait(snapshot)
+		for listener in self._listeners:
+			try:
+				result = listener(dict(snapshot))
+				if inspect.isawaitable(result):
+					await result
+			except Exception as e:
+				logger.error(f"Confirmation listener failed: {str(e)}")
+
+		if self.is_final(record):
+			# Finished submissions are served from the store from now on
+			self._by_transaction.pop(record["transaction_id"], None)
+			self._unknown.discard(record["submission_id"])
+			self._records.pop(record["submission_id"], None)
+
+	def _transaction_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+		return {
+			"id": record["transaction_id"],
+			"submission_id": record["submission_id"],
+			"timestamp": record["submitted_at"],
+			"source": record["source"],
+			"destination": record["destination"],
+			"from_address": record["source"],
+			"to_address": record["destination"],
+			"amount": record["net_amount"],
+			"fee": record["fee"],
+			"business_uuid": record["business_uuid"],
+			"reference": record["business_uuid"],
+			"status": record["status"],
+			"tick": record["block_height"],
+			"block_height": record["block_height"],
+			"confirmations": record["confirmations"]
+		}
\ No newline at end of file
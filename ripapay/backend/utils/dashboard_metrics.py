@@ -1,94 +1,119 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from qubipy.rpc.rpc_client import QubiPy_RPC
+from .qubic_rpc import AsyncQubicRPC
 import logging
+import time
+from .metrics_engine import MetricsEngine, default_metrics_engine
+from .rolling_window import RollingWindowAggregator
+from .single_flight import SingleFlight
+from .transaction_store import TransactionLedger
 
 logger = logging.getLogger(__name__)
 
+METRICS_WINDOW = timedelta(hours=24)
+
 class DashboardMetricsService:
-	def __init__(self, qubic_client: QubiPy_RPC):
+	"""
+	Serves dashboard metrics from one of two backends:
+	- "fetch": fetch the 24h window on each call and compute it with the metrics engine
+	- "rolling": answer from incrementally maintained rolling-window aggregates,
+	  rebuilt from history when a business is first requested, or when neither
+	  a rebuild nor the live feed (observe_tick) has refreshed it in max_staleness seconds
+	"""
+	def __init__(
+		self,
+		qubic_client: AsyncQubicRPC,
+		metrics_engine: Optional[MetricsEngine] = None,
+		backend: str = "fetch",
+		ledger: Optional[TransactionLedger] = None,
+		max_staleness: float = 300.0
+	):
+		if backend not in ("fetch", "rolling"):
+			raise ValueError(f"Unsupported metrics backend: {backend}")
 		self.qubic_client = qubic_client
+		self.metrics_engine = metrics_engine or default_metrics_engine()
+		self.backend = backend
+		self.ledger = ledger
+		self.rolling_window = RollingWindowAggregator(window=METRICS_WINDOW) if backend == "rolling" else None
+		self.max_staleness = max_staleness
+		# Concurrent requests for a cold or stale business share one rebuild
+		self._rebuilds = SingleFlight()
+		self._live_at: Optional[float] = None
 
 	async def get_key_metrics(self, business_uuid: str) -> Dict:
 		try:
 			# Get metrics for the last 24 hours
 			end_time = datetime.utcnow()
-			start_time = end_time - timedelta(hours=24)
+			start_time = end_time - METRICS_WINDOW
+
+			if self.rolling_window is not None:
+				if self._needs_rebuild(business_uuid):
+					await self._rebuilds.do(
+						"rebuild", business_uuid, lambda: self.rebuild_rolling_window(business_uuid)
+					)
+				return self.rolling_window.get_metrics(business_uuid)
 
-			# TODO: Implement actual metrics calculation using QubiPy
-			metrics = {
-				"total_transactions": await self._get_transaction_count(business_uuid, start_time, end_time),
-				"total_volume": await self._get_transaction_volume(business_uuid, start_time, end_time),
-				"average_transaction_size": await self._get_average_transaction(business_uuid, start_time, end_time),
-				"active_wallets": await self._get_active_wallets_count(business_uuid, start_time, end_time)
-			}
-			return metrics
+			# Fetch the window once and compute every metric in a single pass
+			transactions = await self._get_window_transactions(business_uuid, start_time, end_time)
+			return self.metrics_engine.compute(transactions)
 		except Exception as e:
 			logger.error(f"Failed to get key metrics: {str(e)}")
 			raise
 
+	def observe_transaction(self, business_uuid: str, tx: Dict) -> None:
+		"""Feed a newly observed transaction into the rolling-window backend"""
+		if self.rolling_window is not None:
+			self.rolling_window.observe(business_uuid, tx)
+
+	def observe_tick(self) -> None:
+		"""Called for every tick the live feed processes, so warm windows are known to be current"""
+		self._live_at = time.time()
+
+	async def rebuild_rolling_window(self, business_uuid: str) -> None:
+		"""Cold start a business window from get_business_transactions"""
+		end_time = datetime.utcnow()
+		start_time = end_time - METRICS_WINDOW
+		# Fetch errors propagate here so a failed rebuild never leaves an empty window marked warm
+		transactions = await self._fetch_window(business_uuid, start_time, end_time)
+		self.rolling_window.rebuild(business_uuid, transactions)
+
+	def _needs_rebuild(self, business_uuid: str) -> bool:
+		built_at = self.rolling_window.built_at(business_uuid)
+		if built_at is None:
+			return True
+		# Without a live feed the window only holds what the last rebuild fetched
+		fresh_at = max(built_at, self._live_at or 0.0)
+		return time.time() - fresh_at > self.max_staleness
+
 	async def get_transaction_monitoring(self, business_uuid: str, limit: int = 10) -> List[Dict]:
 		try:
-			# TODO: Implement actual transaction monitoring using QubiPy
-			transactions = await self.qubic_client.get_business_transactions(
-				business_uuid=business_uuid,
-				limit=limit
-			)
+			if self.ledger is not None:
+				transactions = await self.ledger.business_recent(business_uuid, limit)
+			else:
+				transactions = await self.qubic_client.get_business_transactions(
+					business_uuid=business_uuid,
+					limit=limit
+				)
 			return self._format_transactions(transactions)
 		except Exception as e:
 			logger.error(f"Failed to get transaction monitoring: {str(e)}")
 			raise
 
-	async def _get_transaction_count(self, business_uuid: str, start_time: datetime, end_time: datetime) -> int:
-		try:
-			transactions = await self.qubic_client.get_business_transactions(
-				business_uuid=business_uuid,
-				start_time=start_time.isoformat(),
-				end_time=end_time.isoformat()
-			)
-			return len(transactions)
-		except Exception as e:
-			logger.error(f"Failed to get transaction count: {str(e)}")
-			return 0
-
-	async def _get_transaction_volume(self, business_uuid: str, start_time: datetime, end_time: datetime) -> float:
+	async def _get_window_transactions(self, business_uuid: str, start_time: datetime, end_time: datetime) -> List[Dict]:
 		try:
-			transactions = await self.qubic_client.get_business_transactions(
-				business_uuid=business_uuid,
-				start_time=start_time.isoformat(),
-				end_time=end_time.isoformat()
-			)
-			return sum(float(tx.get('amount', 0)) for tx in transactions)
+			return await self._fetch_window(business_uuid, start_time, end_time)
 		except Exception as e:
-			logger.error(f"Failed to get transaction volume: {str(e)}")
-			return 0.0
+			logger.error(f"Failed to get window transactions: {str(e)}")
+			return []
 
-	async def _get_average_transaction(self, business_uuid: str, start_time: datetime, end_time: datetime) -> float:
-		try:
-			count = await self._get_transaction_count(business_uuid, start_time, end_time)
-			if count == 0:
-				return 0.0
-			volume = await self._get_transaction_volume(business_uuid, start_time, end_time)
-			return volume / count
-		except Exception as e:
-			logger.error(f"Failed to get average transaction: {str(e)}")
-			return 0.0
-
-	async def _get_active_wallets_count(self, business_uuid: str, start_time: datetime, end_time: datetime) -> int:
-		try:
-			transactions = await self.qubic_client.get_business_transactions(
-				business_uuid=business_uuid,
-				start_time=start_time.isoformat(),
-				end_time=end_time.isoformat()
-			)
-			unique_wallets = set()
-			for tx in transactions:
-				unique_wallets.add(tx.get('from_address'))
-				unique_wallets.add(tx.get('to_address'))
-			return len(unique_wallets)
-		except Exception as e:
-			logger.error(f"Failed to get active wallets count: {str(e)}")
-			return 0
+	async def _fetch_window(self, business_uuid: str, start_time: datetime, end_time: datetime) -> List[Dict]:
+		if self.ledger is not None:
+			return await self.ledger.business_window(business_uuid, start_time, end_time)
+		return await self.qubic_client.get_business_transactions(
+			business_uuid=business_uuid,
+			start_time=start_time.isoformat(),
+			end_time=end_time.isoformat()
+		)
 
 	def _format_transactions(self, transactions: List[Dict]) -> List[Dict]:
 		# Format transactions for frontend display
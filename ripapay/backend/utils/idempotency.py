@@ -0,0 +1,221 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+# The request failed after it may have taken effect
+UNKNOWN = "unknown"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+	scope TEXT NOT NULL,
+	key TEXT NOT NULL,
+	fingerprint TEXT NOT NULL,
+	status TEXT NOT NULL,
+	response TEXT,
+	expires_at REAL NOT NULL,
+	PRIMARY KEY (scope, key)
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at);
+"""
+
+class IdempotencyKeyMismatchError(ValueError):
+	"""The key was already used for a different request body"""
+	pass
+
+class IdempotencyInProgressError(Exception):
+	"""Another worker is still processing the original request"""
+	pass
+
+class IdempotencyOutcomeUnknownError(Exception):
+	"""The original request failed after it may have been sent; retrying under the key would risk doing it twice"""
+	pass
+
+def safe_to_retry(error: BaseException) -> bool:
+	"""Whether a failed request provably had no effect: rejected as invalid, or never sent"""
+	return isinstance(error, ValueError) or getattr(error, "safe_to_retry", False)
+
+def request_fingerprint(payload: Any) -> str:
+	return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+class IdempotencyStore:
+	"""
+	Idempotency-Key handling shared by every uvicorn worker through SQLite.
+	The first request for a key claims it with an atomic insert and its
+	response is stored for ttl seconds; replays get that response back.
+	A duplicate arriving while the original is still running waits for it:
+	on a future within the same worker, or by polling the row from another
+	worker. A claim is released for the client to retry only when its
+	request failed before anything was sent; any other failure is stored as
+	unknown and replayed as IdempotencyOutcomeUnknownError. A claim left
+	behind by a crashed worker expires after lease seconds.
+	"""
+	def __init__(
+		self,
+		path: str = ":memory:",
+		ttl: float = 86400.0,
+		lease: float = 300.0,
+		wait_timeout: float = 30.0,
+		poll_interval: float = 0.05,
+		cache_size: int = 10000
+	):
+		self.path = path
+		self.ttl = ttl
+		self.lease = lease
+		self.wait_timeout = wait_timeout
+		self.poll_interval = poll_interval
+		self.cache_size = cache_size
+		self._lock = threading.Lock()
+		self._conn = sqlite3.connect(path, check_same_thread=False)
+		self._conn.row_factory = sqlite3.Row
+		if path != ":memory:":
+			self._conn.execute("PRAGMA journal_mode=WAL")
+			self._conn.execute("PRAGMA synchronous=NORMAL")
+		self._conn.executescript(_SCHEMA)
+		self._conn.commit()
+		self._inflight: Dict[Tuple[str, str], Tuple[str, asyncio.Future]] = {}
+		self._completed: "OrderedDict[Tuple[str, str], Tuple[str, Any, float]]" = OrderedDict()
+		self._claims = 0
+
+	def close(self) -> None:
+		with self._lock:
+			self._conn.close()
+
+	async def run(self, scope: str, key: str, fingerprint: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+		"""Run fn once per (scope, key); returns its response and whether it was a replay"""
+		slot = (scope, key)
+		cached = self._cached(slot, fingerprint)
+		if cached is not None:
+			return cached, True
+
+		inflight = self._inflight.get(slot)
+		if inflight is not None:
+			self._check_fingerprint(inflight[0], fingerprint)
+			return await asyncio.shield(inflight[1]), True
+
+		deadline = time.monotonic() + self.wait_timeout
+		while True:
+			row = self._claim(scope, key, fingerprint)
+			if row is None:
+				break
+			self._check_fingerprint(row["fingerprint"], fingerprint)
+			if row["status"] == UNKNOWN:
+				raise IdempotencyOutcomeUnknownError(json.loads(row["response"]))
+			if row["status"] == COMPLETED:
+				response = json.loads(row["response"])
+				self._remember(slot, fingerprint, response, row["expires_at"])
+				return response, True
+			if time.monotonic() >= deadline:
+				raise IdempotencyInProgressError("A request with this Idempotency-Key is still being processed")
+			await asyncio.sleep(self.poll_interval)
+
+		future = asyncio.get_event_loop().create_future()
+		self._inflight[slot] = (fingerprint, future)
+		try:
+			response = await fn()
+		except BaseException as e:
+			error = e
+			if safe_to_retry(e):
+				self._release(scope, key)
+			else:
+				message = f"The original request failed and may have been applied: {str(e) or type(e).__name__}"
+				self._finish(scope, key, UNKNOWN, message)
+				error = IdempotencyOutcomeUnknownError(message)
+			if isinstance(e, asyncio.CancelledError):
+				future.cancel()
+				raise
+			if not future.done():
+				future.set_exception(error)
+				# Waiters re-raise it; mark it retrieved so an unwatched failure is not logged
+				future.exception()
+			if error is e:
+				raise
+			raise error from e
+		finally:
+			self._inflight.pop(slot, None)
+
+		expires_at = self._finish(scope, key, COMPLETED, response)
+		self._remember(slot, fingerprint, response, expires_at)
+		future.set_result(response)
+		return response, False
+
+	def purge_expired(self) -> int:
+		with self._lock:
+			cursor = self._conn.execute("DELETE FROM idempotency_keys WHERE expires_at < ?", (time.time(),))
+			self._conn.commit()
+			return cursor.rowcount
+
+	def _claim(self, scope: str, key: str, fingerprint: str) -> Optional[sqlite3.Row]:
+		"""Claim the key, or return the row of whoever holds it"""
+		self._claims += 1
+		if self._claims % 1000 == 0:
+			self.purge_expired()
+		now = time.time()
+		with self._lock:
+			self._conn.execute(
+				"DELETE FROM idempotency_keys WHERE scope = ? AND key = ? AND expires_at < ?",
+				(scope, key, now)
+			)
+			cursor = self._conn.execute(
+				"""
+				INSERT OR IGNORE INTO idempotency_keys (scope, key, fingerprint, status, expires_at)
+				VALUES (?, ?, ?, ?, ?)
+				""",
+				(scope, key, fingerprint, IN_PROGRESS, now + self.lease)
+			)
+			self._conn.commit()
+			if cursor.rowcount == 1:
+				return None
+			return self._conn.execute(
+				"SELECT fingerprint, status, response, expires_at FROM idempotency_keys WHERE scope = ? AND key = ?",
+				(scope, key)
+			).fetchone()
+
+	def _finish(self, scope: str, key: str, status: str, response: Any) -> float:
+		expires_at = time.time() + self.ttl
+		with self._lock:
+			self._conn.execute(
+				"UPDATE idempotency_keys SET status = ?, response = ?, expires_at = ? WHERE scope = ? AND key = ?",
+				(status, json.dumps(response, default=str), expires_at, scope, key)
+			)
+			self._conn.commit()
+		return expires_at
+
+	def _release(self, scope: str, key: str) -> None:
+		with self._lock:
+			self._conn.execute(
+				"DELETE FROM idempotency_keys WHERE scope = ? AND key = ? AND status = ?",
+				(scope, key, IN_PROGRESS)
+			)
+			self._conn.commit()
+
+	def _cached(self, slot: Tuple[str, str], fingerprint: str) -> Optional[Any]:
+		entry = self._completed.get(slot)
+		if entry is None:
+			return None
+		if entry[2] < time.time():
+			del self._completed[slot]
+			return None
+		self._check_fingerprint(entry[0], fingerprint)
+		self._completed.move_to_end(slot)
+		return entry[1]
+
+	def _remember(self, slot: Tuple[str, str], fingerprint: str, response: Any, expires_at: float) -> None:
+		self._completed[slot] = (fingerprint, response, expires_at)
+		self._completed.move_to_end(slot)
+		while len(self._completed) > self.cache_size:
+			self._completed.popitem(last=False)
+
+	@staticmethod
+	def _check_fingerprint(stored: str, fingerprint: str) -> None:
+		if stored != fingerprint:
+			raise IdempotencyKeyMismatchError("Idempotency-Key was already used with a different request")
\ No newline at end of file
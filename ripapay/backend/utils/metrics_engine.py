@@ -0,0 +1,107 @@
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Metric:
+	"""
+	A metric computed in a single pass over a window of transactions.
+	State is created per computation so one metric instance can be shared.
+	"""
+	name = ""
+
+	def initial(self) -> Any:
+		return None
+
+	def update(self, state: Any, tx: Dict) -> Any:
+		return state
+
+	def finalize(self, state: Any, results: Dict[str, Any]) -> Any:
+		return state
+
+class CountMetric(Metric):
+	name = "total_transactions"
+
+	def initial(self) -> int:
+		return 0
+
+	def update(self, state: int, tx: Dict) -> int:
+		return state + 1
+
+class VolumeMetric(Metric):
+	name = "total_volume"
+
+	def initial(self) -> float:
+		return 0
+
+	def update(self, state: float, tx: Dict) -> float:
+		return state + float(tx.get('amount', 0))
+
+class AverageTransactionMetric(Metric):
+	"""Derived from the count and volume results, so it adds no per-transaction work"""
+	name = "average_transaction_size"
+
+	def __init__(self, count_metric: str = CountMetric.name, volume_metric: str = VolumeMetric.name):
+		self.count_metric = count_metric
+		self.volume_metric = volume_metric
+
+	def finalize(self, state: Any, results: Dict[str, Any]) -> float:
+		count = results.get(self.count_metric, 0)
+		if count == 0:
+			return 0.0
+		return results.get(self.volume_metric, 0) / count
+
+class ActiveWalletsMetric(Metric):
+	name = "active_wallets"
+
+	def initial(self) -> set:
+		return set()
+
+	def update(self, state: set, tx: Dict) -> set:
+		state.add(tx.get('from_address'))
+		state.add(tx.get('to_address'))
+		return state
+
+	def finalize(self, state: set, results: Dict[str, Any]) -> int:
+		return len(state)
+
+class MetricsEngine:
+	"""
+	Computes every registered metric in one pass over an already fetched window.
+	Metrics are finalized in registration order, so derived metrics must be
+	registered after the metrics they read from.
+	"""
+	def __init__(self, metrics: Optional[Iterable[Metric]] = None):
+		self._metrics: List[Metric] = []
+		for metric in metrics or []:
+			self.register(metric)
+
+	def register(self, metric: Metric) -> None:
+		if any(existing.name == metric.name for existing in self._metrics):
+			raise ValueError(f"Metric already registered: {metric.name}")
+		self._metrics.append(metric)
+
+	@property
+	def metric_names(self) -> List[str]:
+		return [metric.name for metric in self._metrics]
+
+	def compute(self, transactions: Iterable[Dict]) -> Dict[str, Any]:
+		metrics = self._metrics
+		states = [metric.initial() for metric in metrics]
+		for tx in transactions:
+			for i, metric in enumerate(metrics):
+				states[i] = metric.update(states[i], tx)
+
+		results: Dict[str, Any] = {}
+		for metric, state in zip(metrics, states):
+			results[metric.name] = metric.finalize(state, results)
+		return results
+
+def default_metrics_engine() -> MetricsEngine:
+	"""Engine producing the key metrics served by the dashboard"""
+	return MetricsEngine([
+		CountMetric(),
+		VolumeMetric(),
+		AverageTransactionMetric(),
+		ActiveWalletsMetric()
+	])
@@ -0,0 +1,262 @@
+"""
+Compact binary encoding of payment requests for QR codes and payment links.
+
+Layout (version 1):
+	version      1 byte
+	flags        1 byte, one bit per optional field present
+	business     uint32, the 8-digit business UUID as a number
+	decimals     1 byte, decimal places of the amount
+	amount       varint, the amount in units of 10^-decimals
+	timestamp    uint32 epoch seconds, if flagged
+	strings      varint length + UTF-8, for each flagged text field in STRING_FIELDS order
+	intent       6-byte intent id, uint32 expiry epoch and an 8-byte signature, if flagged
+
+The intent trailer has a fixed size and sits at the very end, so a signed
+payload can be checked and looked up by slicing, without decoding it.
+
+QR codes carry it as "RP:" + base45, which stays in the QR alphanumeric
+mode; links carry it as unpadded base64url. The JSON form written before
+this encoding existed is still accepted by decode_payment.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Any, Dict, Optional, Tuple
+import json
+import struct
+from .timestamps import to_epoch, to_iso
+
+VERSION = 1
+QR_PREFIX = "RP:"
+MAX_DECIMALS = 8
+
+FLAG_TIMESTAMP = 0x01
+STRING_FIELDS = ("reference", "merchant_name", "terminal_id", "pos_id")
+STRING_FLAGS = {field: 0x02 << i for i, field in enumerate(STRING_FIELDS)}
+FLAG_INTENT = 0x20
+
+INTENT_ID_BYTES = 6
+SIGNATURE_BYTES = 8
+INTENT_TRAILER_BYTES = INTENT_ID_BYTES + 4 + SIGNATURE_BYTES
+
+BASE45_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+_BASE45_VALUES = {char: value for value, char in enumerate(BASE45_ALPHABET)}
+
+class PaymentCodecError(ValueError):
+	"""The payload is not a payment this codec can read"""
+	pass
+
+def b45encode(data: bytes) -> str:
+	chars = []
+	for i in range(0, len(data) - 1, 2):
+		n = data[i] * 256 + data[i + 1]
+		n, c = divmod(n, 45)
+		e, d = divmod(n, 45)
+		chars += (BASE45_ALPHABET[c], BASE45_ALPHABET[d], BASE45_ALPHABET[e])
+	if len(data) % 2:
+		d, c = divmod(data[-1], 45)
+		chars += (BASE45_ALPHABET[c], BASE45_ALPHABET[d])
+	return "".join(chars)
+
+def b45decode(text: str) -> bytes:
+	try:
+		values = [_BASE45_VALUES[char] for char in text]
+	except KeyError:
+		raise PaymentCodecError("Invalid base45 character")
+	out = bytearray()
+	for i in range(0, len(values), 3):
+		chunk = values[i:i + 3]
+		if len(chunk) == 3:
+			n = chunk[0] + chunk[1] * 45 + chunk[2] * 2025
+			if n > 0xFFFF:
+				raise PaymentCodecError("Invalid base45 data")
+			out.extend(divmod(n, 256))
+		elif len(chunk) == 2:
+			n = chunk[0] + chunk[1] * 45
+			if n > 0xFF:
+				raise PaymentCodecError("Invalid base45 data")
+			out.append(n)
+		else:
+			raise PaymentCodecError("Invalid base45 length")
+	return bytes(out)
+
+def _put_varint(out: bytearray, value: int) -> None:
+	while value > 0x7F:
+		out.append((value & 0x7F) | 0x80)
+		value >>= 7
+	out.append(value)
+
+def _get_varint(data: bytes, pos: int):
+	value = shift = 0
+	while True:
+		if pos >= len(data):
+			raise PaymentCodecError("Truncated payment payload")
+		byte = data[pos]
+		pos += 1
+		value |= (byte & 0x7F) << shift
+		if not byte & 0x80:
+			return value, pos
+		shift += 7
+
+def _fixed_point(amount: Any):
+	"""
+	The fewest decimals that represent the amount exactly, and its scaled
+	integer. The shortest repr of a float round-trips, so decoding with
+	scaled / 10**decimals gives back the same float. Amounts that need more
+	than MAX_DECIMALS are rejected rather than rounded.
+	"""
+	value = Decimal(repr(float(amount))).normalize()
+	if value < 0:
+		raise PaymentCodecError("Amount must not be negative")
+	exponent = value.as_tuple().exponent
+	if -exponent > MAX_DECIMALS:
+		raise PaymentCodecError(f"Amount has more than {MAX_DECIMALS} decimal places")
+	decimals = max(-exponent, 0)
+	return decimals, int(value.scaleb(decimals).to_integral_value(ROUND_HALF_EVEN))
+
+def pack_payment(payment: Dict[str, Any]) -> bytes:
+	business = str(payment["business_uuid"])
+	if len(business) != 8 or not business.isdigit():
+		raise PaymentCodecError("Business UUID must be an 8-digit number")
+	decimals, scaled = _fixed_point(payment["amount"])
+	timestamp = to_epoch(payment.get("timestamp"))
+
+	flags = FLAG_TIMESTAMP if timestamp is not None else 0
+	for field in STRING_FIELDS:
+		if payment.get(field):
+			flags |= STRING_FLAGS[field]
+	if payment.get("intent_id"):
+		flags |= FLAG_INTENT
+
+	out = bytearray(struct.pack(">BBIB", VERSION, flags, int(business), decimals))
+	_put_varint(out, scaled)
+	if timestamp is not None:
+		out += struct.pack(">I", int(timestamp))
+	for field in STRING_FIELDS:
+		if flags & STRING_FLAGS[field]:
+			value = str(payment[field]).encode("utf-8")
+			_put_varint(out, len(value))
+			out += value
+	if flags & FLAG_INTENT:
+		# The caller signs these bytes and appends the signature
+		out += intent_id_bytes(payment["intent_id"])
+		out += struct.pack(">I", int(to_epoch(payment["expires_at"])))
+	return bytes(out)
+
+def unpack_payment(data: bytes) -> Dict[str, Any]:
+	if len(data) < 7:
+		raise PaymentCodecError("Truncated payment payload")
+	version, flags, business, decimals = struct.unpack_from(">BBIB", data)
+	if version != VERSION:
+		raise PaymentCodecError(f"Unsupported payment payload version {version}")
+	scaled, pos = _get_varint(data, 7)
+	payment = {
+		"business_uuid": f"{business:08d}",
+		"amount": scaled / 10 ** decimals if decimals else float(scaled),
+		"reference": "",
+		"merchant_name": "",
+		"timestamp": ""
+	}
+	if flags & FLAG_TIMESTAMP:
+		if pos + 4 > len(data):
+			raise PaymentCodecError("Truncated payment payload")
+		payment["timestamp"] = to_iso(struct.unpack_from(">I", data, pos)[0])
+		pos += 4
+	for field in STRING_FIELDS:
+		if flags & STRING_FLAGS[field]:
+			length, pos = _get_varint(data, pos)
+			if pos + length > len(data):
+				raise PaymentCodecError("Truncated payment payload")
+			payment[field] = data[pos:pos + length].decode("utf-8")
+			pos += length
+	if flags & FLAG_INTENT:
+		if pos + INTENT_ID_BYTES + 4 > len(data):
+			raise PaymentCodecError("Truncated payment payload")
+		payment["intent_id"] = intent_id_text(data[pos:pos + INTENT_ID_BYTES])
+		payment["expires_at"] = to_iso(struct.unpack_from(">I", data, pos + INTENT_ID_BYTES)[0])
+	return payment
+
+def intent_id_bytes(intent_id: str) -> bytes:
+	try:
+		raw = urlsafe_b64decode(intent_id)
+	except ValueError:
+		raw = b""
+	if len(raw) != INTENT_ID_BYTES:
+		raise PaymentCodecError("Invalid intent id")
+	return raw
+
+def intent_id_text(raw: bytes) -> str:
+	return urlsafe_b64encode(raw).decode()
+
+def read_intent_trailer(raw: bytes) -> Optional[Tuple[str, int, bytes, bytes]]:
+	"""(intent id, expiry epoch, signed bytes, signature) of a signed payload, or None"""
+	if len(raw) < 7 + INTENT_TRAILER_BYTES or raw[0] != VERSION or not raw[1] & FLAG_INTENT:
+		return None
+	trailer = raw[-INTENT_TRAILER_BYTES:]
+	intent_id = intent_id_text(trailer[:INTENT_ID_BYTES])
+	expires_at = struct.unpack_from(">I", trailer, INTENT_ID_BYTES)[0]
+	return intent_id, expires_at, raw[:-SIGNATURE_BYTES], raw[-SIGNATURE_BYTES:]
+
+def encode_qr(payment: Dict[str, Any]) -> str:
+	return qr_text(pack_payment(payment))
+
+def encode_link_token(payment: Dict[str, Any]) -> str:
+	return link_token(pack_payment(payment))
+
+def qr_text(raw: bytes) -> str:
+	return QR_PREFIX + b45encode(raw)
+
+def link_token(raw: bytes) -> str:
+	return urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def payload_bytes(value: str) -> Optional[bytes]:
+	"""The binary payload of scanned QR text, a payment link or link token; None for the legacy JSON forms"""
+	# Only line breaks are trimmed: space is a base45 digit
+	text = value.strip("\r\n")
+	if text.startswith(QR_PREFIX):
+		return b45decode(text[len(QR_PREFIX):])
+	text = text.strip()
+	if text.startswith("{"):
+		return None
+	if "://" in text:
+		text = text.rsplit("/", 1)[-1]
+	try:
+		raw = urlsafe_b64decode(text + "=" * (-len(text) % 4))
+	except ValueError:
+		raise PaymentCodecError("Invalid payment link")
+	# Legacy links are base64 of the JSON form
+	return None if raw.startswith(b"{") else raw
+
+def decode_payment(value: Any) -> Dict[str, Any]:
+	"""
+	Read a payment from scanned QR text, a payment link or link token, or the
+	legacy JSON form (as text or an already parsed dict).
+	"""
+	if isinstance(value, dict):
+		return value
+	if not isinstance(value, str):
+		raise PaymentCodecError("Unsupported payment payload")
+	raw = payload_bytes(value)
+	if raw is not None:
+		return unpack_payment(raw)
+	text = value.strip()
+	if not text.startswith("{"):
+		token = text.rsplit("/", 1)[-1]
+		text = urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+	return _legacy_json(text)
+
+def _legacy_json(text: str) -> Dict[str, Any]:
+	try:
+		payment = json.loads(text)
+	except ValueError:
+		raise PaymentCodecError("Invalid payment JSON")
+	if not isinstance(payment, dict) or "business_uuid" not in payment or "amount" not in payment:
+		raise PaymentCodecError("Payment JSON is missing business_uuid or amount")
+	return payment
+
+def amount_key(amount: Any) -> int:
+	"""An amount as an integer at the codec's precision, for exact comparison and indexing"""
+	return round(float(amount) * 10 ** MAX_DECIMALS)
+
+def amounts_match(a: Any, b: Any) -> bool:
+	"""Amounts compared at the codec's precision, so a decoded amount matches the original"""
+	return amount_key(a) == amount_key(b)
\ No newline at end of file
@@ -0,0 +1,357 @@
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import hashlib
+import hmac
+import logging
+import os
+import sqlite3
+import threading
+import time
+from .payment_codec import (
+	PaymentCodecError,
+	SIGNATURE_BYTES,
+	INTENT_ID_BYTES,
+	amount_key,
+	intent_id_text,
+	link_token,
+	pack_payment,
+	payload_bytes,
+	qr_text,
+	read_intent_trailer,
+	unpack_payment
+)
+
+logger = logging.getLogger(__name__)
+
+OPEN = "open"
+PARTIALLY_PAID = "partially_paid"
+PAID = "paid"
+EXPIRED = "expired"
+
+# Intents that can still receive payments
+PAYABLE = (OPEN, PARTIALLY_PAID)
+
+INTENT_FIELDS = ("business_uuid", "amount", "reference", "merchant_name", "terminal_id", "pos_id")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payment_intents (
+	id TEXT PRIMARY KEY,
+	payload BLOB NOT NULL,
+	status TEXT NOT NULL,
+	transaction_id TEXT,
+	destination TEXT,
+	amount_paid REAL NOT NULL DEFAULT 0,
+	expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_payment_intents_expires ON payment_intents (expires_at);
+CREATE TABLE IF NOT EXISTS payment_intent_transfers (
+	transaction_id TEXT PRIMARY KEY,
+	intent_id TEXT NOT NULL,
+	amount REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_payment_intent_transfers_intent ON payment_intent_transfers (intent_id);
+"""
+
+class PaymentIntentStore:
+	"""
+	Payment intents behind QR codes and payment links.
+	Each intent is a compact payment payload carrying a short random id, its
+	expiry and a truncated HMAC-SHA256 signature. The table keeps only that
+	signed payload plus status per intent, indexed by id, so hundreds of
+	thousands of open intents stay small. Verifying a scanned code is one
+	signature check over the raw bytes and one dict lookup. All intents share
+	one ttl, so creation order is expiry order and eviction pops a queue.
+	With a path, intents are also written to SQLite, which lets every worker
+	verify intents created by another and keeps them across restarts.
+	Listeners are told about every intent that is created or changes status.
+	Every transfer applied to an intent is recorded by transaction id, and a
+	transfer is applied at most once, so replaying transfers after a restart
+	or a backfill never credits an intent twice.
+	"""
+	def __init__(
+		self,
+		secret: Optional[str] = None,
+		ttl: float = 900.0,
+		path: Optional[str] = None,
+		max_open: int = 1000000
+	):
+		if not secret:
+			logger.warning("No payment intent secret configured; intents will not verify across workers or restarts")
+			secret = os.urandom(32).hex()
+		self._key = hashlib.sha256(secret.encode()).digest()
+		self.ttl = ttl
+		self.path = path
+		self.max_open = max_open
+		# id -> [signed payload, status, last transaction id, destination, amount paid, applied transaction ids]
+		self._intents: Dict[str, List[Any]] = {}
+		# transaction id -> intent it was applied to, for intents held in memory
+		self._applied: Dict[str, str] = {}
+		self._expiry = deque()
+		self._listeners: List[Callable[[Dict[str, Any]], Any]] = []
+		self._lock = threading.Lock()
+		self._conn = None
+		if path:
+			self._conn = sqlite3.connect(path, check_same_thread=False)
+			if path != ":memory:":
+				self._conn.execute("PRAGMA journal_mode=WAL")
+				self._conn.execute("PRAGMA synchronous=NORMAL")
+			self._conn.executescript(_SCHEMA)
+			self._migrate()
+			self._conn.commit()
+			self._load()
+
+	def close(self) -> None:
+		if self._conn is not None:
+			with self._lock:
+				self._conn.close()
+				self._conn = None
+
+	def create(self, payment: Dict[str, Any]) -> Dict[str, Any]:
+		self.purge_expired()
+		if len(self._intents) >= self.max_open:
+			raise ValueError("Too many open payment intents")
+		intent_id = intent_id_text(os.urandom(INTENT_ID_BYTES))
+		while intent_id in self._intents:
+			intent_id = intent_id_text(os.urandom(INTENT_ID_BYTES))
+		expires_at = int(time.time() + self.ttl)
+
+		packed = pack_payment({
+			**{field: payment.get(field) for field in INTENT_FIELDS},
+			"intent_id": intent_id,
+			"expires_at": expires_at
+		})
+		payload = packed + self._sign(packed)
+		# The receiving address is only needed to reconcile payments, so it stays out of the QR payload
+		record = [payload, OPEN, None, payment.get("destination"), 0.0, []]
+		self._intents[intent_id] = record
+		self._expiry.append((expires_at, intent_id))
+		if self._conn is not None:
+			with self._lock:
+				self._conn.execute(
+					"INSERT INTO payment_intents (id, payload, status, destination, expires_at) VALUES (?, ?, ?, ?, ?)",
+					(intent_id, payload, OPEN, record[3], expires_at)
+				)
+				self._conn.commit()
+		intent = self._describe(intent_id, record)
+		self._notify(intent)
+		return intent
+
+	def payload(self, intent_id: str) -> bytes:
+		"""The signed payload encoded into the intent's QR code and link"""
+		record = self._record(intent_id)
+		if record is None:
+			raise ValueError(f"Payment intent {intent_id} not found")
+		return record[0]
+
+	def get(self, intent_id: str) -> Optional[Dict[str, Any]]:
+		record = self._record(intent_id)
+		return self._describe(intent_id, record) if record is not None else None
+
+	def verify(self, value: str) -> Dict[str, Any]:
+		"""Check scanned QR text or a payment link against the intent table"""
+		try:
+			raw = payload_bytes(value)
+		except PaymentCodecError:
+			raw = None
+		return self.verify_payload(raw)
+
+	def verify_payload(self, raw: Optional[bytes]) -> Dict[str, Any]:
+		trailer = read_intent_trailer(raw) if raw else None
+		if trailer is None:
+			return {"valid": False, "reason": "not a payment intent", "intent": None}
+		intent_id, expires_at, signed, signature = trailer
+		if not hmac.compare_digest(self._sign(signed), signature):
+			return {"valid": False, "reason": "invalid signature", "intent": None}
+
+		record = self._record(intent_id)
+		if record is None:
+			reason = "expired" if expires_at < time.time() else "unknown intent"
+			return {"valid": False, "reason": reason, "intent": None}
+		intent = self._describe(intent_id, record)
+		if not hmac.compare_digest(record[0], raw):
+			return {"valid": False, "reason": "payload does not match intent", "intent": None}
+		if record[1] in PAYABLE and expires_at < time.time():
+			return {"valid": False, "reason": EXPIRED, "intent": {**intent, "status": EXPIRED}}
+		if record[1] not in PAYABLE:
+			return {"valid": False, "reason": f"intent is {record[1]}", "intent": intent}
+		return {"valid": True, "reason": None, "intent": intent}
+
+	def record_payment(self, intent_id: str, amount: float, transaction_id: Optional[str]) -> Optional[Dict[str, Any]]:
+		"""
+		Apply a received transfer to a payable intent. It is paid once the
+		total received covers the amount, partially paid before that; any
+		excess is reported as overpaid. Returns None when it is not payable
+		or the transfer was already applied.
+		"""
+		record = self._record(intent_id)
+		if record is None or record[1] not in PAYABLE:
+			return None
+		if transaction_id is not None and self.applied_to(transaction_id) is not None:
+			return None
+		amount_paid = record[4] + float(amount)
+		due = unpack_payment(record[0])["amount"]
+		status = PAID if amount_key(amount_paid) >= amount_key(due) else PARTIALLY_PAID
+		if not self._save_payment(intent_id, transaction_id, float(amount), status, amount_paid):
+			# Another worker applied it first
+			return None
+		record[1], record[2], record[4] = status, transaction_id, amount_paid
+		if transaction_id is not None:
+			record[5].append(transaction_id)
+			if intent_id in self._intents:
+				self._applied[transaction_id] = intent_id
+		intent = self._describe(intent_id, record)
+		self._notify(intent)
+		return intent
+
+	def applied_to(self, transaction_id: str) -> Optional[str]:
+		"""The id of the intent a transfer was already applied to, if any"""
+		intent_id = self._applied.get(transaction_id)
+		if intent_id is not None or self._conn is None:
+			return intent_id
+		with self._lock:
+			row = self._conn.execute(
+				"SELECT intent_id FROM payment_intent_transfers WHERE transaction_id = ?",
+				(transaction_id,)
+			).fetchone()
+		return row[0] if row else None
+
+	def open_intents(self) -> Iterator[Dict[str, Any]]:
+		now = time.time()
+		for intent_id, record in list(self._intents.items()):
+			if record[1] in PAYABLE and self._expires_at(record) >= now:
+				yield self._describe(intent_id, record)
+
+	def add_listener(self, callback: Callable[[Dict[str, Any]], Any]) -> None:
+		self._listeners.append(callback)
+
+	def purge_expired(self) -> int:
+		now = time.time()
+		expired = []
+		while self._expiry and self._expiry[0][0] < now:
+			_, intent_id = self._expiry.popleft()
+			record = self._intents.pop(intent_id, None)
+			if record is None:
+				continue
+			for transaction_id in record[5]:
+				self._applied.pop(transaction_id, None)
+			if record[1] in PAYABLE:
+				record[1] = EXPIRED
+				expired.append(self._describe(intent_id, record))
+		if expired and self._conn is not None:
+			with self._lock:
+				self._conn.execute(
+					"UPDATE payment_intents SET status = ? WHERE status IN (?, ?) AND expires_at < ?",
+					(EXPIRED, *PAYABLE, now)
+				)
+				self._conn.commit()
+		for intent in expired:
+			self._notify(intent)
+		return len(expired)
+
+	def stats(self) -> Dict[str, Any]:
+		return {"intents": len(self._intents), "persistent": self.path is not None}
+
+	def _sign(self, data: bytes) -> bytes:
+		return hmac.new(self._key, data, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+	def _record(self, intent_id: str) -> Optional[List[Any]]:
+		record = self._intents.get(intent_id)
+		if record is not None or self._conn is None:
+			return record
+		# Created by another worker, or closed and evicted from memory
+		with self._lock:
+			row = self._conn.execute(
+				"SELECT payload, status, transaction_id, destination, amount_paid FROM payment_intents WHERE id = ?",
+				(intent_id,)
+			).fetchone()
+		return [*row, []] if row else None
+
+	def _save_payment(
+		self,
+		intent_id: str,
+		transaction_id: Optional[str],
+		amount: float,
+		status: str,
+		amount_paid: float
+	) -> bool:
+		"""Record the transfer and the intent's new total in one commit; False if the transfer was already applied"""
+		if self._conn is None:
+			return True
+		with self._lock:
+			if transaction_id is not None:
+				cursor = self._conn.execute(
+					"INSERT OR IGNORE INTO payment_intent_transfers (transaction_id, intent_id, amount) VALUES (?, ?, ?)",
+					(transaction_id, intent_id, amount)
+				)
+				if cursor.rowcount == 0:
+					return False
+			self._conn.execute(
+				"UPDATE payment_intents SET status = ?, transaction_id = ?, amount_paid = ? WHERE id = ?",
+				(status, transaction_id, amount_paid, intent_id)
+			)
+			self._conn.commit()
+		return True
+
+	def _migrate(self) -> None:
+		columns = {row[1] for row in self._conn.execute("PRAGMA table_info(payment_intents)")}
+		if "destination" not in columns:
+			self._conn.execute("ALTER TABLE payment_intents ADD COLUMN destination TEXT")
+		if "amount_paid" not in columns:
+			self._conn.execute("ALTER TABLE payment_intents ADD COLUMN amount_paid REAL NOT NULL DEFAULT 0")
+
+	def _load(self) -> None:
+		with self._lock:
+			rows = self._conn.execute(
+				"""
+				SELECT id, payload, status, transaction_id, destination, amount_paid, expires_at
+				FROM payment_intents WHERE expires_at >= ? ORDER BY expires_at
+				""",
+				(time.time(),)
+			).fetchall()
+			applied = self._conn.execute(
+				"""
+				SELECT t.transaction_id, t.intent_id FROM payment_intent_transfers t
+				JOIN payment_intents i ON i.id = t.intent_id WHERE i.expires_at >= ?
+				""",
+				(time.time(),)
+			).fetchall()
+		for intent_id, payload, status, transaction_id, destination, amount_paid, expires_at in rows:
+			self._intents[intent_id] = [bytes(payload), status, transaction_id, destination, amount_paid, []]
+			self._expiry.append((expires_at, intent_id))
+		for transaction_id, intent_id in applied:
+			record = self._intents.get(intent_id)
+			if record is not None:
+				record[5].append(transaction_id)
+				self._applied[transaction_id] = intent_id
+
+	def _notify(self, intent: Dict[str, Any]) -> None:
+		for listener in self._listeners:
+			try:
+				listener(intent)
+			except Exception as e:
+				logger.error(f"Payment intent listener failed: {str(e)}")
+
+	@staticmethod
+	def _expires_at(record: List[Any]) -> int:
+		return read_intent_trailer(record[0])[1]
+
+	def _describe(self, intent_id: str, record: List[Any]) -> Dict[str, Any]:
+		payment = unpack_payment(record[0])
+		return {
+			"intent_id": intent_id,
+			"status": record[1],
+			"transaction_id": record[2],
+			"business_uuid": payment["business_uuid"],
+			"amount": payment["amount"],
+			"reference": payment["reference"],
+			"merchant_name": payment["merchant_name"],
+			"terminal_id": payment.get("terminal_id", ""),
+			"pos_id": payment.get("pos_id", ""),
+			"destination": record[3],
+			"amount_paid": record[4],
+			"amount_remaining": max(payment["amount"] - record[4], 0.0),
+			"overpaid": max(record[4] - payment["amount"], 0.0),
+			"expires_at": payment["expires_at"],
+			"qr_data": qr_text(record[0]),
+			"link_token": link_token(record[0])
+		}
\ No newline at end of file
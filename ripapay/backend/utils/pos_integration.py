@@ -1,6 +1,7 @@
-from typing import Dict, Any
+from typing import Dict, Any, Union
 from datetime import datetime
 from .qr_payment import QRPaymentGenerator
+from .qr_renderer import QRRenderBusyError
 from .transaction_builder import TransactionBuilder
 
 class POSIntegration:
@@ -21,13 +22,19 @@ class POSIntegration:
 				"reference": payment_data.get("reference", ""),
 				"timestamp": datetime.utcnow().isoformat(),
 				"pos_id": payment_data.get("pos_id", ""),
-				"terminal_id": payment_data.get("terminal_id", "")
+				"terminal_id": payment_data.get("terminal_id", ""),
+				"destination": payment_data.get("destination")
 			}
+			# Each sale gets its own signed intent, so the scan verifies without echoed data
+			intent = self.qr_generator.create_intent(qr_data) if self.qr_generator.intents is not None else None
+			if intent is not None:
+				qr_data["intent_id"] = intent["intent_id"]
 			
-			qr_result = self.qr_generator.generate_payment_qr(qr_data)
+			qr_result = await self.qr_generator.generate_payment_qr(qr_data)
 			
 			return {
 				"qr_data": qr_result,
+				"intent": intent,
 				"payment_info": {
 					"amount": payment_data["amount"],
 					"merchant": payment_data.get("merchant_name", ""),
@@ -35,18 +42,22 @@ class POSIntegration:
 					"timestamp": qr_data["timestamp"]
 				}
 			}
+		except QRRenderBusyError:
+			raise
 		except Exception as e:
 			raise Exception(f"Failed to create POS payment: {str(e)}")
 			
-	async def process_pos_payment(self, payment_data: Dict[str, Any], transaction_data: Dict[str, Any]) -> Dict[str, Any]:
+	async def process_pos_payment(self, payment_data: Union[str, Dict[str, Any]], transaction_data: Dict[str, Any]) -> Dict[str, Any]:
 		"""
 		Process a POS payment after QR code scan
+		payment_data is the scanned QR text, or the decoded QR data
 		"""
 		try:
 			# Verify QR payment data
-			is_valid = self.qr_generator.verify_qr_payment(payment_data, transaction_data)
-			if not is_valid:
-				raise Exception("Invalid payment data")
+			verification = self.qr_generator.verify_payment(payment_data, transaction_data)
+			if not verification["valid"]:
+				raise Exception(f"Invalid payment data: {verification['reason']}")
+			qr_data = verification["intent"] or verification["payment_data"]
 				
 			# Process transaction
 			result = await self.transaction_builder.create_payment_transaction(
@@ -60,8 +71,8 @@ class POSIntegration:
 				"status": "success",
 				"transaction": result,
 				"pos_info": {
-					"terminal_id": payment_data.get("terminal_id", ""),
-					"pos_id": payment_data.get("pos_id", ""),
+					"terminal_id": qr_data.get("terminal_id", ""),
+					"pos_id": qr_data.get("pos_id", ""),
 					"timestamp": datetime.utcnow().isoformat()
 				}
 			}
@@ -0,0 +1,241 @@
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Queue markers; real events are (id, event, data) tuples
+HEARTBEAT = None
+_CLOSED = object()
+
+# Event sent on resume when the requested events are no longer buffered
+RESET_EVENT = "reset"
+
+# Payment intent status -> event pushed to its terminal
+PAYMENT_EVENTS = {
+	"paid": "payment_confirmed",
+	"partially_paid": "payment_partial",
+	"expired": "payment_expired"
+}
+PAYMENT_EVENT_FIELDS = (
+	"intent_id", "status", "business_uuid", "amount", "amount_paid", "amount_remaining",
+	"overpaid", "reference", "terminal_id", "pos_id", "transaction_id", "expires_at"
+)
+
+def channel_keys(terminal_id: Optional[str] = None, pos_id: Optional[str] = None) -> List[str]:
+	"""Channels of a POS terminal; an event for a sale is published to both of its ids"""
+	keys = []
+	if terminal_id:
+		keys.append(f"terminal:{terminal_id}")
+	if pos_id:
+		keys.append(f"pos:{pos_id}")
+	return keys
+
+class PushSubscription:
+	"""One connected terminal: a bounded queue the hub writes events and heartbeats into"""
+	def __init__(self, hub: "PushHub", channels: List[str], max_queue: int):
+		self.hub = hub
+		self.channels = channels
+		self.queue = asyncio.Queue(maxsize=max_queue)
+		self.closed = False
+
+	def __aiter__(self):
+		return self
+
+	async def __anext__(self) -> Optional[Tuple[int, str, Dict[str, Any]]]:
+		"""The next event, or HEARTBEAT; stops when the hub drops the subscription"""
+		message = await self.queue.get()
+		if message is _CLOSED:
+			raise StopAsyncIteration
+		return message
+
+	def close(self) -> None:
+		self.hub.unsubscribe(self)
+
+class PushHub:
+	"""
+	Fans payment events out to connected POS terminals.
+	A connection is one subscription queue registered under its channels,
+	so an idle terminal costs a queue and nothing runs on its behalf until
+	an event arrives. A single task feeds heartbeats to every subscription.
+	Each channel keeps its last history events in a ring buffer, so a client
+	that reconnects with the last event id it saw gets what it missed. Event
+	ids start from the start-up time in milliseconds and keep increasing
+	across restarts. A subscriber that falls max_queue events behind is
+	dropped and resumes from its last event id when it reconnects.
+	Subscriptions, history and event ids live in this process, so the push
+	endpoints assume a single worker: a terminal connected to one worker
+	never sees events published by another.
+	"""
+	def __init__(
+		self,
+		heartbeat_interval: float = 15.0,
+		history: int = 64,
+		max_channels: int = 100000,
+		max_queue: int = 256
+	):
+		self.heartbeat_interval = heartbeat_interval
+		self.history = history
+		self.max_channels = max_channels
+		self.max_queue = max_queue
+		self._first_id = int(time.time() * 1000)
+		self._next_id = self._first_id
+		self._subscribers: Dict[str, Set[PushSubscription]] = {}
+		# channel -> recent (id, event, data), least recently published channel first
+		self._history: "OrderedDict[str, deque]" = OrderedDict()
+		self._all: Set[PushSubscription] = set()
+		self._task: Optional[asyncio.Task] = None
+		self._heartbeat_listeners: List[Callable[[], Any]] = []
+		self._stats = {"published": 0, "delivered": 0, "replayed": 0, "dropped_subscribers": 0}
+
+	def start(self) -> None:
+		if self._task is None:
+			self._task = asyncio.create_task(self._heartbeat())
+
+	def add_heartbeat_listener(self, callback: Callable[[], Any]) -> None:
+		"""Called on every heartbeat, for periodic work such as expiring intents"""
+		self._heartbeat_listeners.append(callback)
+
+	async def close(self) -> None:
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			self._task = None
+		for subscription in list(self._all):
+			self._drop(subscription)
+
+	def subscribe(self, channels: List[str], last_event_id: Optional[int] = None) -> PushSubscription:
+		"""
+		Register a connection for channels. With last_event_id, buffered events
+		after it are queued first, or a reset event when some were already
+		evicted and the client should re-read the state it cares about.
+		"""
+		if not channels:
+			raise ValueError("A terminal_id or pos_id is required")
+		subscription = PushSubscription(self, channels, self.max_queue)
+		if last_event_id is not None:
+			self._replay(subscription, last_event_id)
+		for channel in channels:
+			self._subscribers.setdefault(channel, set()).add(subscription)
+		self._all.add(subscription)
+		return subscription
+
+	def unsubscribe(self, subscription: PushSubscription) -> None:
+		if subscription.closed:
+			return
+		subscription.closed = True
+		self._all.discard(subscription)
+		for channel in subscription.channels:
+			subscriptions = self._subscribers.get(channel)
+			if subscriptions is None:
+				continue
+			subscriptions.discard(subscription)
+			if not subscriptions:
+				del self._subscribers[channel]
+
+	def publish(self, channels: Iterable[str], event: str, data: Dict[str, Any]) -> int:
+		event_id = self._next_id
+		self._next_id += 1
+		message = (event_id, event, data)
+		targets = set()
+		for channel in channels:
+			buffer = self._history.pop(channel, None)
+			if buffer is None:
+				buffer = deque(maxlen=self.history)
+				if len(self._history) >= self.max_channels:
+					self._history.popitem(last=False)
+			buffer.append(message)
+			self._history[channel] = buffer
+			targets.update(self._subscribers.get(channel, ()))
+		# A terminal listening on both its ids still gets the event once
+		for subscription in targets:
+			self._offer(subscription, message)
+		self._stats["published"] += 1
+		return event_id
+
+	def publish_payment(self, intent: Dict[str, Any], transfer: Optional[Dict[str, Any]] = None) -> Optional[int]:
+		"""Push a payment intent's new status to the terminal that created it"""
+		event = PAYMENT_EVENTS.get(intent["status"])
+		channels = channel_keys(intent.get("terminal_id"), intent.get("pos_id"))
+		if event is None or not channels:
+			return None
+		data = {field: intent.get(field) for field in PAYMENT_EVENT_FIELDS}
+		if transfer is not None:
+			data["transfer"] = {
+				"id": transfer.get("id"),
+				"amount": transfer.get("amount"),
+				"source": transfer.get("source"),
+				"tick": transfer.get("tick"),
+				"timestamp": transfer.get("timestamp")
+			}
+		return self.publish(channels, event, data)
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			**self._stats,
+			"subscribers": len(self._all),
+			"channels": len(self._subscribers),
+			"buffered_channels": len(self._history),
+			"last_event_id": self._next_id - 1
+		}
+
+	def _replay(self, subscription: PushSubscription, last_event_id: int) -> None:
+		# Ids from before this process started may belong to events it never saw
+		lost = last_event_id < self._first_id - 1
+		missed = {}
+		for channel in subscription.channels:
+			buffer = self._history.get(channel)
+			if not buffer:
+				continue
+			if len(buffer) == buffer.maxlen and buffer[0][0] > last_event_id + 1:
+				lost = True
+			for message in buffer:
+				if message[0] > last_event_id:
+					# Events published to several channels of the terminal appear once
+					missed[message[0]] = message
+		if lost:
+			self._offer(subscription, (self._next_id - 1, RESET_EVENT, {}))
+			return
+		for event_id in sorted(missed):
+			self._offer(subscription, missed[event_id])
+			self._stats["replayed"] += 1
+
+	def _offer(self, subscription: PushSubscription, message: Any) -> None:
+		if subscription.closed:
+			return
+		try:
+			subscription.queue.put_nowait(message)
+		except asyncio.QueueFull:
+			# Too far behind; it reconnects and resumes from its last event id
+			self._stats["dropped_subscribers"] += 1
+			self._drop(subscription)
+			return
+		if message is not HEARTBEAT:
+			self._stats["delivered"] += 1
+
+	def _drop(self, subscription: PushSubscription) -> None:
+		self.unsubscribe(subscription)
+		if subscription.queue.full():
+			subscription.queue.get_nowait()
+		subscription.queue.put_nowait(_CLOSED)
+
+	async def _heartbeat(self) -> None:
+		while True:
+			await asyncio.sleep(self.heartbeat_interval)
+			for listener in self._heartbeat_listeners:
+				try:
+					result = listener()
+					if inspect.isawaitable(result):
+						await result
+				except Exception as e:
+					logger.error(f"Heartbeat listener failed: {str(e)}")
+			for subscription in list(self._all):
+				# A pending event already tells the client the connection is alive
+				if subscription.queue.empty():
+					self._offer(subscription, HEARTBEAT)
\ No newline at end of file
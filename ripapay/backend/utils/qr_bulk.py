@@ -0,0 +1,130 @@
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import logging
+import re
+import zipfile
+from .qr_payment import QRPaymentGenerator
+from .qr_renderer import QRRenderBusyError, QR_FORMATS, QR_SIZES
+
+logger = logging.getLogger(__name__)
+
+MAX_BULK_QR_CODES = 5000
+
+class _ArchiveBuffer:
+	"""Write-only file object for zipfile; drain() hands back what was written since the last call"""
+	def __init__(self):
+		self._buffer = bytearray()
+
+	def write(self, data: bytes) -> int:
+		self._buffer += data
+		return len(data)
+
+	def flush(self) -> None:
+		pass
+
+	def drain(self) -> bytes:
+		data = bytes(self._buffer)
+		self._buffer.clear()
+		return data
+
+class QRBulkExporter:
+	"""
+	Renders many payment QR codes and streams them back as a ZIP archive of
+	raw image files plus manifest.json. Renders run on the QR render pool,
+	at most window at a time, and each file is written to the response as
+	soon as it is ready, so memory stays bounded however large the batch.
+	"""
+	def __init__(self, qr_generator: QRPaymentGenerator, window: Optional[int] = None, max_codes: int = MAX_BULK_QR_CODES):
+		self.qr_generator = qr_generator
+		# Leave the rest of the render queue to interactive /qr/generate calls
+		self.window = window or self.qr_generator.render_pool.workers * 2
+		self.max_codes = max_codes
+
+	def stream_archive(self, specs: List[Dict[str, Any]], fmt: str = "png", size: str = "md") -> AsyncIterator[bytes]:
+		"""Validated here so errors surface before streaming starts"""
+		if not specs:
+			raise ValueError("No QR codes requested")
+		if len(specs) > self.max_codes:
+			raise ValueError(f"At most {self.max_codes} QR codes can be generated at once")
+		if fmt not in QR_FORMATS:
+			raise ValueError(f"Unsupported QR format {fmt}; use one of {', '.join(QR_FORMATS)}")
+		if size not in QR_SIZES:
+			raise ValueError(f"Unsupported QR size {size}; use one of {', '.join(QR_SIZES)}")
+		return self._stream_archive(specs, fmt, size)
+
+	async def _stream_archive(self, specs: List[Dict[str, Any]], fmt: str, size: str) -> AsyncIterator[bytes]:
+		buffer = _ArchiveBuffer()
+		archive = zipfile.ZipFile(buffer, "w")
+		generated_at = datetime.utcnow()
+		# Images are already compressed; only SVG gains from deflate
+		compress_type = zipfile.ZIP_DEFLATED if fmt == "svg" else zipfile.ZIP_STORED
+		remaining = iter(enumerate(specs))
+		pending = deque()
+		manifest = []
+
+		def schedule():
+			while len(pending) < self.window:
+				item = next(remaining, None)
+				if item is None:
+					return
+				pending.append((item[0], item[1], asyncio.ensure_future(self._render(item[1], fmt, size))))
+
+		try:
+			schedule()
+			while pending:
+				index, spec, task = pending.popleft()
+				entry = {
+					"index": index,
+					"business_uuid": spec["business_uuid"],
+					"amount": spec["amount"],
+					"reference": spec.get("reference") or "",
+					"terminal_id": spec.get("terminal_id") or "",
+					"pos_id": spec.get("pos_id") or ""
+				}
+				try:
+					_, qr_id, image = await task
+					entry["file"] = self._filename(index, spec, fmt)
+					entry["qr_id"] = qr_id
+					info = zipfile.ZipInfo(entry["file"], date_time=generated_at.timetuple()[:6])
+					archive.writestr(info, image[0], compress_type=compress_type)
+				except Exception as e:
+					logger.error(f"Failed to render bulk QR code {index}: {str(e)}")
+					entry["error"] = str(e)
+				manifest.append(entry)
+				schedule()
+				yield buffer.drain()
+
+			info = zipfile.ZipInfo("manifest.json", date_time=generated_at.timetuple()[:6])
+			archive.writestr(info, json.dumps({
+				"generated_at": generated_at.isoformat(),
+				"format": fmt,
+				"size": size,
+				"count": len(manifest),
+				"failed": sum(1 for entry in manifest if "error" in entry),
+				"codes": manifest
+			}, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+			archive.close()
+			yield buffer.drain()
+		finally:
+			# A client that disconnects mid-stream should not leave renders running
+			for _, _, task in pending:
+				task.cancel()
+
+	async def _render(self, spec: Dict[str, Any], fmt: str, size: str):
+		while True:
+			try:
+				return await self.qr_generator.render_image(spec, fmt, size)
+			except QRRenderBusyError:
+				# Wait for room instead of failing the code; interactive renders keep priority
+				await asyncio.sleep(0.05)
+
+	@staticmethod
+	def _filename(index: int, spec: Dict[str, Any], fmt: str) -> str:
+		label = spec.get("terminal_id") or spec["business_uuid"]
+		name = f"{index + 1:05d}-{label}-{spec['amount']}"
+		if spec.get("reference"):
+			name += f"-{spec['reference']}"
+		return re.sub(r"[^A-Za-z0-9._-]+", "_", name)[:120] + f".{fmt}"
\ No newline at end of file
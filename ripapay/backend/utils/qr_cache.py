@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import base64
+import hashlib
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+def qr_cache_key(data: str, fmt: str, size: str) -> str:
+	"""Content address of a rendered QR image: the encoded data plus its render options"""
+	return hashlib.sha256(f"{fmt}:{size}:{data}".encode()).hexdigest()[:32]
+
+class QRImageCache:
+	"""
+	Content-addressed cache of rendered QR images.
+	Entries are keyed by qr_cache_key, so an identical payload rendered with
+	the same options is only rendered and base64-encoded once. Memory is
+	bounded by max_bytes with LRU eviction; when a directory is given every
+	image is also written there and evicted entries are read back from disk.
+	"""
+	def __init__(self, max_bytes: int = 64 * 1024 * 1024, path: Optional[str] = None):
+		self.max_bytes = max_bytes
+		self.path = path
+		self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+		self._bytes = 0
+		self._stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+		if path:
+			os.makedirs(path, exist_ok=True)
+
+	def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+		"""The image and its base64 encoding, or None"""
+		entry = self._entries.get(key)
+		if entry is not None:
+			self._entries.move_to_end(key)
+			self._stats["hits"] += 1
+			return entry
+
+		image = self._disk_get(key)
+		if image is not None:
+			self._stats["disk_hits"] += 1
+			return self._remember(key, image)
+
+		self._stats["misses"] += 1
+		return None
+
+	def put(self, key: str, image: bytes) -> Tuple[bytes, str]:
+		self._disk_put(key, image)
+		return self._remember(key, image)
+
+	def stats(self) -> Dict[str, Any]:
+		return {**self._stats, "entries": len(self._entries), "bytes": self._bytes, "disk": self.path is not None}
+
+	def _remember(self, key: str, image: bytes) -> Tuple[bytes, str]:
+		entry = (image, base64.b64encode(image).decode())
+		previous = self._entries.pop(key, None)
+		if previous is not None:
+			self._bytes -= self._entry_size(previous)
+		self._entries[key] = entry
+		self._bytes += self._entry_size(entry)
+		while self._bytes > self.max_bytes and len(self._entries) > 1:
+			_, evicted = self._entries.popitem(last=False)
+			self._bytes -= self._entry_size(evicted)
+		return entry
+
+	@staticmethod
+	def _entry_size(entry: Tuple[bytes, str]) -> int:
+		return len(entry[0]) + len(entry[1])
+
+	def _file(self, key: str) -> str:
+		return os.path.join(self.path, key)
+
+	def _disk_get(self, key: str) -> Optional[bytes]:
+		if not self.path:
+			return None
+		try:
+			with open(self._file(key), "rb") as f:
+				return f.read()
+		except FileNotFoundError:
+			return None
+		except OSError as e:
+			logger.error(f"Failed to read cached QR image {key}: {str(e)}")
+			return None
+
+	def _disk_put(self, key: str, image: bytes) -> None:
+		if not self.path or os.path.exists(self._file(key)):
+			return
+		try:
+			# Write then rename, so a reader never sees a partial image
+			fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+			with os.fdopen(fd, "wb") as f:
+				f.write(image)
+			os.replace(tmp, self._file(key))
+		except OSError as e:
+			# The disk tier is an optimization; the memory tier still has the image
+			logger.error(f"Failed to persist QR image {key}: {str(e)}")
\ No newline at end of file
@@ -1,65 +1,172 @@
-import qrcode
-import json
-from typing import Dict, Any
-from base64 import b64encode
-from io import BytesIO
+from typing import Dict, Any, Optional, Tuple, Union
+from .payment_codec import (
+	amounts_match,
+	decode_payment,
+	encode_link_token,
+	encode_qr,
+	link_token,
+	payload_bytes,
+	qr_text,
+	read_intent_trailer
+)
+from .payment_intents import PaymentIntentStore
+from .qr_cache import QRImageCache, qr_cache_key
+from .qr_renderer import QRRenderPool, QRRenderBusyError, QR_FORMATS, QR_SIZES
+from .single_flight import SingleFlight
 
 class QRPaymentGenerator:
-	def __init__(self):
-		self.qr = qrcode.QRCode(
-			version=1,
-			error_correction=qrcode.constants.ERROR_CORRECT_L,
-			box_size=10,
-			border=4,
-		)
+	def __init__(
+		self,
+		render_pool: Optional[QRRenderPool] = None,
+		image_cache: Optional[QRImageCache] = None,
+		intents: Optional[PaymentIntentStore] = None
+	):
+		# Rendering runs on the pool so it never blocks the event loop
+		self.render_pool = render_pool or QRRenderPool(mode="thread")
+		self.image_cache = image_cache or QRImageCache()
+		self.intents = intents
+		self._renders = SingleFlight()
+
+	def create_intent(self, payment_data: Dict[str, Any]) -> Dict[str, Any]:
+		"""Open a signed payment intent; pass its intent_id in payment_data to encode it"""
+		if self.intents is None:
+			raise ValueError("Payment intents are not enabled")
+		return self.intents.create(payment_data)
+
+	def format_qr_data(self, payment_data: Dict[str, Any]) -> Dict[str, Any]:
+		qr_data = {
+			"business_uuid": payment_data["business_uuid"],
+			"amount": payment_data["amount"],
+			"reference": payment_data.get("reference", ""),
+			"merchant_name": payment_data.get("merchant_name", ""),
+			"timestamp": payment_data.get("timestamp", "")
+		}
+		# POS codes also say which terminal they belong to
+		for field in ("pos_id", "terminal_id", "intent_id"):
+			if payment_data.get(field):
+				qr_data[field] = payment_data[field]
+		return qr_data
+
+	def qr_content(self, qr_data: Dict[str, Any]) -> str:
+		"""
+		The text encoded in the QR code, in the compact payment encoding. The
+		timestamp is left out so a static payment always yields the same code,
+		and with it the same cache entry. Codes for an intent carry its signed
+		payload instead.
+		"""
+		if qr_data.get("intent_id"):
+			return qr_text(self._intent_payload(qr_data["intent_id"]))
+		return encode_qr({key: value for key, value in qr_data.items() if key != "timestamp"})
 
-	def generate_payment_qr(self, payment_data: Dict[str, Any]) -> str:
+	def qr_id(self, payment_data: Dict[str, Any], fmt: str = "png", size: str = "md") -> str:
+		"""Content address of the image generate_payment_qr returns, computed without rendering"""
+		self._check_options(fmt, size)
+		return qr_cache_key(self.qr_content(self.format_qr_data(payment_data)), fmt, size)
+
+	async def generate_payment_qr(self, payment_data: Dict[str, Any], fmt: str = "png", size: str = "md") -> str:
 		"""
 		Generate QR code for payment data
 		Returns base64 encoded QR code image
 		"""
 		try:
-			# Format payment data
-			qr_data = {
-				"business_uuid": payment_data["business_uuid"],
-				"amount": payment_data["amount"],
-				"reference": payment_data.get("reference", ""),
-				"merchant_name": payment_data.get("merchant_name", ""),
-				"timestamp": payment_data.get("timestamp", "")
-			}
-
-			# Create QR code
-			self.qr.clear()
-			self.qr.add_data(json.dumps(qr_data))
-			self.qr.make(fit=True)
-
-			# Create image
-			img = self.qr.make_image(fill_color="black", back_color="white")
-			
-			# Convert to base64
-			buffered = BytesIO()
-			img.save(buffered, format="PNG")
-			qr_base64 = b64encode(buffered.getvalue()).decode()
+			qr_data, key, entry = await self.render_image(payment_data, fmt, size)
 			
 			return {
-				"qr_code": qr_base64,
+				"qr_code": entry[1],
+				"qr_id": key,
+				"format": fmt,
+				"size": size,
+				"content_type": QR_FORMATS[fmt],
 				"payment_data": qr_data
 			}
+		except QRRenderBusyError:
+			raise
 		except Exception as e:
 			raise Exception(f"Failed to generate QR code: {str(e)}")
 
-	def verify_qr_payment(self, qr_data: Dict[str, Any], payment_data: Dict[str, Any]) -> bool:
+	async def render_image(self, payment_data: Dict[str, Any], fmt: str = "png", size: str = "md") -> Tuple[Dict[str, Any], str, Tuple[bytes, str]]:
+		"""The formatted QR data, its content address and the cached (image, base64) pair"""
+		self._check_options(fmt, size)
+		qr_data = self.format_qr_data(payment_data)
+		content = self.qr_content(qr_data)
+		key = qr_cache_key(content, fmt, size)
+
+		# Identical payloads are rendered and base64-encoded once
+		entry = self.image_cache.get(key)
+		if entry is None:
+			entry = await self._renders.do("qr", key, lambda: self._render(key, content, fmt, size))
+		return qr_data, key, entry
+
+	def get_qr_image(self, qr_id: str) -> Optional[Tuple[bytes, str]]:
+		"""A previously generated image and its content type, if it is still cached"""
+		entry = self.image_cache.get(qr_id)
+		if entry is None:
+			return None
+		image = entry[0]
+		return image, QR_FORMATS["png"] if image.startswith(b"\x89PNG") else QR_FORMATS["svg"]
+
+	async def _render(self, key: str, content: str, fmt: str, size: str) -> Tuple[bytes, str]:
+		image = await self.render_pool.render(content, fmt=fmt, box_size=QR_SIZES[size])
+		return self.image_cache.put(key, image)
+
+	@staticmethod
+	def _check_options(fmt: str, size: str) -> None:
+		if fmt not in QR_FORMATS:
+			raise ValueError(f"Unsupported QR format {fmt}; use one of {', '.join(QR_FORMATS)}")
+		if size not in QR_SIZES:
+			raise ValueError(f"Unsupported QR size {size}; use one of {', '.join(QR_SIZES)}")
+
+	def decode_payment(self, payload: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+		"""Payment data from scanned QR text, a payment link, or the legacy JSON form"""
+		return decode_payment(payload)
+
+	def verify_payment(self, qr_data: Union[str, Dict[str, Any]], payment_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+		"""
+		Verify scanned QR data. Signed intents are checked against the intent
+		table, and against payment_data when it is given; unsigned codes can
+		only be compared with the payment_data the caller supplies.
+		"""
+		raw = payload_bytes(qr_data) if isinstance(qr_data, str) else None
+		if raw is not None and read_intent_trailer(raw) is not None and self.intents is not None:
+			result = self.intents.verify_payload(raw)
+			intent = result["intent"]
+			if result["valid"] and payment_data is not None and not self._matches(intent, payment_data):
+				result = {**result, "valid": False, "reason": "payment does not match intent"}
+			return {**result, "payment_data": {key: intent[key] for key in ("business_uuid", "amount", "reference")} if intent else None}
+
+		decoded = decode_payment(qr_data)
+		if payment_data is None:
+			return {"valid": False, "reason": "payment_data is required for unsigned QR data", "intent": None, "payment_data": decoded}
+		valid = self._matches(decoded, payment_data)
+		return {
+			"valid": valid,
+			"reason": None if valid else "payment does not match QR data",
+			"intent": None,
+			"payment_data": decoded
+		}
+
+	def verify_qr_payment(self, qr_data: Union[str, Dict[str, Any]], payment_data: Dict[str, Any]) -> bool:
 		"""
 		Verify if QR payment data matches transaction data
+		Accepts the scanned QR text as well as already decoded QR data
 		"""
 		try:
-			return (
-				qr_data["business_uuid"] == payment_data["business_uuid"] and
-				qr_data["amount"] == payment_data["amount"]
-			)
+			return self.verify_payment(qr_data, payment_data)["valid"]
 		except Exception as e:
 			raise Exception(f"Failed to verify QR payment: {str(e)}")
 
+	@staticmethod
+	def _matches(qr_data: Dict[str, Any], payment_data: Dict[str, Any]) -> bool:
+		return (
+			str(qr_data["business_uuid"]) == str(payment_data["business_uuid"]) and
+			amounts_match(qr_data["amount"], payment_data["amount"])
+		)
+
+	def _intent_payload(self, intent_id: str) -> bytes:
+		if self.intents is None:
+			raise ValueError("Payment intents are not enabled")
+		return self.intents.payload(intent_id)
+
 	def generate_payment_link(self, payment_data: Dict[str, Any]) -> str:
 		"""
 		Generate a payment link that can be shared
@@ -75,9 +182,11 @@ class QRPaymentGenerator:
 				"timestamp": payment_data.get("timestamp", "")
 			}
 			
-			# Convert to URL-safe base64 string
-			json_str = json.dumps(link_data)
-			encoded_data = b64encode(json_str.encode()).decode().replace('+', '-').replace('/', '_')
+			# Pack into the compact payment encoding as unpadded base64url
+			if payment_data.get("intent_id"):
+				encoded_data = link_token(self._intent_payload(payment_data["intent_id"]))
+			else:
+				encoded_data = encode_link_token(link_data)
 			
 			# Format as URL
 			return f"ripapay://pay/{encoded_data}"
@@ -0,0 +1,152 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import qrcode
+
+logger = logging.getLogger(__name__)
+
+# Each pool worker keeps its own encoder, so no QRCode instance is ever shared
+_local = threading.local()
+
+class QRRenderBusyError(Exception):
+	"""The render queue is full; the caller should retry shortly"""
+	pass
+
+# Module sizes (pixels per QR module) of the PNG size variants
+QR_SIZES = {"sm": 4, "md": 10, "lg": 20}
+QR_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+def _encode(data: str, border: int) -> qrcode.QRCode:
+	encoder = getattr(_local, "encoder", None)
+	if encoder is None:
+		encoder = qrcode.QRCode(
+			version=1,
+			error_correction=qrcode.constants.ERROR_CORRECT_L,
+			border=border,
+		)
+		_local.encoder = encoder
+	encoder.border = border
+	encoder.clear()
+	# make(fit=True) only grows a fixed version, so let each payload pick its own
+	encoder.version = None
+	encoder.add_data(data)
+	encoder.make(fit=True)
+	return encoder
+
+def render_qr_png(data: str, box_size: int = 10, border: int = 4) -> bytes:
+	"""Encode data as a QR code PNG using this worker's encoder"""
+	encoder = _encode(data, border)
+	encoder.box_size = box_size
+	img = encoder.make_image(fill_color="black", back_color="white")
+	buffered = BytesIO()
+	img.save(buffered, format="PNG")
+	return buffered.getvalue()
+
+def render_qr_svg(data: str, box_size: int = 10, border: int = 4) -> bytes:
+	"""
+	Encode data as a QR code SVG: one path of horizontal runs of dark modules,
+	scaled by the viewBox, so there is no raster to draw or compress
+	"""
+	matrix = _encode(data, border).get_matrix()
+	size = len(matrix)
+	path = []
+	for y, row in enumerate(matrix):
+		x = 0
+		while x < size:
+			if row[x]:
+				start = x
+				while x < size and row[x]:
+					x += 1
+				path.append(f"M{start},{y}h{x - start}v1h{start - x}z")
+			else:
+				x += 1
+	pixels = size * box_size
+	return (
+		f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+		f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+		f'<rect width="{size}" height="{size}" fill="#fff"/>'
+		f'<path d="{"".join(path)}" fill="#000"/></svg>'
+	).encode()
+
+def render_qr(data: str, fmt: str = "png", box_size: int = 10, border: int = 4) -> bytes:
+	if fmt == "svg":
+		return render_qr_svg(data, box_size, border)
+	return render_qr_png(data, box_size, border)
+
+class QRRenderPool:
+	"""
+	Renders QR codes off the event loop.
+	Building the QR matrix is pure Python and holds the GIL, so the default
+	process mode spreads renders over worker processes; thread mode keeps
+	them in-process. At most workers + max_queue renders are accepted at a
+	time and any more are rejected with QRRenderBusyError rather than queued
+	without bound, so a burst degrades into fast retries instead of every
+	request in the worker slowing down.
+	"""
+	def __init__(self, mode: str = "process", workers: Optional[int] = None, max_queue: int = 64):
+		if mode not in ("process", "thread"):
+			raise ValueError("QR render mode must be 'process' or 'thread'")
+		self.mode = mode
+		self.workers = workers or min(4, os.cpu_count() or 1)
+		self.max_queue = max_queue
+		self._executor: Optional[Executor] = None
+		self._pending = 0
+		self._stats = {"rendered": 0, "rejected": 0, "failed": 0}
+
+	def start(self) -> None:
+		if self._executor is not None:
+			return
+		if self.mode == "process":
+			# spawn avoids forking a process that already runs threads and an event loop
+			self._executor = ProcessPoolExecutor(
+				max_workers=self.workers,
+				mp_context=multiprocessing.get_context("spawn")
+			)
+		else:
+			self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qr-render")
+
+	async def warm_up(self) -> None:
+		"""Start every worker now rather than on the first requests"""
+		self.start()
+		loop = asyncio.get_running_loop()
+		await asyncio.gather(*(
+			loop.run_in_executor(self._executor, render_qr_png, "ripapay")
+			for _ in range(self.workers)
+		))
+
+	async def render(self, data: str, fmt: str = "png", box_size: int = 10, border: int = 4) -> bytes:
+		if self._pending >= self.workers + self.max_queue:
+			self._stats["rejected"] += 1
+			raise QRRenderBusyError("QR renderer is busy, retry shortly")
+		self.start()
+		self._pending += 1
+		try:
+			image = await asyncio.get_running_loop().run_in_executor(
+				self._executor, render_qr, data, fmt, box_size, border
+			)
+		except Exception:
+			self._stats["failed"] += 1
+			raise
+		finally:
+			self._pending -= 1
+		self._stats["rendered"] += 1
+		return image
+
+	def close(self) -> None:
+		if self._executor is not None:
+			self._executor.shutdown(wait=True, cancel_futures=True)
+			self._executor = None
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			**self._stats,
+			"mode": self.mode,
+			"workers": self.workers,
+			"pending": self._pending,
+			"capacity": self.workers + self.max_queue
+		}
\ No newline at end of file
@@ -0,0 +1,244 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import re
+import httpx
+from .single_flight import SingleFlight
+from .rpc_router import NodeRouter, NodeUnavailableError
+from qubipy.endpoints_rpc import (
+	APPROVED_TRANSACTIONS_FOR_TICK,
+	BROADCAST_TRANSACTION,
+	LATEST_TICK,
+	STATUS,
+	TICK_DATA,
+	TRANSACTION,
+	TRANSACTION_STATUS,
+	WALLET_BALANCE
+)
+
+logger = logging.getLogger(__name__)
+
+# RipaPay history and account routes served alongside the Qubic RPC API
+TRANSACTIONS = '/transactions'
+BUSINESS_TRANSACTIONS = '/businesses/{business_uuid}/transactions'
+ACCOUNTS = '/accounts'
+
+# Default per-call timeouts in seconds, by kind of call
+READ_TIMEOUT = 5.0
+HISTORY_TIMEOUT = 15.0
+WRITE_TIMEOUT = 10.0
+
+# Tail-latency-sensitive reads that may be hedged across nodes
+HEDGED_OPERATIONS = {"get_balance", "get_account_details"}
+
+class QubicRPCError(Exception):
+	def __init__(self, message: str, safe_to_retry: bool = False):
+		super().__init__(message)
+		# True when the call provably had no effect: it never reached a node, or
+		# the node rejected it with a 4xx. Otherwise a write may have been applied.
+		self.safe_to_retry = safe_to_retry
+
+class AsyncQubicRPC:
+	"""
+	Async client for the Qubic RPC API, shared by every service.
+	One pooled HTTP client keeps connections alive across requests, each call
+	has its own timeout, and a semaphore caps the number of in-flight calls
+	so a slow node cannot pile up unbounded requests. Concurrent identical
+	reads are coalesced into a single request. Given several node URLs, each
+	call is routed, retried and optionally hedged by a NodeRouter.
+	"""
+	def __init__(
+		self,
+		rpc_url: str = "https://rpc.qubic.org/v1/",
+		rpc_urls: Optional[List[str]] = None,
+		api_key: Optional[str] = None,
+		timeout: float = READ_TIMEOUT,
+		max_connections: int = 100,
+		max_keepalive_connections: int = 20,
+		max_concurrency: int = 64,
+		coalesce_reads: bool = True,
+		hedge_reads: bool = True,
+		router: Optional[NodeRouter] = None
+	):
+		self.router = router or NodeRouter(rpc_urls or [rpc_url])
+		self.rpc_url = self.router.nodes[0].url
+		self.hedge_reads = hedge_reads
+		self.api_key = api_key
+		self.timeout = timeout
+		self.max_connections = max_connections
+		self.max_keepalive_connections = max_keepalive_connections
+		self.max_concurrency = max_concurrency
+		self._semaphore = asyncio.Semaphore(max_concurrency)
+		self._client: Optional[httpx.AsyncClient] = None
+		self.single_flight = SingleFlight() if coalesce_reads else None
+
+	async def start(self) -> None:
+		if self._client is None:
+			headers = {"Accept": "application/json"}
+			if self.api_key:
+				headers["Authorization"] = f"Bearer {self.api_key}"
+			self._client = httpx.AsyncClient(
+				headers=headers,
+				timeout=self.timeout,
+				limits=httpx.Limits(
+					max_connections=self.max_connections,
+					max_keepalive_connections=self.max_keepalive_connections
+				)
+			)
+
+	async def close(self) -> None:
+		if self._client is not None:
+			await self._client.aclose()
+			self._client = None
+
+	async def get_status(self) -> Dict[str, Any]:
+		return await self._get("get_status", STATUS)
+
+	async def get_latest_tick(self) -> int:
+		data = await self._get("get_latest_tick", LATEST_TICK)
+		return data.get('latestTick')
+
+	async def get_tick_data(self, tick: int) -> Dict[str, Any]:
+		data = await self._get("get_tick_data", TICK_DATA.format(tick=tick))
+		return data.get('tickData') or {}
+
+	async def get_approved_transaction_for_tick(self, tick: int) -> List[Dict[str, Any]]:
+		data = await self._get("get_approved_transaction_for_tick", APPROVED_TRANSACTIONS_FOR_TICK.format(tick=tick), timeout=HISTORY_TIMEOUT)
+		return data.get('approvedTransactions') or []
+
+	async def get_balance(self, address: str) -> Dict[str, Any]:
+		data = await self._get("get_balance", WALLET_BALANCE.format(id=address))
+		return data.get('balance', {})
+
+	async def get_account_details(self, address: str) -> Dict[str, Any]:
+		data = await self._get("get_account_details", WALLET_BALANCE.format(id=address))
+		return {"address": address, **data.get('balance', {})}
+
+	async def validate_address(self, address: str) -> bool:
+		# Qubic identities are 60 uppercase letters
+		return bool(re.match(r'^[A-Z]{60}$', address or ""))
+
+	async def get_transaction(self, tx_id: str) -> Dict[str, Any]:
+		data = await self._get("get_transaction", TRANSACTION.format(tx_id=tx_id))
+		return data.get('transaction', data)
+
+	async def get_transaction_status(self, tx_id: str) -> Dict[str, Any]:
+		data = await self._get("get_transaction_status", TRANSACTION_STATUS.format(tx_id=tx_id))
+		return data.get('transactionStatus', data)
+
+	async def get_transactions(
+		self,
+		address: Optional[str] = None,
+		source: Optional[str] = None,
+		destination: Optional[str] = None,
+		limit: int = 10,
+		offset: int = 0
+	) -> List[Dict[str, Any]]:
+		params = {"address": address, "source": source, "destination": destination, "limit": limit, "offset": offset}
+		data = await self._get("get_transactions", TRANSACTIONS, params=params, timeout=HISTORY_TIMEOUT)
+		return data.get('transactions', []) if isinstance(data, dict) else data
+
+	async def get_business_transactions(
+		self,
+		business_uuid: str,
+		start_time: Optional[str] = None,
+		end_time: Optional[str] = None,
+		limit: Optional[int] = None,
+		offset: Optional[int] = None
+	) -> List[Dict[str, Any]]:
+		params = {"start_time": start_time, "end_time": end_time, "limit": limit, "offset": offset}
+		data = await self._get(
+			"get_business_transactions",
+			BUSINESS_TRANSACTIONS.format(business_uuid=business_uuid),
+			params=params,
+			timeout=HISTORY_TIMEOUT
+		)
+		return data.get('transactions', []) if isinstance(data, dict) else data
+
+	async def create_transaction(self, tx_data: Dict[str, Any]) -> Dict[str, Any]:
+		return await self._request("POST", TRANSACTIONS, json=tx_data, timeout=WRITE_TIMEOUT)
+
+	async def broadcast_transaction(self, encoded_transaction: str) -> Dict[str, Any]:
+		return await self._request(
+			"POST",
+			BROADCAST_TRANSACTION,
+			json={"encodedTransaction": encoded_transaction},
+			timeout=WRITE_TIMEOUT
+		)
+
+	async def create_account(self, mnemonic: str) -> Dict[str, Any]:
+		return await self._request("POST", ACCOUNTS, json={"mnemonic": mnemonic}, timeout=WRITE_TIMEOUT)
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"max_concurrency": self.max_concurrency,
+			"nodes": self.node_status(),
+			"single_flight": self.single_flight.stats() if self.single_flight else None
+		}
+
+	def node_status(self) -> List[Dict[str, Any]]:
+		return self.router.status()
+
+	async def _get(
+		self,
+		operation: str,
+		path: str,
+		params: Optional[Dict[str, Any]] = None,
+		timeout: Optional[float] = None
+	) -> Any:
+		if params:
+			params = {k: v for k, v in params.items() if v is not None}
+		hedge = self.hedge_reads and operation in HEDGED_OPERATIONS
+		if self.single_flight is None:
+			return await self._request("GET", path, params=params, timeout=timeout, hedge=hedge)
+		# Key on the normalized request: same route and same non-empty arguments
+		key = (path, tuple(sorted((k, str(v)) for k, v in (params or {}).items())))
+		return await self.single_flight.do(
+			operation,
+			key,
+			lambda: self._request("GET", path, params=params, timeout=timeout, hedge=hedge)
+		)
+
+	async def _request(
+		self,
+		method: str,
+		path: str,
+		params: Optional[Dict[str, Any]] = None,
+		json: Optional[Dict[str, Any]] = None,
+		timeout: Optional[float] = None,
+		hedge: bool = False
+	) -> Any:
+		if self._client is None:
+			await self.start()
+		if params:
+			params = {k: v for k, v in params.items() if v is not None}
+
+		async def send(node) -> Any:
+			try:
+				response = await self._client.request(
+					method,
+					node.url + path.lstrip('/'),
+					params=params,
+					json=json,
+					timeout=timeout or self.timeout
+				)
+			except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+				# The request never reached the node, so it is safe to retry even for writes
+				raise NodeUnavailableError(f"{node.url}: {str(e)}", retryable_write=True) from None
+			except httpx.TransportError as e:
+				raise NodeUnavailableError(f"{node.url}: {str(e)}") from None
+			if response.status_code >= 500 or response.status_code == 429:
+				raise NodeUnavailableError(f"{node.url} returned HTTP {response.status_code}")
+			response.raise_for_status()
+			return response.json()
+
+		try:
+			async with self._semaphore:
+				return await self.router.call(send, idempotent=method == "GET", hedge=hedge)
+		except NodeUnavailableError as e:
+			raise QubicRPCError(f"{method} {path} failed: {str(e)}", safe_to_retry=e.retryable_write) from None
+		except httpx.HTTPStatusError as e:
+			rejected = 400 <= e.response.status_code < 500
+			raise QubicRPCError(f"{method} {path} failed: {str(e)}", safe_to_retry=rejected) from None
+		except httpx.HTTPError as e:
+			raise QubicRPCError(f"{method} {path} failed: {str(e)}") from None
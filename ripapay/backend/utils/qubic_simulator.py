@@ -0,0 +1,464 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from itertools import islice
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import random
+import re
+import time
+from .qubic_rpc import QubicRPCError
+from .timestamps import to_epoch, to_iso
+
+logger = logging.getLogger(__name__)
+
+GENESIS_TICK = 15000000
+SIMULATED_EPOCH = 150
+FAILED_PERCENT = 2
+_MASK = (1 << 64) - 1
+_ID_PREFIX = 12
+
+def _mix(*values: int) -> int:
+	"""splitmix64 over the given integers: cheap, well spread and stable across runs"""
+	x = 0
+	for value in values:
+		x = (x ^ (value & _MASK)) + 0x9E3779B97F4A7C15 & _MASK
+		x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & _MASK
+		x = (x ^ (x >> 27)) * 0x94D049BB133111EB & _MASK
+		x ^= x >> 31
+	return x
+
+def _letters(value: int, length: int, alphabet_start: str) -> str:
+	base = ord(alphabet_start)
+	chars = []
+	for _ in range(length):
+		value, digit = divmod(value, 26)
+		chars.append(chr(base + digit))
+	return "".join(reversed(chars))
+
+class SimulatedQubicRPC:
+	"""
+	Deterministic in-process stand-in for AsyncQubicRPC, for load testing and
+	running the whole app offline.
+	The ledger is synthetic and never materialized: transaction i lives in
+	tick GENESIS_TICK + i // tx_per_tick, is sent by address i mod A to a
+	different address chosen once per block of A transactions, and belongs
+	to business (i * step) mod B. Every address and business query is
+	therefore an arithmetic progression, so histories over millions of
+	transactions are answered in O(offset + limit). Ticks keep advancing at
+	tick_interval, and transactions submitted through create_transaction
+	land in the next tick. Latency and failures are injected from a seeded
+	generator so runs are repeatable.
+	"""
+	def __init__(
+		self,
+		seed: int = 42,
+		num_transactions: int = 1000000,
+		num_addresses: int = 10000,
+		num_businesses: int = 100,
+		tx_per_tick: int = 10,
+		tick_interval: float = 1.0,
+		latency: float = 0.0,
+		latency_jitter: float = 0.0,
+		error_rate: float = 0.0,
+		genesis_time: Optional[float] = None,
+		clock: Callable[[], float] = time.time
+	):
+		if num_addresses < 2 or num_businesses < 1 or tx_per_tick < 1:
+			raise ValueError("The simulator needs at least 2 addresses, 1 business and 1 transaction per tick")
+		self.seed = seed
+		self.num_transactions = num_transactions
+		self.num_addresses = num_addresses
+		self.num_businesses = num_businesses
+		self.tx_per_tick = tx_per_tick
+		self.tick_interval = tick_interval
+		self.latency = latency
+		self.latency_jitter = latency_jitter
+		self.error_rate = error_rate
+		self.clock = clock
+		if genesis_time is None:
+			# Place the initial ledger in the past so it ends at the current tick
+			genesis_time = clock() - (num_transactions // tx_per_tick) * tick_interval
+		self.genesis_time = genesis_time
+		self.rpc_url = "simulator://"
+
+		self.addresses = [self._make_address(k) for k in range(num_addresses)]
+		self._address_index = {address: k for k, address in enumerate(self.addresses)}
+		self.business_uuids = [f"{10000000 + (seed * 7919 + k * 104729) % 90000000:08d}" for k in range(num_businesses)]
+		self._business_index = {uuid: k for k, uuid in enumerate(self.business_uuids)}
+		# Businesses take every transaction congruent to k * step^-1 mod B
+		self._business_step = self._coprime_step(num_businesses)
+		self._business_inverse = pow(self._business_step, -1, num_businesses) if num_businesses > 1 else 0
+
+		self._rng = random.Random(seed)
+		self._submitted: Dict[str, Dict[str, Any]] = {}
+		self._submitted_by_tick: Dict[int, List[Dict[str, Any]]] = {}
+		self._balance_deltas: Dict[str, float] = {}
+		self._stats = {"calls": 0, "errors": 0, "by_method": {}}
+
+	async def start(self) -> None:
+		pass
+
+	async def close(self) -> None:
+		pass
+
+	# RPC surface
+
+	async def get_status(self) -> Dict[str, Any]:
+		await self._simulate("get_status")
+		return {
+			"lastProcessedTick": {"tickNumber": self.latest_tick(), "epoch": SIMULATED_EPOCH},
+			"simulated": True,
+			"transactions": self._visible_count()
+		}
+
+	async def get_latest_tick(self) -> int:
+		await self._simulate("get_latest_tick")
+		return self.latest_tick()
+
+	async def get_tick_data(self, tick: int) -> Dict[str, Any]:
+		await self._simulate("get_tick_data")
+		self._check_tick(tick)
+		start, end = self._tick_range(tick)
+		return {
+			"tickNumber": tick,
+			"epoch": SIMULATED_EPOCH,
+			"timestamp": to_iso(self._tick_time(tick)),
+			"transactionIds": [self._tx_id(i) for i in range(start, end)]
+				+ [tx["id"] for tx in self._submitted_by_tick.get(tick, [])]
+		}
+
+	async def get_approved_transaction_for_tick(self, tick: int) -> List[Dict[str, Any]]:
+		await self._simulate("get_approved_transaction_for_tick")
+		self._check_tick(tick)
+		start, end = self._tick_range(tick)
+		transactions = [self._raw_transaction(i) for i in range(start, end)]
+		for tx in self._submitted_by_tick.get(tick, []):
+			transactions.append({
+				"txId": tx["id"],
+				"sourceId": tx["source"],
+				"destId": tx["destination"],
+				"amount": str(int(tx["amount"])),
+				"tickNumber": tick,
+				"inputType": 0,
+				"inputSize": 8 if tx.get("reference") else 0,
+				"inputHex": (tx.get("reference") or "").encode('ascii').hex()
+			})
+		return transactions
+
+	async def get_balance(self, address: str) -> Dict[str, Any]:
+		await self._simulate("get_balance")
+		return self._balance(address)
+
+	async def get_account_details(self, address: str) -> Dict[str, Any]:
+		await self._simulate("get_account_details")
+		return {"address": address, **self._balance(address)}
+
+	async def validate_address(self, address: str) -> bool:
+		return bool(re.match(r'^[A-Z]{60}$', address or ""))
+
+	async def get_transaction(self, tx_id: str) -> Dict[str, Any]:
+		await self._simulate("get_transaction")
+		if tx_id in self._submitted:
+			return self._submitted_record(self._submitted[tx_id])
+		i = self._index_from_id(tx_id)
+		if i is None:
+			raise QubicRPCError(f"GET transaction {tx_id} failed: not found")
+		return self._record(i)
+
+	async def get_transaction_status(self, tx_id: str) -> Dict[str, Any]:
+		tx = await self.get_transaction(tx_id)
+		return {"txId": tx_id, "moneyFlew": tx["status"] == "success", "status": tx["status"]}
+
+	async def get_transactions(
+		self,
+		address: Optional[str] = None,
+		source: Optional[str] = None,
+		destination: Optional[str] = None,
+		limit: int = 10,
+		offset: int = 0
+	) -> List[Dict[str, Any]]:
+		await self._simulate("get_transactions")
+		if address is not None:
+			indices = self._merge(self._source_indices(address), self._destination_indices(address))
+			matches = lambda tx: address in (tx["source"], tx["destination"])
+		elif source is not None:
+			indices = self._source_indices(source)
+			matches = lambda tx: tx["source"] == source
+		elif destination is not None:
+			indices = self._destination_indices(destination)
+			matches = lambda tx: tx["destination"] == destination
+		else:
+			indices = iter(range(self._visible_count() - 1, -1, -1))
+			matches = lambda tx: True
+		return self._page(indices, matches, limit, offset)
+
+	async def get_business_transactions(
+		self,
+		business_uuid: str,
+		start_time: Optional[str] = None,
+		end_time: Optional[str] = None,
+		limit: Optional[int] = None,
+		offset: Optional[int] = None
+	) -> List[Dict[str, Any]]:
+		await self._simulate("get_business_transactions")
+		start_ts = to_epoch(start_time, default=None)
+		end_ts = to_epoch(end_time, default=None)
+		low = self._first_index_at(start_ts) if start_ts is not None else 0
+		high = self._first_index_at(end_ts) if end_ts is not None else self._visible_count()
+		high = min(high, self._visible_count())
+
+		def matches(tx):
+			ts = to_epoch(tx["timestamp"])
+			return (
+				tx.get("business_uuid") == business_uuid
+				and (start_ts is None or ts >= start_ts)
+				and (end_ts is None or ts < end_ts)
+			)
+
+		return self._page(self._business_indices(business_uuid, low, high), matches, limit, offset or 0)
+
+	async def create_transaction(self, tx_data: Dict[str, Any]) -> Dict[str, Any]:
+		await self._simulate("create_transaction")
+		sequence = len(self._submitted)
+		tick = self.latest_tick() + 1
+		tx = {
+			"id": _letters(int(hashlib.sha512(f"{self.seed}:submitted:{sequence}".encode()).hexdigest(), 16), 60, 'a'),
+			"tick": tick,
+			"timestamp": to_iso(self._tick_time(tick)),
+			"source": tx_data.get("source"),
+			"destination": tx_data.get("destination"),
+			"amount": float(tx_data.get("amount", 0) or 0),
+			"fee": tx_data.get("fee"),
+			"reference": tx_data.get("reference"),
+			"memo": tx_data.get("memo")
+		}
+		self._submitted[tx["id"]] = tx
+		self._submitted_by_tick.setdefault(tick, []).append(tx)
+		amount = tx["amount"] + float(tx["fee"] or 0)
+		self._balance_deltas[tx["source"]] = self._balance_deltas.get(tx["source"], 0.0) - amount
+		self._balance_deltas[tx["destination"]] = self._balance_deltas.get(tx["destination"], 0.0) + tx["amount"]
+		return self._submitted_record(tx)
+
+	async def broadcast_transaction(self, encoded_transaction: str) -> Dict[str, Any]:
+		await self._simulate("broadcast_transaction")
+		return {
+			"peersBroadcasted": 3,
+			"encodedTransaction": encoded_transaction,
+			"transactionId": _letters(int(hashlib.sha512(encoded_transaction.encode()).hexdigest(), 16), 60, 'a')
+		}
+
+	async def create_account(self, mnemonic: str) -> Dict[str, Any]:
+		await self._simulate("create_account")
+		digest = int(hashlib.sha512(f"{self.seed}:{mnemonic}".encode()).hexdigest(), 16)
+		return {"address": _letters(digest, 60, 'A'), "status": "created"}
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"simulator": {
+				"seed": self.seed,
+				"latest_tick": self.latest_tick(),
+				"transactions": self._visible_count(),
+				"submitted": len(self._submitted),
+				**self._stats
+			}
+		}
+
+	def node_status(self) -> List[Dict[str, Any]]:
+		return [{"url": self.rpc_url, "circuit": "closed", "simulated": True}]
+
+	# Synthetic ledger
+
+	def latest_tick(self) -> int:
+		elapsed = max(0.0, self.clock() - self.genesis_time)
+		return GENESIS_TICK + int(elapsed // self.tick_interval)
+
+	def _visible_count(self) -> int:
+		return (self.latest_tick() - GENESIS_TICK + 1) * self.tx_per_tick
+
+	def _tick_time(self, tick: int) -> float:
+		return self.genesis_time + (tick - GENESIS_TICK) * self.tick_interval
+
+	def _tick_range(self, tick: int) -> Tuple[int, int]:
+		start = (tick - GENESIS_TICK) * self.tx_per_tick
+		return start, start + self.tx_per_tick
+
+	def _check_tick(self, tick: int) -> None:
+		if tick < GENESIS_TICK or tick > self.latest_tick():
+			raise QubicRPCError(f"Tick {tick} is not available")
+
+	def _first_index_at(self, ts: float) -> int:
+		"""Index of the first transaction with a timestamp at or after ts"""
+		ticks = -(-(ts - self.genesis_time) // self.tick_interval)
+		return max(0, int(ticks) * self.tx_per_tick)
+
+	def _source(self, i: int) -> int:
+		return i % self.num_addresses
+
+	def _destination(self, i: int) -> int:
+		# Offset by 1..A-1 so an address never pays itself
+		block, k = divmod(i, self.num_addresses)
+		return (k + 1 + block % (self.num_addresses - 1)) % self.num_addresses
+
+	def _business(self, i: int) -> int:
+		return i * self._business_step % self.num_businesses
+
+	def _source_indices(self, address: str) -> Iterator[int]:
+		k = self._address_index.get(address)
+		if k is None:
+			return iter(())
+		n = self._visible_count()
+		last = n - 1 - (n - 1 - k) % self.num_addresses if n > k else -1
+		return iter(range(last, -1, -self.num_addresses))
+
+	def _destination_indices(self, address: str) -> Iterator[int]:
+		k = self._address_index.get(address)
+		if k is None:
+			return iter(())
+		n = self._visible_count()
+		a = self.num_addresses
+
+		def indices():
+			for block in range((n - 1) // a, -1, -1):
+				i = block * a + (k - 1 - block % (a - 1)) % a
+				if i < n:
+					yield i
+		return indices()
+
+	def _business_indices(self, business_uuid: str, low: int, high: int) -> Iterator[int]:
+		b = self._business_index.get(business_uuid)
+		if b is None or high <= low:
+			return iter(())
+		residue = b * self._business_inverse % self.num_businesses
+		last = high - 1 - (high - 1 - residue) % self.num_businesses
+		return iter(range(last, low - 1, -self.num_businesses))
+
+	def _merge(self, *streams: Iterator[int]) -> Iterator[int]:
+		previous = None
+		for i in heapq.merge(*streams, reverse=True):
+			if i != previous:
+				yield i
+			previous = i
+
+	def _page(
+		self,
+		indices: Iterator[int],
+		matches: Callable[[Dict[str, Any]], bool],
+		limit: Optional[int],
+		offset: int
+	) -> List[Dict[str, Any]]:
+		"""Newest-first page over the synthetic indices and matching submitted transactions"""
+		submitted = sorted(
+			(tx for tx in self._submitted.values() if matches(tx)),
+			key=lambda tx: tx["tick"],
+			reverse=True
+		)
+		stream = heapq.merge(
+			((tx["tick"], tx) for tx in submitted),
+			((GENESIS_TICK + i // self.tx_per_tick, i) for i in indices),
+			key=lambda item: item[0],
+			reverse=True
+		)
+		end = None if limit is None else offset + limit
+		return [
+			self._submitted_record(item) if isinstance(item, dict) else self._record(item)
+			for _, item in islice(stream, offset, end)
+		]
+
+	def _raw_transaction(self, i: int) -> Dict[str, Any]:
+		return {
+			"txId": self._tx_id(i),
+			"sourceId": self.addresses[self._source(i)],
+			"destId": self.addresses[self._destination(i)],
+			"amount": str(self._amount(i)),
+			"tickNumber": GENESIS_TICK + i // self.tx_per_tick,
+			"inputType": 0,
+			"inputSize": 8,
+			"inputHex": self.business_uuids[self._business(i)].encode('ascii').hex()
+		}
+
+	def _record(self, i: int) -> Dict[str, Any]:
+		tick = GENESIS_TICK + i // self.tx_per_tick
+		tx_id = self._tx_id(i)
+		amount = self._amount(i)
+		source = self.addresses[self._source(i)]
+		destination = self.addresses[self._destination(i)]
+		business_uuid = self.business_uuids[self._business(i)]
+		return {
+			"id": tx_id,
+			"transaction_id": tx_id,
+			"tick": tick,
+			"timestamp": to_iso(self._tick_time(tick)),
+			"source": source,
+			"destination": destination,
+			"from_address": source,
+			"to_address": destination,
+			"amount": float(amount),
+			"fee": int(amount * 0.0125),
+			"business_uuid": business_uuid,
+			"reference": business_uuid,
+			"status": "failed" if _mix(self.seed, 0xF4, i) % 100 < FAILED_PERCENT else "success"
+		}
+
+	def _submitted_record(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+		return {
+			"id": tx["id"],
+			"transaction_id": tx["id"],
+			"tick": tx["tick"],
+			"timestamp": tx["timestamp"],
+			"source": tx["source"],
+			"destination": tx["destination"],
+			"from_address": tx["source"],
+			"to_address": tx["destination"],
+			"amount": tx["amount"],
+			"fee": tx["fee"],
+			"business_uuid": tx["reference"],
+			"reference": tx["reference"],
+			"memo": tx["memo"],
+			"status": "success" if tx["tick"] <= self.latest_tick() else "pending"
+		}
+
+	def _amount(self, i: int) -> int:
+		return 1 + _mix(self.seed, 0xA7, i) % 50000
+
+	def _tx_id(self, i: int) -> str:
+		# The leading letters encode the index so lookups by id need no table
+		return _letters(i, _ID_PREFIX, 'a') + _letters(_mix(self.seed, 0x1D, i), 60 - _ID_PREFIX, 'a')
+
+	def _index_from_id(self, tx_id: str) -> Optional[int]:
+		if not re.match(r'^[a-z]{60}$', tx_id or ""):
+			return None
+		i = 0
+		for char in tx_id[:_ID_PREFIX]:
+			i = i * 26 + ord(char) - ord('a')
+		if i >= self._visible_count() or self._tx_id(i) != tx_id:
+			return None
+		return i
+
+	def _make_address(self, k: int) -> str:
+		digest = hashlib.sha512(f"ripapay-simulator:{self.seed}:{k}".encode()).digest()
+		return _letters(int.from_bytes(digest, 'big'), 60, 'A')
+
+	def _balance(self, address: str) -> Dict[str, Any]:
+		k = self._address_index.get(address)
+		key = k if k is not None else int(hashlib.sha256(address.encode()).hexdigest()[:16], 16)
+		balance = _mix(self.seed, 0xBA, key) % 10000000 + self._balance_deltas.get(address, 0.0)
+		return {"id": address, "balance": str(int(balance)), "validForTick": self.latest_tick()}
+
+	@staticmethod
+	def _coprime_step(modulus: int) -> int:
+		step = 7
+		while modulus > 1 and math.gcd(step, modulus) != 1:
+			step += 2
+		return step % modulus if modulus > 1 else 0
+
+	async def _simulate(self, operation: str) -> None:
+		self._stats["calls"] += 1
+		self._stats["by_method"][operation] = self._stats["by_method"].get(operation, 0) + 1
+		delay = self.latency + (self._rng.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0)
+		if delay > 0:
+			await asyncio.sleep(delay)
+		if self.error_rate and self._rng.random() < self.error_rate:
+			self._stats["errors"] += 1
+			raise QubicRPCError(f"Simulated {operation} failure")
\ No newline at end of file
@@ -0,0 +1,161 @@
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import inspect
+import logging
+import time
+from .payment_codec import amount_key
+from .payment_intents import PARTIALLY_PAID, PAYABLE, PaymentIntentStore
+
+logger = logging.getLogger(__name__)
+
+# Index key for intents that accept payment to any of the merchant's addresses
+ANY_DESTINATION = "*"
+
+class ReconciliationEngine:
+	"""
+	Matches inbound on-chain transfers to open payment intents.
+	A RipaPay transfer only carries the business UUID as its reference, so
+	payable intents are indexed by (destination, business, amount due) for
+	exact matches and by (destination, business) for everything else. Each
+	index bucket is an insertion-ordered dict, so a transfer is matched to
+	the oldest candidate and an intent is re-indexed or dropped in O(1) as
+	the store reports it partially paid, paid or expired.
+	A transfer that is not an exact match tops up the oldest partially paid
+	intent, or pays the merchant's only open intent (partly or in excess).
+	When several intents could take it, it is left unmatched rather than
+	credited to a guess. A transfer the store has already applied, such as
+	one seen again after a restart or a backfill, is ignored.
+	The index lives in this process and is kept current by the store's
+	listener, so it only sees intents created by this worker; like the push
+	hub, it assumes a single worker.
+	"""
+	def __init__(self, intents: PaymentIntentStore, max_unmatched: int = 1000):
+		self.intents = intents
+		self._exact: Dict[Tuple, "OrderedDict[str, None]"] = {}
+		self._merchant: Dict[Tuple, "OrderedDict[str, None]"] = {}
+		self._partial: Dict[Tuple, "OrderedDict[str, None]"] = {}
+		# intent id -> (exact key, merchant key, partially paid)
+		self._indexed: Dict[str, Tuple[Tuple, Tuple, bool]] = {}
+		self._unmatched = deque(maxlen=max_unmatched)
+		self._listeners: List[Callable] = []
+		self._stats = {"transfers": 0, "duplicates": 0, "matched": 0, "partial": 0, "overpaid": 0, "unmatched": 0}
+
+		intents.add_listener(self._on_intent)
+		for intent in intents.open_intents():
+			self._index(intent)
+
+	def add_listener(self, callback: Callable[[Dict[str, Any]], Any]) -> None:
+		"""Called with {"intent", "transfer"} whenever a transfer is applied to an intent"""
+		self._listeners.append(callback)
+
+	async def on_transfer(self, transfer: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		"""Apply an inbound transfer to the intent it pays; returns the updated intent, or None"""
+		if transfer.get("status", "success") != "success" or not transfer.get("business_uuid"):
+			return None
+		if self._applied(transfer):
+			return None
+		self._stats["transfers"] += 1
+		# Expired intents leave the index through the store's listener
+		self.intents.purge_expired()
+
+		intent_id, reason = self._match(transfer)
+		intent = self.intents.record_payment(intent_id, transfer["amount"], transfer.get("id")) if intent_id else None
+		if intent is None:
+			if self._applied(transfer):
+				# Another worker applied it while this one was matching
+				self._stats["transfers"] -= 1
+				return None
+			self._stats["unmatched"] += 1
+			self._unmatched.append({**transfer, "reason": reason or "intent is no longer payable", "seen_at": time.time()})
+			return None
+
+		self._stats["matched"] += 1
+		if intent["status"] == PARTIALLY_PAID:
+			self._stats["partial"] += 1
+		if intent["overpaid"]:
+			self._stats["overpaid"] += 1
+			logger.warning(f"Payment intent {intent['intent_id']} overpaid by {intent['overpaid']} in {transfer.get('id')}")
+		for listener in self._listeners:
+			try:
+				result = listener({"intent": intent, "transfer": transfer})
+				if inspect.isawaitable(result):
+					await result
+			except Exception as e:
+				logger.error(f"Reconciliation listener failed: {str(e)}")
+		return intent
+
+	def unmatched(self, limit: int = 100) -> List[Dict[str, Any]]:
+		"""The most recent transfers that paid no intent, newest first"""
+		return list(reversed(self._unmatched))[:limit]
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			**self._stats,
+			"indexed": len(self._indexed),
+			"partially_paid": sum(1 for entry in self._indexed.values() if entry[2])
+		}
+
+	def _applied(self, transfer: Dict[str, Any]) -> bool:
+		if not transfer.get("id") or self.intents.applied_to(transfer["id"]) is None:
+			return False
+		self._stats["duplicates"] += 1
+		return True
+
+	def _match(self, transfer: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+		business = transfer["business_uuid"]
+		amount = amount_key(transfer["amount"])
+		destinations = (transfer.get("destination"), ANY_DESTINATION)
+
+		for destination in destinations:
+			bucket = self._exact.get((destination, business, amount))
+			if bucket:
+				return next(iter(bucket)), None
+		for destination in destinations:
+			bucket = self._partial.get((destination, business))
+			if bucket:
+				return next(iter(bucket)), None
+
+		candidates = 0
+		for destination in destinations:
+			bucket = self._merchant.get((destination, business))
+			if bucket:
+				candidates += len(bucket)
+				intent_id = next(iter(bucket))
+		if candidates == 1:
+			return intent_id, None
+		return None, "ambiguous amount" if candidates else "no open intent"
+
+	def _on_intent(self, intent: Dict[str, Any]) -> None:
+		self._unindex(intent["intent_id"])
+		if intent["status"] in PAYABLE:
+			self._index(intent)
+
+	def _index(self, intent: Dict[str, Any]) -> None:
+		destination = intent.get("destination") or ANY_DESTINATION
+		merchant_key = (destination, intent["business_uuid"])
+		exact_key = (*merchant_key, amount_key(intent["amount_remaining"]))
+		partial = intent["status"] == PARTIALLY_PAID
+		self._exact.setdefault(exact_key, OrderedDict())[intent["intent_id"]] = None
+		self._merchant.setdefault(merchant_key, OrderedDict())[intent["intent_id"]] = None
+		if partial:
+			self._partial.setdefault(merchant_key, OrderedDict())[intent["intent_id"]] = None
+		self._indexed[intent["intent_id"]] = (exact_key, merchant_key, partial)
+
+	def _unindex(self, intent_id: str) -> None:
+		entry = self._indexed.pop(intent_id, None)
+		if entry is None:
+			return
+		exact_key, merchant_key, partial = entry
+		self._discard(self._exact, exact_key, intent_id)
+		self._discard(self._merchant, merchant_key, intent_id)
+		if partial:
+			self._discard(self._partial, merchant_key, intent_id)
+
+	@staticmethod
+	def _discard(index: Dict[Tuple, "OrderedDict[str, None]"], key: Tuple, intent_id: str) -> None:
+		bucket = index.get(key)
+		if bucket is None:
+			return
+		bucket.pop(intent_id, None)
+		if not bucket:
+			del index[key]
\ No newline at end of file
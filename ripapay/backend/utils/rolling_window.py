@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+import logging
+import time
+from .timestamps import to_epoch
+
+logger = logging.getLogger(__name__)
+
+class _Bucket:
+	__slots__ = ("count", "volume", "wallets", "tx_ids")
+
+	def __init__(self):
+		self.count = 0
+		self.volume = 0.0
+		self.wallets: Dict[str, int] = {}
+		self.tx_ids = set()
+
+class BusinessWindow:
+	"""
+	Sliding window for one business, split into fixed-size time buckets.
+	Counts and wallet reference counts are kept incrementally, so a snapshot
+	only walks the live buckets and never re-reads transaction history.
+	"""
+	def __init__(self, window_seconds: float, bucket_seconds: float):
+		self.window_seconds = window_seconds
+		self.bucket_seconds = bucket_seconds
+		self.buckets: Dict[int, _Bucket] = {}
+		self.count = 0
+		self.wallet_refs: Dict[str, int] = {}
+		self.seen_ids = set()
+		self.built_at = time.time()
+
+	def add(self, tx: Dict, now: float) -> bool:
+		timestamp = to_epoch(tx.get('timestamp'), default=now)
+		if timestamp <= now - self.window_seconds:
+			return False
+
+		tx_id = tx.get('id') or tx.get('transaction_id')
+		if tx_id is not None:
+			if tx_id in self.seen_ids:
+				return False
+			self.seen_ids.add(tx_id)
+
+		index = int(timestamp // self.bucket_seconds)
+		bucket = self.buckets.get(index)
+		if bucket is None:
+			bucket = self.buckets[index] = _Bucket()
+
+		bucket.count += 1
+		bucket.volume += float(tx.get('amount', 0))
+		if tx_id is not None:
+			bucket.tx_ids.add(tx_id)
+		for wallet in (tx.get('from_address'), tx.get('to_address')):
+			bucket.wallets[wallet] = bucket.wallets.get(wallet, 0) + 1
+			if bucket.wallets[wallet] == 1:
+				self.wallet_refs[wallet] = self.wallet_refs.get(wallet, 0) + 1
+		self.count += 1
+		return True
+
+	def expire(self, now: float) -> None:
+		cutoff = int((now - self.window_seconds) // self.bucket_seconds)
+		for index in [i for i in self.buckets if i <= cutoff]:
+			bucket = self.buckets.pop(index)
+			self.count -= bucket.count
+			self.seen_ids.difference_update(bucket.tx_ids)
+			for wallet in bucket.wallets:
+				refs = self.wallet_refs[wallet] - 1
+				if refs:
+					self.wallet_refs[wallet] = refs
+				else:
+					del self.wallet_refs[wallet]
+
+	def snapshot(self, now: float) -> Dict:
+		self.expire(now)
+		# Summed per bucket rather than kept as a running total so that
+		# float error does not accumulate as buckets expire
+		volume = sum(bucket.volume for bucket in self.buckets.values())
+		return {
+			"total_transactions": self.count,
+			"total_volume": volume,
+			"average_transaction_size": volume / self.count if self.count else 0.0,
+			"active_wallets": len(self.wallet_refs)
+		}
+
+class RollingWindowAggregator:
+	"""
+	Per-business rolling aggregates fed by newly observed transactions.
+	Businesses become warm after a rebuild from history; transactions for
+	cold businesses are ignored since the rebuild will include them.
+	"""
+	def __init__(
+		self,
+		window: timedelta = timedelta(hours=24),
+		bucket_size: timedelta = timedelta(minutes=1),
+		max_businesses: int = 10000
+	):
+		self.window_seconds = window.total_seconds()
+		self.bucket_seconds = bucket_size.total_seconds()
+		self.max_businesses = max_businesses
+		self._windows: "OrderedDict[str, BusinessWindow]" = OrderedDict()
+
+	def is_warm(self, business_uuid: str) -> bool:
+		return business_uuid in self._windows
+
+	def rebuild(self, business_uuid: str, transactions: Iterable[Dict], now: Optional[float] = None) -> None:
+		"""Replace a business window with one built from fetched history"""
+		now = time.time() if now is None else now
+		window = BusinessWindow(self.window_seconds, self.bucket_seconds)
+		window.built_at = now
+		for tx in transactions:
+			window.add(tx, now)
+		self._windows[business_uuid] = window
+		self._windows.move_to_end(business_uuid)
+		while len(self._windows) > self.max_businesses:
+			evicted, _ = self._windows.popitem(last=False)
+			logger.debug(f"Evicted rolling window for business: {evicted}")
+
+	def observe(self, business_uuid: str, tx: Dict, now: Optional[float] = None) -> bool:
+		window = self._windows.get(business_uuid)
+		if window is None:
+			return False
+		return window.add(tx, time.time() if now is None else now)
+
+	def observe_many(self, business_uuid: str, transactions: Iterable[Dict], now: Optional[float] = None) -> int:
+		return sum(1 for tx in transactions if self.observe(business_uuid, tx, now))
+
+	def get_metrics(self, business_uuid: str, now: Optional[float] = None) -> Dict:
+		window = self._windows.get(business_uuid)
+		if window is None:
+			raise KeyError(f"No rolling window for business: {business_uuid}")
+		self._windows.move_to_end(business_uuid)
+		return window.snapshot(time.time() if now is None else now)
+
+	def built_at(self, business_uuid: str) -> Optional[float]:
+		"""When the business window was last rebuilt from history"""
+		window = self._windows.get(business_uuid)
+		return window.built_at if window is not None else None
+
+	def warm_businesses(self) -> List[str]:
+		return list(self._windows)
@@ -0,0 +1,188 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class NodeUnavailableError(Exception):
+	"""Raised when a call fails for reasons attributable to the node (transport errors, 5xx, 429)"""
+	def __init__(self, message: str, retryable_write: bool = False):
+		super().__init__(message)
+		# True when the request provably never reached the node, so even writes can be retried
+		self.retryable_write = retryable_write
+
+class NodeState:
+	def __init__(self, url: str, initial_latency: float = 0.2):
+		self.url = url if url.endswith('/') else url + '/'
+		self.ewma_latency = initial_latency
+		self.ewma_error_rate = 0.0
+		self.consecutive_failures = 0
+		self.circuit = CLOSED
+		self.opened_at = 0.0
+		self.requests = 0
+		self.failures = 0
+		self.probing = False
+
+	def score(self) -> float:
+		# Lower is better: latency, inflated by the recent error rate
+		return self.ewma_latency * (1.0 + 10.0 * self.ewma_error_rate)
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"url": self.url,
+			"circuit": self.circuit,
+			"ewma_latency_ms": round(self.ewma_latency * 1000, 2),
+			"error_rate": round(self.ewma_error_rate, 4),
+			"consecutive_failures": self.consecutive_failures,
+			"requests": self.requests,
+			"failures": self.failures
+		}
+
+class NodeRouter:
+	"""
+	Routes each call to the healthiest, lowest-latency node.
+	Latency and error rate are tracked as EWMAs per node. A node that fails
+	failure_threshold times in a row has its circuit opened for open_seconds,
+	after which a single probe request decides whether it closes again.
+	Failed calls are retried on other nodes with full-jitter backoff, and
+	hedged reads send a duplicate to the next best node when the first one
+	has not answered within the hedge delay.
+	"""
+	def __init__(
+		self,
+		urls: List[str],
+		alpha: float = 0.2,
+		failure_threshold: int = 5,
+		open_seconds: float = 30.0,
+		max_retries: int = 2,
+		base_backoff: float = 0.05,
+		max_backoff: float = 1.0,
+		hedge_delay: Optional[float] = None
+	):
+		if not urls:
+			raise ValueError("At least one RPC node URL is required")
+		self.nodes = [NodeState(url) for url in dict.fromkeys(urls)]
+		self.alpha = alpha
+		self.failure_threshold = failure_threshold
+		self.open_seconds = open_seconds
+		self.max_retries = max_retries
+		self.base_backoff = base_backoff
+		self.max_backoff = max_backoff
+		self.hedge_delay = hedge_delay
+
+	def select(self, exclude: Optional[List[NodeState]] = None) -> Optional[NodeState]:
+		now = time.monotonic()
+		candidates = []
+		for node in self.nodes:
+			if exclude and node in exclude:
+				continue
+			if node.circuit == OPEN and now - node.opened_at >= self.open_seconds:
+				node.circuit = HALF_OPEN
+			if node.circuit == CLOSED or (node.circuit == HALF_OPEN and not node.probing):
+				candidates.append(node)
+		if not candidates:
+			return None
+		node = min(candidates, key=lambda n: n.score())
+		if node.circuit == HALF_OPEN:
+			node.probing = True
+		return node
+
+	def record_success(self, node: NodeState, latency: float) -> None:
+		node.requests += 1
+		node.ewma_latency += self.alpha * (latency - node.ewma_latency)
+		node.ewma_error_rate -= self.alpha * node.ewma_error_rate
+		node.consecutive_failures = 0
+		node.probing = False
+		if node.circuit != CLOSED:
+			logger.debug(f"Closing circuit for node {node.url}")
+			node.circuit = CLOSED
+
+	def record_failure(self, node: NodeState) -> None:
+		node.requests += 1
+		node.failures += 1
+		node.ewma_error_rate += self.alpha * (1.0 - node.ewma_error_rate)
+		node.consecutive_failures += 1
+		node.probing = False
+		if node.circuit == HALF_OPEN or node.consecutive_failures >= self.failure_threshold:
+			if node.circuit != OPEN:
+				logger.error(f"Opening circuit for node {node.url} after {node.consecutive_failures} failures")
+			node.circuit = OPEN
+			node.opened_at = time.monotonic()
+
+	async def call(self, fn: Callable[[NodeState], Awaitable[Any]], idempotent: bool = True, hedge: bool = False) -> Any:
+		tried: List[NodeState] = []
+		last_error: Optional[Exception] = None
+		for attempt in range(self.max_retries + 1):
+			node = self.select(exclude=tried) or self.select()
+			if node is None:
+				break
+			tried.append(node)
+			try:
+				if hedge and idempotent:
+					return await self._hedged(fn, node, tried)
+				return await self._timed(fn, node)
+			except NodeUnavailableError as e:
+				last_error = e
+				if not idempotent and not e.retryable_write:
+					raise
+				if attempt < self.max_retries:
+					backoff = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+					await asyncio.sleep(random.uniform(0, backoff))
+		if last_error is not None:
+			raise last_error
+		# No node was selected, so nothing was sent
+		raise NodeUnavailableError("All RPC nodes are unavailable", retryable_write=True)
+
+	def status(self) -> List[Dict[str, Any]]:
+		return [node.to_dict() for node in self.nodes]
+
+	async def _timed(self, fn: Callable[[NodeState], Awaitable[Any]], node: NodeState) -> Any:
+		started = time.monotonic()
+		try:
+			result = await fn(node)
+		except NodeUnavailableError:
+			self.record_failure(node)
+			raise
+		except asyncio.CancelledError:
+			raise
+		except Exception:
+			# Any other error (a 4xx, an undecodable body) means the node answered, so it is alive
+			self.record_success(node, time.monotonic() - started)
+			raise
+		finally:
+			# Whatever happened, a half-open probe is over and the node can be selected again
+			node.probing = False
+		self.record_success(node, time.monotonic() - started)
+		return result
+
+	async def _hedged(self, fn: Callable[[NodeState], Awaitable[Any]], primary: NodeState, tried: List[NodeState]) -> Any:
+		delay = self.hedge_delay if self.hedge_delay is not None else max(0.05, 2 * primary.ewma_latency)
+		first = asyncio.ensure_future(self._timed(fn, primary))
+		done, _ = await asyncio.wait({first}, timeout=delay)
+		if done:
+			return first.result()
+
+		backup = self.select(exclude=tried)
+		if backup is None:
+			return await first
+		tried.append(backup)
+		second = asyncio.ensure_future(self._timed(fn, backup))
+		pending = {first, second}
+		error: Optional[BaseException] = None
+		try:
+			while pending:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					if task.exception() is None:
+						return task.result()
+					error = task.exception()
+			raise error
+		finally:
+			for task in pending:
+				task.cancel()
@@ -0,0 +1,44 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+	"""
+	Coalesces concurrent identical calls into one in-flight awaitable.
+	The first caller for a key starts the call as its own task; callers that
+	arrive while it is running await the same task and get the same result.
+	Because the shared task is shielded, a cancelled caller never cancels the
+	work the others are waiting on. Results are shared, so treat them as read-only.
+	"""
+	def __init__(self):
+		self._inflight: Dict[Hashable, asyncio.Future] = {}
+		self._stats: Dict[str, Dict[str, int]] = {}
+
+	async def do(self, name: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+		stats = self._stats.setdefault(name, {"calls": 0, "merged": 0})
+		task = self._inflight.get(key)
+		if task is None:
+			stats["calls"] += 1
+			task = asyncio.ensure_future(fn())
+			self._inflight[key] = task
+			task.add_done_callback(lambda _: self._inflight.pop(key, None))
+		else:
+			stats["merged"] += 1
+		return await asyncio.shield(task)
+
+	@property
+	def in_flight(self) -> int:
+		return len(self._inflight)
+
+	def stats(self) -> Dict[str, Any]:
+		calls = sum(s["calls"] for s in self._stats.values())
+		merged = sum(s["merged"] for s in self._stats.values())
+		return {
+			"calls": calls,
+			"merged": merged,
+			"in_flight": self.in_flight,
+			"merge_ratio": merged / (calls + merged) if calls + merged else 0.0,
+			"by_method": {name: dict(s) for name, s in self._stats.items()}
+		}
@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+def to_epoch(value: Any, default: Optional[float] = None) -> Optional[float]:
+	"""
+	Convert a transaction timestamp to epoch seconds.
+	Accepts ISO strings, datetimes and numbers; naive values are treated as UTC
+	to match the datetime.utcnow() windows used across the services.
+	"""
+	if value is None or value == "":
+		return default
+	if isinstance(value, (int, float)):
+		return float(value)
+	if isinstance(value, str):
+		try:
+			value = datetime.fromisoformat(value)
+		except ValueError:
+			return default
+	if isinstance(value, datetime):
+		if value.tzinfo is None:
+			value = value.replace(tzinfo=timezone.utc)
+		return value.timestamp()
+	return default
+
+def to_iso(epoch: float) -> str:
+	"""Format epoch seconds as a naive UTC ISO string, like datetime.utcnow().isoformat()"""
+	return datetime.fromtimestamp(epoch, tz=timezone.utc).replace(tzinfo=None).isoformat()
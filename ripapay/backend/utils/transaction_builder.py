@@ -1,16 +1,14 @@
-from qubipy.rpc.rpc_client import QubiPy_RPC
-from typing import Dict, Any
-import os
-from dotenv import load_dotenv
+from typing import Dict, Any, Iterable, List, Optional
+from .qubic_rpc import AsyncQubicRPC
+from .balance_cache import TickAwareCache
 
-load_dotenv()
+# RipaPay payment fee (1.25%)
+PAYMENT_FEE_RATE = 0.0125
 
 class TransactionBuilder:
-	def __init__(self):
-		self.rpc_client = QubiPy_RPC(
-			rpc_url=os.getenv("QUBIC_RPC_URL", "https://api.qubic.li/v1/")
-		)
-
+	def __init__(self, rpc_client: AsyncQubicRPC, balance_cache: Optional[TickAwareCache] = None):
+		self.rpc_client = rpc_client
+		self.balance_cache = balance_cache
 
 	async def create_payment_transaction(
 		self,
@@ -23,28 +21,56 @@ class TransactionBuilder:
 		Create a payment transaction with fee calculation
 		"""
 		try:
-			# Calculate fee (1.25%)
-			fee = amount * 0.0125
-			net_amount = amount - fee
-
-			# Build transaction using RPC client
-			tx_data = {
-				"source": from_address,
-				"destination": to_address,
-				"amount": int(net_amount),  # Convert to smallest unit
-				"fee": int(fee),  # Convert to smallest unit
-				"reference": business_uuid
-			}
+			payment = self.build_payments([{
+				"from_address": from_address,
+				"to_address": to_address,
+				"amount": amount,
+				"business_uuid": business_uuid
+			}])[0]
+			return await self.submit_payment(payment)
+		except Exception as e:
+			raise Exception(f"Failed to create transaction: {str(e)}")
 
-			# Broadcast transaction
-			result = self.rpc_client.create_transaction(tx_data)
-			
-			return {
-				"status": "success",
-				"transaction_id": result.get("id"),
+	def build_payments(self, payments: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+		"""
+		Compute fees and build the node transactions for many payments in one pass
+		"""
+		payments = list(payments)
+		amounts = [payment["amount"] for payment in payments]
+		fees = [amount * PAYMENT_FEE_RATE for amount in amounts]
+		built = []
+		for payment, amount, fee in zip(payments, amounts, fees):
+			net_amount = amount - fee
+			built.append({
+				"tx_data": {
+					"source": payment["from_address"],
+					"destination": payment["to_address"],
+					"amount": int(net_amount),  # Convert to smallest unit
+					"fee": int(fee),  # Convert to smallest unit
+					"reference": payment["business_uuid"]
+				},
 				"amount": amount,
 				"fee": fee,
 				"net_amount": net_amount
-			}
-		except Exception as e:
-			raise Exception(f"Failed to create transaction: {str(e)}")
+			})
+		return built
+
+	async def submit_payment(self, payment: Dict[str, Any]) -> Dict[str, Any]:
+		"""
+		Broadcast a payment prepared by build_payments
+		"""
+		tx_data = payment["tx_data"]
+		result = await self.rpc_client.create_transaction(tx_data)
+
+		# Both balances change once this lands, so drop their cached values
+		if self.balance_cache is not None:
+			self.balance_cache.invalidate_address(tx_data["source"])
+			self.balance_cache.invalidate_address(tx_data["destination"])
+
+		return {
+			"status": "success",
+			"transaction_id": result.get("id"),
+			"amount": payment["amount"],
+			"fee": payment["fee"],
+			"net_amount": payment["net_amount"]
+		}
\ No newline at end of file
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class TransactionDetailCache:
+	"""
+	Two-tier cache of transaction details.
+	Finalized transactions can never change again, so they are kept in the
+	in-memory LRU without expiry and, when a path is given, in an on-disk
+	SQLite tier that survives restarts and LRU eviction. Anything else is
+	only cached in memory for pending_ttl seconds. A successful transaction
+	counts as final only once its confirmation count is known and reaches
+	finality_confirmations; without one it is treated as pending.
+	"""
+	def __init__(
+		self,
+		max_entries: int = 50000,
+		finality_confirmations: int = 3,
+		pending_ttl: float = 5.0,
+		path: Optional[str] = None
+	):
+		self.max_entries = max_entries
+		self.finality_confirmations = finality_confirmations
+		self.pending_ttl = pending_ttl
+		self.path = path
+		self._entries: "OrderedDict[str, Tuple[Dict[str, Any], Optional[float]]]" = OrderedDict()
+		self._stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+		self._lock = threading.Lock()
+		self._conn = None
+		if path:
+			self._conn = sqlite3.connect(path, check_same_thread=False)
+			if path != ":memory:":
+				self._conn.execute("PRAGMA journal_mode=WAL")
+				self._conn.execute("PRAGMA synchronous=NORMAL")
+			self._conn.execute("CREATE TABLE IF NOT EXISTS final_transactions (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+			self._conn.commit()
+
+	def close(self) -> None:
+		if self._conn is not None:
+			with self._lock:
+				self._conn.close()
+				self._conn = None
+
+	def is_final(self, details: Dict[str, Any]) -> bool:
+		status = details.get("status")
+		if status == "failed":
+			return True
+		if status != "success":
+			return False
+		confirmations = details.get("confirmations")
+		return confirmations is not None and confirmations >= self.finality_confirmations
+
+	def get(self, tx_id: str) -> Optional[Dict[str, Any]]:
+		entry = self._entries.get(tx_id)
+		if entry is not None:
+			details, expires_at = entry
+			if expires_at is None or expires_at > time.time():
+				self._entries.move_to_end(tx_id)
+				self._stats["hits"] += 1
+				return details
+			del self._entries[tx_id]
+
+		details = self._disk_get(tx_id)
+		if details is not None:
+			self._stats["disk_hits"] += 1
+			self._remember(tx_id, details, None)
+			return details
+
+		self._stats["misses"] += 1
+		return None
+
+	def put(self, tx_id: str, details: Dict[str, Any]) -> None:
+		if not tx_id:
+			return
+		if self.is_final(details):
+			self._remember(tx_id, details, None)
+			self._disk_put(tx_id, details)
+		elif self.pending_ttl > 0:
+			self._remember(tx_id, details, time.time() + self.pending_ttl)
+
+	def stats(self) -> Dict[str, Any]:
+		return {**self._stats, "entries": len(self._entries), "disk": self.path is not None}
+
+	def _remember(self, tx_id: str, details: Dict[str, Any], expires_at: Optional[float]) -> None:
+		self._entries[tx_id] = (details, expires_at)
+		self._entries.move_to_end(tx_id)
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+
+	def _disk_get(self, tx_id: str) -> Optional[Dict[str, Any]]:
+		if self._conn is None:
+			return None
+		with self._lock:
+			row = self._conn.execute("SELECT data FROM final_transactions WHERE id = ?", (tx_id,)).fetchone()
+		return json.loads(row[0]) if row else None
+
+	def _disk_put(self, tx_id: str, details: Dict[str, Any]) -> None:
+		if self._conn is None:
+			return
+		try:
+			with self._lock:
+				self._conn.execute(
+					"INSERT OR REPLACE INTO final_transactions (id, data) VALUES (?, ?)",
+					(tx_id, json.dumps(details, default=str))
+				)
+				self._conn.commit()
+		except sqlite3.Error as e:
+			# The disk tier is an optimization; the memory tier still has the entry
+			logger.error(f"Failed to persist transaction {tx_id}: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,98 @@
+from array import array
+from calendar import timegm
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+SECONDS_PER_DAY = 86400
+SECONDS_PER_HOUR = 3600
+_EPOCH_DATE = date(1970, 1, 1)
+_MISSING = object()
+
+class TransactionColumns:
+	"""
+	Columnar view of a transaction list, built in one pass.
+	- epoch: wall-clock epoch seconds of each timestamp (the offset, if any, is
+	  not applied, so days and hours match the timestamp text)
+	- amounts: amounts converted to float once
+	- customers: interned codes of each from_address, see customer_table
+	"""
+	def __init__(self, transactions: Iterable[Dict[str, Any]]):
+		self.epoch = array('q')
+		self.amounts = array('d')
+		self.customers = array('q')
+		self.customer_table: List[Any] = []
+		self.success_count = 0
+		# A missing from_address counts as None for unique customers but as ''
+		# when grouping customers, so remember which of the two forms occurred
+		self._missing_sender = False
+		self._explicit_none_sender = False
+		self._explicit_empty_sender = False
+
+		codes: Dict[Any, int] = {}
+		for tx in transactions:
+			timestamp = datetime.fromisoformat(tx.get('timestamp', ''))
+			self.epoch.append(timegm(timestamp.timetuple()))
+			self.amounts.append(float(tx.get('amount', 0)))
+
+			sender = tx.get('from_address', _MISSING)
+			if sender is _MISSING:
+				self._missing_sender = True
+				sender = ''
+			elif sender is None:
+				self._explicit_none_sender = True
+			elif sender == '':
+				self._explicit_empty_sender = True
+			code = codes.get(sender)
+			if code is None:
+				code = codes[sender] = len(self.customer_table)
+				self.customer_table.append(sender)
+			self.customers.append(code)
+
+			if tx.get('status') == 'success':
+				self.success_count += 1
+
+	def __len__(self) -> int:
+		return len(self.amounts)
+
+	@property
+	def unique_senders(self) -> int:
+		"""Number of distinct tx.get('from_address') values"""
+		count = len(self.customer_table)
+		if '' in self.customer_table:
+			count -= 1
+		if None in self.customer_table:
+			count -= 1
+		return count + self._explicit_empty_sender + (self._explicit_none_sender or self._missing_sender)
+
+	def days(self) -> array:
+		return array('q', (t // SECONDS_PER_DAY for t in self.epoch))
+
+	def hours(self) -> array:
+		return array('q', (t % SECONDS_PER_DAY // SECONDS_PER_HOUR for t in self.epoch))
+
+	def customer_totals(self) -> Tuple[List[float], List[int]]:
+		"""Total amount and transaction count per customer code"""
+		totals: List[float] = [0] * len(self.customer_table)
+		counts = [0] * len(self.customer_table)
+		for code, amount in zip(self.customers, self.amounts):
+			totals[code] += amount
+			counts[code] += 1
+		return totals, counts
+
+def group_sum(keys: Iterable[Any], values: Iterable[float]) -> Dict[Any, float]:
+	"""Sum values per key, keeping keys in order of first appearance"""
+	sums: Dict[Any, float] = {}
+	for key, value in zip(keys, values):
+		sums[key] = sums.get(key, 0) + value
+	return sums
+
+def group_count(keys: Iterable[Any]) -> Dict[Any, int]:
+	"""Count occurrences per key, keeping keys in order of first appearance"""
+	counts: Dict[Any, int] = {}
+	for key in keys:
+		counts[key] = counts.get(key, 0) + 1
+	return counts
+
+def epoch_day(value: date) -> int:
+	"""Day number of a date on the same scale as TransactionColumns.days()"""
+	return (value - _EPOCH_DATE).days
@@ -0,0 +1,539 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from .timestamps import to_epoch, to_iso
+
+logger = logging.getLogger(__name__)
+
+# Coverage recorded by the chain ingester applies to every business and address
+CHAIN_SCOPE = ("chain", "*")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+	id TEXT PRIMARY KEY,
+	business_uuid TEXT,
+	ts REAL NOT NULL,
+	source TEXT,
+	destination TEXT,
+	amount REAL,
+	status TEXT,
+	tick INTEGER,
+	data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_business_ts ON transactions (business_uuid, ts);
+CREATE INDEX IF NOT EXISTS idx_transactions_source_ts ON transactions (source, ts);
+CREATE INDEX IF NOT EXISTS idx_transactions_destination_ts ON transactions (destination, ts);
+CREATE INDEX IF NOT EXISTS idx_transactions_ts ON transactions (ts);
+CREATE TABLE IF NOT EXISTS coverage (
+	scope TEXT NOT NULL,
+	key TEXT NOT NULL,
+	start_ts REAL NOT NULL,
+	end_ts REAL NOT NULL,
+	PRIMARY KEY (scope, key)
+);
+CREATE TABLE IF NOT EXISTS submissions (
+	id TEXT PRIMARY KEY,
+	transaction_id TEXT,
+	status TEXT,
+	data TEXT NOT NULL,
+	updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_transaction ON submissions (transaction_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_status ON submissions (status);
+CREATE TABLE IF NOT EXISTS checkpoints (
+	name TEXT PRIMARY KEY,
+	tick INTEGER NOT NULL,
+	updated_at REAL NOT NULL
+);
+"""
+
+def transaction_id(tx: Dict[str, Any]) -> str:
+	"""Id of a transaction, or a content hash when the node did not return one"""
+	tx_id = tx.get('id') or tx.get('transaction_id') or tx.get('txId')
+	if tx_id:
+		return str(tx_id)
+	return hashlib.sha1(json.dumps(tx, sort_keys=True, default=str).encode()).hexdigest()
+
+def business_reference(tx: Dict[str, Any]) -> Optional[str]:
+	"""The RipaPay business UUID carried by a transaction, if any"""
+	for field in ('business_uuid', 'reference'):
+		value = tx.get(field)
+		if value is not None and re.match(r'^\d{8}$', str(value)):
+			return str(value)
+	return None
+
+class TransactionStore:
+	"""
+	Embedded SQLite store of observed transactions, indexed by business,
+	timestamp, source and destination. Coverage ranges record which time
+	windows are known to be complete, so callers only go to the node for gaps.
+	Payments submitted through the backend are tracked in a submissions table.
+	"""
+	def __init__(self, path: str = ":memory:"):
+		self.path = path
+		self._lock = threading.Lock()
+		self._conn = sqlite3.connect(path, check_same_thread=False)
+		self._conn.row_factory = sqlite3.Row
+		if path != ":memory:":
+			self._conn.execute("PRAGMA journal_mode=WAL")
+			self._conn.execute("PRAGMA synchronous=NORMAL")
+		self._conn.executescript(_SCHEMA)
+		self._conn.commit()
+
+	def close(self) -> None:
+		with self._lock:
+			self._conn.close()
+
+	def upsert(self, transactions: Iterable[Dict[str, Any]], business_uuid: Optional[str] = None) -> int:
+		now = time.time()
+		rows = []
+		for tx in transactions:
+			rows.append((
+				transaction_id(tx),
+				business_uuid or business_reference(tx),
+				to_epoch(tx.get('timestamp'), default=now),
+				tx.get('source') or tx.get('from_address') or tx.get('sourceId'),
+				tx.get('destination') or tx.get('to_address') or tx.get('destId'),
+				float(tx.get('amount', 0) or 0),
+				tx.get('status'),
+				tx.get('tick') or tx.get('tickNumber'),
+				json.dumps(tx, default=str)
+			))
+		if not rows:
+			return 0
+		with self._lock:
+			self._conn.executemany(
+				"""
+				INSERT INTO transactions (id, business_uuid, ts, source, destination, amount, status, tick, data)
+				VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+				ON CONFLICT(id) DO UPDATE SET
+					business_uuid = COALESCE(excluded.business_uuid, transactions.business_uuid),
+					status = excluded.status,
+					tick = COALESCE(excluded.tick, transactions.tick),
+					data = excluded.data
+				""",
+				rows
+			)
+			self._conn.commit()
+		return len(rows)
+
+	def get(self, tx_id: str) -> Optional[Dict[str, Any]]:
+		rows = self._query("SELECT data FROM transactions WHERE id = ?", (tx_id,))
+		return rows[0] if rows else None
+
+	def business_transactions(
+		self,
+		business_uuid: str,
+		start_ts: Optional[float] = None,
+		end_ts: Optional[float] = None,
+		limit: Optional[int] = None,
+		offset: int = 0,
+		newest_first: bool = False
+	) -> List[Dict[str, Any]]:
+		sql = "SELECT data FROM transactions WHERE business_uuid = ?"
+		params: List[Any] = [business_uuid]
+		if start_ts is not None:
+			sql += " AND ts >= ?"
+			params.append(start_ts)
+		if end_ts is not None:
+			sql += " AND ts <= ?"
+			params.append(end_ts)
+		sql += " ORDER BY ts DESC, id DESC" if newest_first else " ORDER BY ts, id"
+		sql += " LIMIT ? OFFSET ?"
+		params += [-1 if limit is None else limit, offset]
+		return self._query(sql, params)
+
+	def address_transactions(self, address: str, direction: str = "both", limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+		"""Newest-first transactions where the address is the source, destination or either"""
+		if direction == "inbound":
+			sql = "SELECT data, ts, id FROM transactions WHERE destination = ?"
+			params: List[Any] = [address]
+		elif direction == "outbound":
+			sql = "SELECT data, ts, id FROM transactions WHERE source = ?"
+			params = [address]
+		elif direction == "both":
+			# A UNION lets each branch use its own index
+			sql = (
+				"SELECT data, ts, id FROM transactions WHERE source = ? "
+				"UNION SELECT data, ts, id FROM transactions WHERE destination = ?"
+			)
+			params = [address, address]
+		else:
+			raise ValueError(f"Unsupported direction: {direction}")
+		sql += " ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?"
+		params += [limit, offset]
+		return self._query(sql, params)
+
+	def business_keyset(
+		self,
+		business_uuid: str,
+		before: Optional[Tuple[float, str]] = None,
+		limit: int = 500,
+		since_ts: Optional[float] = None,
+		after_ts: Optional[float] = None
+	) -> List[Tuple[Tuple[float, str], Dict[str, Any]]]:
+		"""
+		Newest-first (ts, id) keyed page of a business, strictly older than the
+		before key and no older than since_ts or strictly newer than after_ts
+		"""
+		sql = "SELECT data, ts, id FROM transactions WHERE business_uuid = ?"
+		params: List[Any] = [business_uuid]
+		if before is not None:
+			sql += " AND (ts < ? OR (ts = ? AND id < ?))"
+			params += [before[0], before[0], before[1]]
+		if since_ts is not None:
+			sql += " AND ts >= ?"
+			params.append(since_ts)
+		if after_ts is not None:
+			sql += " AND ts > ?"
+			params.append(after_ts)
+		sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+		params.append(limit)
+		with self._lock:
+			rows = self._conn.execute(sql, tuple(params)).fetchall()
+		return [((row["ts"], row["id"]), json.loads(row["data"])) for row in rows]
+
+	def address_keyset(
+		self,
+		address: str,
+		direction: str,
+		before: Optional[Tuple[float, str]] = None,
+		limit: int = 50
+	) -> List[Tuple[Tuple[float, str], Dict[str, Any]]]:
+		"""Newest-first (ts, id) keyed page of one direction, strictly older than the before key"""
+		if direction not in ("inbound", "outbound"):
+			raise ValueError(f"Unsupported direction: {direction}")
+		column = "destination" if direction == "inbound" else "source"
+		sql = f"SELECT data, ts, id FROM transactions WHERE {column} = ?"
+		params: List[Any] = [address]
+		if before is not None:
+			sql += " AND (ts < ? OR (ts = ? AND id < ?))"
+			params += [before[0], before[0], before[1]]
+		sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+		params.append(limit)
+		with self._lock:
+			rows = self._conn.execute(sql, tuple(params)).fetchall()
+		return [((row["ts"], row["id"]), json.loads(row["data"])) for row in rows]
+
+	def count_address(self, address: str, direction: str = "both") -> int:
+		if direction == "inbound":
+			return self._scalar("SELECT COUNT(*) FROM transactions WHERE destination = ?", (address,))
+		if direction == "outbound":
+			return self._scalar("SELECT COUNT(*) FROM transactions WHERE source = ?", (address,))
+		return self._scalar(
+			"SELECT (SELECT COUNT(*) FROM transactions WHERE source = ?)"
+			" + (SELECT COUNT(*) FROM transactions WHERE destination = ? AND (source IS NULL OR source != ?))",
+			(address, address, address)
+		)
+
+	def coverage(self, scope: str, key: str) -> Optional[Tuple[float, float]]:
+		with self._lock:
+			row = self._conn.execute(
+				"SELECT start_ts, end_ts FROM coverage WHERE scope = ? AND key = ?",
+				(scope, key)
+			).fetchone()
+		return (row["start_ts"], row["end_ts"]) if row else None
+
+	def mark_covered(self, scope: str, key: str, start_ts: float, end_ts: float) -> None:
+		"""
+		Record [start_ts, end_ts] as complete. Overlapping or adjacent ranges are
+		merged; otherwise the more recent range wins, since that is what the
+		dashboards and trackers read.
+		"""
+		current = self.coverage(scope, key)
+		if current is not None:
+			if start_ts <= current[1] and current[0] <= end_ts:
+				start_ts, end_ts = min(start_ts, current[0]), max(end_ts, current[1])
+			elif current[1] > end_ts:
+				return
+		with self._lock:
+			self._conn.execute(
+				"INSERT OR REPLACE INTO coverage (scope, key, start_ts, end_ts) VALUES (?, ?, ?, ?)",
+				(scope, key, start_ts, end_ts)
+			)
+			self._conn.commit()
+
+	def missing_ranges(self, scope: str, key: str, start_ts: float, end_ts: float) -> List[Tuple[float, float]]:
+		"""Parts of [start_ts, end_ts] covered neither by this key nor by the chain ingester"""
+		covered = sorted(r for r in (self.coverage(scope, key), self.coverage(*CHAIN_SCOPE)) if r)
+		gaps = []
+		cursor = start_ts
+		for range_start, range_end in covered:
+			if range_end < cursor:
+				continue
+			if range_start > end_ts:
+				break
+			if range_start > cursor:
+				gaps.append((cursor, range_start))
+			cursor = max(cursor, range_end)
+		if cursor < end_ts:
+			gaps.append((cursor, end_ts))
+		return gaps
+
+	def save_submission(self, submission: Dict[str, Any]) -> None:
+		with self._lock:
+			self._conn.execute(
+				"INSERT OR REPLACE INTO submissions (id, transaction_id, status, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+				(
+					submission["submission_id"],
+					submission.get("transaction_id"),
+					submission.get("status"),
+					json.dumps(submission, default=str),
+					time.time()
+				)
+			)
+			self._conn.commit()
+
+	def get_submission(self, handle: str) -> Optional[Dict[str, Any]]:
+		"""A submission by its submission id or transaction id"""
+		with self._lock:
+			row = self._conn.execute("SELECT data FROM submissions WHERE id = ?", (handle,)).fetchone()
+			if row is None:
+				row = self._conn.execute("SELECT data FROM submissions WHERE transaction_id = ?", (handle,)).fetchone()
+		return json.loads(row["data"]) if row else None
+
+	def find_transfers(self, source: str, destination: str, amount: float, since_ts: float) -> List[Dict[str, Any]]:
+		"""Transfers from source to destination of exactly amount at or after since_ts, oldest first"""
+		return self._query(
+			"""
+			SELECT data FROM transactions
+			WHERE source = ? AND ts >= ? AND destination = ? AND amount = ?
+			ORDER BY ts, id
+			""",
+			(source, since_ts, destination, amount)
+		)
+
+	def submissions_with_status(self, statuses: Iterable[str]) -> List[Dict[str, Any]]:
+		statuses = list(statuses)
+		placeholders = ", ".join("?" for _ in statuses)
+		return self._query(f"SELECT data FROM submissions WHERE status IN ({placeholders})", statuses)
+
+	def get_checkpoint(self, name: str) -> Optional[int]:
+		with self._lock:
+			row = self._conn.execute("SELECT tick FROM checkpoints WHERE name = ?", (name,)).fetchone()
+		return row["tick"] if row else None
+
+	def set_checkpoint(self, name: str, tick: int) -> None:
+		with self._lock:
+			self._conn.execute(
+				"INSERT OR REPLACE INTO checkpoints (name, tick, updated_at) VALUES (?, ?, ?)",
+				(name, tick, time.time())
+			)
+			self._conn.commit()
+
+	def checkpoints(self, prefix: str) -> Dict[str, int]:
+		with self._lock:
+			rows = self._conn.execute(
+				"SELECT name, tick FROM checkpoints WHERE substr(name, 1, ?) = ? ORDER BY tick",
+				(len(prefix), prefix)
+			).fetchall()
+		return {row["name"]: row["tick"] for row in rows}
+
+	def delete_checkpoint(self, name: str) -> None:
+		with self._lock:
+			self._conn.execute("DELETE FROM checkpoints WHERE name = ?", (name,))
+			self._conn.commit()
+
+	def _query(self, sql: str, params: Iterable[Any]) -> List[Dict[str, Any]]:
+		with self._lock:
+			rows = self._conn.execute(sql, tuple(params)).fetchall()
+		return [json.loads(row["data"]) for row in rows]
+
+	def _scalar(self, sql: str, params: Iterable[Any]) -> int:
+		with self._lock:
+			return self._conn.execute(sql, tuple(params)).fetchone()[0]
+
+class TransactionLedger:
+	"""
+	Read path shared by the tracker, dashboard and analytics services.
+	Queries the local store first and only calls the node for missing ranges,
+	writing whatever it fetches back into the store. A gap at the end of a
+	window shorter than max_staleness is tolerated rather than fetched.
+	"""
+	def __init__(self, store: TransactionStore, qubic_client, max_staleness: float = 30.0):
+		self.store = store
+		self.qubic_client = qubic_client
+		self.max_staleness = max_staleness
+
+	async def business_window(self, business_uuid: str, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+		start_ts, end_ts = to_epoch(start_time), to_epoch(end_time)
+		await self._fill_business(business_uuid, start_ts, end_ts)
+		return self.store.business_transactions(business_uuid, start_ts, end_ts)
+
+	async def business_recent(self, business_uuid: str, limit: int = 10) -> List[Dict[str, Any]]:
+		covered = self.store.coverage("business", business_uuid)
+		if covered is not None:
+			# Fill the tail since the last fetch, then serve from the store if it holds enough history
+			await self._fill_business(business_uuid, covered[1], time.time())
+			transactions = self.store.business_transactions(business_uuid, limit=limit, newest_first=True)
+			if len(transactions) >= limit or covered[0] <= 0:
+				return transactions
+
+		transactions = await self.qubic_client.get_business_transactions(
+			business_uuid=business_uuid,
+			limit=limit
+		)
+		self.store.upsert(transactions, business_uuid=business_uuid)
+		return transactions
+
+	async def address_transactions(self, address: str, direction: str = "both", limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+		if self._address_is_current(address):
+			return self.store.address_transactions(address, direction, limit, offset)
+
+		if direction == "inbound":
+			transactions = await self.qubic_client.get_transactions(destination=address, limit=limit)
+		elif direction == "outbound":
+			transactions = await self.qubic_client.get_transactions(source=address, limit=limit)
+		else:
+			transactions = await self.qubic_client.get_transactions(address=address, limit=limit, offset=offset)
+		self.store.upsert(transactions)
+		if direction == "both" and offset == 0 and len(transactions) < limit:
+			# The node returned the address's whole history
+			self.store.mark_covered("address", address, 0, time.time())
+		return transactions
+
+	async def transaction(self, tx_id: str) -> Dict[str, Any]:
+		tx = self.store.get(tx_id)
+		# Pending transactions can still change, so only settled ones are served locally
+		if tx is not None and tx.get("status") != "pending":
+			return tx
+		tx = await self.qubic_client.get_transaction(tx_id)
+		if tx:
+			self.store.upsert([tx])
+		return tx
+
+	async def _fill_business(self, business_uuid: str, start_ts: float, end_ts: float) -> None:
+		for gap_start, gap_end in self.store.missing_ranges("business", business_uuid, start_ts, end_ts):
+			if gap_end == end_ts and gap_end - gap_start < self.max_staleness and gap_start > start_ts:
+				continue
+			transactions = await self.qubic_client.get_business_transactions(
+				business_uuid=business_uuid,
+				start_time=to_iso(gap_start),
+				end_time=to_iso(gap_end)
+			)
+			self.store.upsert(transactions, business_uuid=business_uuid)
+			self.store.mark_covered("business", business_uuid, gap_start, gap_end)
+
+	async def iter_business_pages(self, business_uuid: str, page_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+		"""
+		Newest-first pages of a business's full history, keyed on (ts, id) so
+		rows stored while paging never shift a page or repeat a row. Covered
+		ranges are read from the store; gaps are read from the node one
+		page_size page at a time, stored, and yielded before the next request,
+		so memory stays bounded and the first rows go out right away. A gap is
+		marked covered once it has been read to the end.
+		"""
+		now = time.time()
+		before = None
+		for gap_start, gap_end in reversed(self.store.missing_ranges("business", business_uuid, 0, now)):
+			if gap_end == now and gap_end - gap_start < self.max_staleness and gap_start > 0:
+				continue
+			# The covered range above this gap
+			for rows in self._stored_pages(business_uuid, before, page_size, since_ts=gap_end):
+				yield [tx for _, tx in rows]
+				before = rows[-1][0]
+
+			# The node pages newest first: each request ends just past the oldest
+			# timestamp fully read, with an offset only within a run of equal timestamps
+			end_ts, offset = gap_end, 0
+			while True:
+				page = await self.qubic_client.get_business_transactions(
+					business_uuid=business_uuid,
+					start_time=to_iso(gap_start),
+					end_time=to_iso(end_ts),
+					limit=page_size,
+					offset=offset
+				)
+				self.store.upsert(page, business_uuid=business_uuid)
+				exhausted = len(page) < page_size
+				# Rows at the page's oldest timestamp may continue on the next page
+				oldest = min(to_epoch(tx.get('timestamp'), default=0.0) for tx in page) if page else gap_start
+				bound = {"since_ts": gap_start} if exhausted else {"after_ts": oldest}
+				for rows in self._stored_pages(business_uuid, before, page_size, **bound):
+					yield [tx for _, tx in rows]
+					before = rows[-1][0]
+				if exhausted:
+					break
+				next_end = oldest + 1e-6
+				if next_end < end_ts:
+					end_ts, offset = next_end, 0
+				else:
+					offset += len(page)
+			self.store.mark_covered("business", business_uuid, gap_start, gap_end)
+
+		# Whatever is left below the oldest gap
+		for rows in self._stored_pages(business_uuid, before, page_size):
+			yield [tx for _, tx in rows]
+
+	def _stored_pages(
+		self,
+		business_uuid: str,
+		before: Optional[Tuple[float, str]],
+		page_size: int,
+		**bounds: float
+	) -> Iterator[List[Tuple[Tuple[float, str], Dict[str, Any]]]]:
+		while True:
+			rows = self.store.business_keyset(business_uuid, before, page_size, **bounds)
+			if rows:
+				yield rows
+			if len(rows) < page_size:
+				return
+			before = rows[-1][0]
+
+	async def iter_address(
+		self,
+		address: str,
+		direction: str,
+		before: Optional[Tuple[float, str]] = None,
+		offset: int = 0,
+		chunk: int = 50
+	) -> AsyncIterator[Tuple[Tuple[float, str], Dict[str, Any], int]]:
+		"""
+		Lazily yield (key, transaction, offset) newest first for one direction,
+		skipping anything not older than the before key. Served by keyset
+		queries when the store is current for the address; otherwise pages are
+		read from the node starting at offset, the number of node records
+		consumed so far, which callers keep to resume without re-reading.
+		"""
+		if self._address_is_current(address):
+			while True:
+				rows = self.store.address_keyset(address, direction, before, chunk)
+				for key, tx in rows:
+					yield key, tx, offset
+				if len(rows) < chunk:
+					return
+				before = rows[-1][0]
+
+		while True:
+			if direction == "inbound":
+				page = await self.qubic_client.get_transactions(destination=address, limit=chunk, offset=offset)
+			else:
+				page = await self.qubic_client.get_transactions(source=address, limit=chunk, offset=offset)
+			self.store.upsert(page)
+			for tx in page:
+				offset += 1
+				key = (to_epoch(tx.get('timestamp'), default=0.0), transaction_id(tx))
+				if before is None or key < before:
+					yield key, tx, offset
+			if len(page) < chunk:
+				return
+
+	def count_address(self, address: str, direction: str = "both") -> Tuple[int, bool]:
+		"""
+		The indexed count and whether it is exact. It is a lower bound while
+		the store does not hold the address's full, current history.
+		"""
+		return self.store.count_address(address, direction), self._address_is_current(address)
+
+	def _address_is_current(self, address: str) -> bool:
+		fresh_after = time.time() - self.max_staleness
+		for covered in (self.store.coverage("address", address), self.store.coverage(*CHAIN_SCOPE)):
+			if covered is not None and covered[0] <= 0 and covered[1] >= fresh_after:
+				return True
+		return False
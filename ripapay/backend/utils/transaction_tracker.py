@@ -1,21 +1,68 @@
-from qubipy.rpc.rpc_client import QubiPy_RPC
-from typing import Dict, List, Any
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Any, Optional, Tuple
+import asyncio
+import base64
+import inspect
+import json
 import logging
 from datetime import datetime, timedelta
+from .transaction_store import TransactionLedger
+from .qubic_rpc import AsyncQubicRPC
+from .confirmation_watcher import ConfirmationWatcher
+from .transaction_cache import TransactionDetailCache
 
 logger = logging.getLogger(__name__)
 
+MAX_BULK_TRANSACTIONS = 500
+# Transfer ids remembered to drop repeats from overlapping ingestion and backfill
+RECENT_TRANSFERS = 10000
+
 class TransactionTracker:
-	def __init__(self, qubic_client: QubiPy_RPC):
+	def __init__(
+		self,
+		qubic_client: AsyncQubicRPC,
+		ledger: Optional[TransactionLedger] = None,
+		confirmation_watcher: Optional[ConfirmationWatcher] = None,
+		detail_cache: Optional[TransactionDetailCache] = None
+	):
 		self.qubic_client = qubic_client
+		self.ledger = ledger
+		self.confirmation_watcher = confirmation_watcher
+		self.detail_cache = detail_cache
+		self._transfer_listeners: List[Callable] = []
+		self._recent_transfers: "OrderedDict[str, None]" = OrderedDict()
+
+	def add_transfer_listener(self, callback: Callable[[Dict[str, Any]], Any]) -> None:
+		"""Called once with every newly observed inbound transfer"""
+		self._transfer_listeners.append(callback)
+
+	async def observe_transfer(self, transfer: Dict[str, Any]) -> None:
+		"""Feed a transfer seen on chain to the transfer stream, ignoring ones already seen"""
+		tx_id = transfer.get("id")
+		if tx_id in self._recent_transfers:
+			return
+		if tx_id:
+			self._recent_transfers[tx_id] = None
+			if len(self._recent_transfers) > RECENT_TRANSFERS:
+				self._recent_transfers.popitem(last=False)
+		for listener in self._transfer_listeners:
+			try:
+				result = listener(transfer)
+				if inspect.isawaitable(result):
+					await result
+			except Exception as e:
+				logger.error(f"Transfer listener failed for {tx_id}: {str(e)}")
 
 	async def get_inbound_transactions(self, address: str, limit: int = 10) -> List[Dict]:
 		"""Get incoming transactions for an address"""
 		try:
-			transactions = await self.qubic_client.get_transactions(
-				destination=address,
-				limit=limit
-			)
+			if self.ledger is not None:
+				transactions = await self.ledger.address_transactions(address, "inbound", limit)
+			else:
+				transactions = await self.qubic_client.get_transactions(
+					destination=address,
+					limit=limit
+				)
 			return self._format_transactions(transactions, "inbound")
 		except Exception as e:
 			logger.error(f"Failed to get inbound transactions: {str(e)}")
@@ -24,10 +71,13 @@ class TransactionTracker:
 	async def get_outbound_transactions(self, address: str, limit: int = 10) -> List[Dict]:
 		"""Get outgoing transactions from an address"""
 		try:
-			transactions = await self.qubic_client.get_transactions(
-				source=address,
-				limit=limit
-			)
+			if self.ledger is not None:
+				transactions = await self.ledger.address_transactions(address, "outbound", limit)
+			else:
+				transactions = await self.qubic_client.get_transactions(
+					source=address,
+					limit=limit
+				)
 			return self._format_transactions(transactions, "outbound")
 		except Exception as e:
 			logger.error(f"Failed to get outbound transactions: {str(e)}")
@@ -36,21 +86,185 @@ class TransactionTracker:
 	async def get_transaction_details(self, tx_id: str) -> Dict:
 		"""Get detailed information about a specific transaction"""
 		try:
+			cached = self._cached_details(tx_id)
+			if cached is not None:
+				return cached
+			return await self._fetch_details(tx_id)
+		except Exception as e:
+			logger.error(f"Failed to get transaction details: {str(e)}")
+			raise
+
+	async def get_transactions_details(self, tx_ids: Iterable[str], max_concurrency: int = 16) -> Dict[str, Any]:
+		"""
+		Details for many transactions at once. Cache hits are answered
+		directly and only the misses are fetched, with bounded concurrency;
+		a transaction that cannot be fetched is reported, not raised.
+		"""
+		unique = list(dict.fromkeys(tx_ids))
+		if len(unique) > MAX_BULK_TRANSACTIONS:
+			raise ValueError(f"At most {MAX_BULK_TRANSACTIONS} transactions can be requested at once")
+
+		details = {}
+		misses = []
+		for tx_id in unique:
+			cached = self._cached_details(tx_id)
+			if cached is not None:
+				details[tx_id] = cached
+			else:
+				misses.append(tx_id)
+
+		semaphore = asyncio.Semaphore(max_concurrency)
+
+		async def fetch(tx_id: str):
+			async with semaphore:
+				return await self._fetch_details(tx_id)
+
+		results = await asyncio.gather(*(fetch(tx_id) for tx_id in misses), return_exceptions=True)
+		errors = {}
+		for tx_id, result in zip(misses, results):
+			if isinstance(result, Exception):
+				errors[tx_id] = str(result)
+			else:
+				details[tx_id] = result
+		return {"transactions": details, "errors": errors, "cache_hits": len(unique) - len(misses)}
+
+	def _cached_details(self, tx_id: str) -> Optional[Dict]:
+		if self.detail_cache is not None:
+			cached = self.detail_cache.get(tx_id)
+			if cached is not None:
+				return cached
+		# Our own submissions are tracked per tick, so never poll the node for them
+		tracked = self.confirmation_watcher.get(tx_id) if self.confirmation_watcher is not None else None
+		if tracked is not None:
+			return {
+				"id": tracked.get("transaction_id"),
+				"submission_id": tracked.get("submission_id"),
+				"timestamp": tracked.get("submitted_at"),
+				"source": tracked.get("source"),
+				"destination": tracked.get("destination"),
+				"amount": tracked.get("net_amount"),
+				"fee": tracked.get("fee"),
+				"status": tracked.get("status"),
+				"block_height": tracked.get("block_height"),
+				"confirmations": tracked.get("confirmations"),
+				"error": tracked.get("error")
+			}
+		return None
+
+	async def _fetch_details(self, tx_id: str) -> Dict:
+		if self.ledger is not None:
+			tx_details = await self.ledger.transaction(tx_id)
+		else:
 			tx_details = await self.qubic_client.get_transaction(tx_id)
+		confirmations = tx_details.get("confirmations")
+		if confirmations is None:
+			confirmations = self._confirmations(tx_details.get("tick"))
+		details = {
+			"id": tx_details.get("id"),
+			"timestamp": tx_details.get("timestamp"),
+			"source": tx_details.get("source"),
+			"destination": tx_details.get("destination"),
+			"amount": tx_details.get("amount"),
+			"fee": tx_details.get("fee"),
+			"status": tx_details.get("status"),
+			"block_height": tx_details.get("block_height") or tx_details.get("tick"),
+			"confirmations": confirmations
+		}
+		if self.detail_cache is not None:
+			self.detail_cache.put(tx_id, details)
+		return details
+
+	def _confirmations(self, tick: Optional[int]) -> Optional[int]:
+		"""Confirmations of a transfer in tick, counted against the last tick the ingester or watcher processed"""
+		latest_tick = self.confirmation_watcher.latest_tick if self.confirmation_watcher is not None else None
+		if tick is None or latest_tick is None or tick > latest_tick:
+			return None
+		return latest_tick - tick + 1
+
+	async def get_timeline(
+		self,
+		address: str,
+		limit: int = 20,
+		cursor: Optional[str] = None,
+		direction: str = "both"
+	) -> Dict[str, Any]:
+		"""
+		Newest-first page of an address's inbound and outbound transactions,
+		merged on (timestamp, id). Each direction is read lazily and only as
+		far as the page needs; the opaque cursor carries the last key and how
+		far each direction was read, so deep pages never re-read earlier ones.
+		"""
+		streams = []
+		try:
+			if self.ledger is None:
+				raise ValueError("The timeline requires the transaction ledger")
+			directions = ["inbound", "outbound"] if direction == "both" else [direction]
+			if not set(directions) <= {"inbound", "outbound"}:
+				raise ValueError(f"Unsupported direction: {direction}")
+			before, offsets = self._decode_cursor(cursor, len(directions))
+
+			streams = [
+				self.ledger.iter_address(address, name, before=before, offset=offset, chunk=limit + 1).__aiter__()
+				for name, offset in zip(directions, offsets)
+			]
+			heads = [await self._next(stream) for stream in streams]
+
+			page = []
+			last_key = None
+			while len(page) < limit:
+				candidates = [i for i, head in enumerate(heads) if head is not None]
+				if not candidates:
+					break
+				i = max(candidates, key=lambda i: heads[i][0])
+				key, tx, offsets[i] = heads[i]
+				heads[i] = await self._next(streams[i])
+				if key == last_key:
+					# A transfer to self appears in both directions
+					continue
+				page.append(self._format_transactions([tx], directions[i])[0])
+				last_key = key
+
+			has_more = any(head is not None for head in heads)
+			total, total_is_exact = self.ledger.count_address(address, direction)
 			return {
-				"id": tx_details.get("id"),
-				"timestamp": tx_details.get("timestamp"),
-				"source": tx_details.get("source"),
-				"destination": tx_details.get("destination"),
-				"amount": tx_details.get("amount"),
-				"fee": tx_details.get("fee"),
-				"status": tx_details.get("status"),
-				"block_height": tx_details.get("block_height"),
-				"confirmations": tx_details.get("confirmations")
+				"address": address,
+				"transactions": page,
+				"next_cursor": self._encode_cursor(last_key, offsets) if has_more and last_key else None,
+				"total": total,
+				"total_is_exact": total_is_exact
 			}
 		except Exception as e:
-			logger.error(f"Failed to get transaction details: {str(e)}")
+			logger.error(f"Failed to get transaction timeline: {str(e)}")
 			raise
+		finally:
+			for stream in streams:
+				await stream.aclose()
+
+	@staticmethod
+	async def _next(stream) -> Optional[Tuple]:
+		try:
+			return await stream.__anext__()
+		except StopAsyncIteration:
+			return None
+
+	@staticmethod
+	def _encode_cursor(key: Tuple[float, str], offsets: List[int]) -> str:
+		payload = json.dumps({"k": list(key), "o": offsets}, separators=(",", ":"))
+		return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+	@staticmethod
+	def _decode_cursor(cursor: Optional[str], streams: int) -> Tuple[Optional[Tuple[float, str]], List[int]]:
+		if not cursor:
+			return None, [0] * streams
+		try:
+			payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+			before = (float(payload["k"][0]), str(payload["k"][1]))
+			offsets = [int(offset) for offset in payload["o"]]
+		except (ValueError, KeyError, IndexError, TypeError):
+			raise ValueError("Invalid cursor")
+		if len(offsets) != streams:
+			raise ValueError("Cursor does not match the requested direction")
+		return before, offsets
 
 	def _format_transactions(self, transactions: List[Dict], tx_type: str) -> List[Dict]:
 		"""Format transaction data for frontend display"""
@@ -1,12 +1,17 @@
-from qubipy.rpc.rpc_client import QubiPy_RPC
+import asyncio
 import logging
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
+from .qubic_rpc import AsyncQubicRPC
+from .balance_cache import TickAwareCache
 
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_ADDRESSES = 1000
+
 class WalletService:
-	def __init__(self, qubic_client: QubiPy_RPC):
+	def __init__(self, qubic_client: AsyncQubicRPC, balance_cache: Optional[TickAwareCache] = None):
 		self.qubic_client = qubic_client
+		self.balance_cache = balance_cache
 
 	async def connect_wallet(self, address: str) -> Dict:
 		try:
@@ -25,12 +30,51 @@ class WalletService:
 
 	async def get_balance(self, address: str) -> float:
 		try:
-			balance = await self.qubic_client.get_balance(address)
+			balance = await self.get_balance_info(address)
+			if isinstance(balance, dict):
+				balance = balance.get("balance", 0)
 			return float(balance)
 		except Exception as e:
 			logger.error(f"Failed to get balance: {str(e)}")
 			raise
 
+	async def get_balance_info(self, address: str) -> Dict:
+		"""Balance record as returned by the node, served from the balance cache when available"""
+		if self.balance_cache is None:
+			return await self.qubic_client.get_balance(address)
+		return await self.balance_cache.get_or_load(
+			"balance",
+			address,
+			lambda: self.qubic_client.get_balance(address)
+		)
+
+	async def get_balances(self, addresses: Iterable[str], max_concurrency: int = 32) -> Dict[str, Any]:
+		"""
+		Resolve balances for many addresses in one call. Duplicates are looked
+		up once and lookups fan out with bounded concurrency through the shared
+		client and balance cache; a failing address is reported, not raised.
+		"""
+		unique = list(dict.fromkeys(addresses))
+		if len(unique) > MAX_BATCH_ADDRESSES:
+			raise ValueError(f"At most {MAX_BATCH_ADDRESSES} addresses can be requested at once")
+
+		semaphore = asyncio.Semaphore(max_concurrency)
+
+		async def lookup(address: str):
+			async with semaphore:
+				return await self.get_balance_info(address)
+
+		results = await asyncio.gather(*(lookup(address) for address in unique), return_exceptions=True)
+
+		balances = {}
+		errors = {}
+		for address, result in zip(unique, results):
+			if isinstance(result, Exception):
+				errors[address] = str(result)
+			else:
+				balances[address] = result
+		return {"balances": balances, "errors": errors}
+
 	async def get_transactions(self, address: str, limit: int = 10, offset: int = 0) -> List[Dict]:
 		try:
 			transactions = await self.qubic_client.get_transactions(